@@ -66,9 +66,49 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "OPTIONS": {
+            # SQLite kennt kein SELECT ... FOR UPDATE: Schreibtransaktionen
+            # (z.B. Checkout) holen sich die Schreibsperre deshalb gleich beim
+            # BEGIN und warten bis zu `timeout` Sekunden statt abzubrechen.
+            "transaction_mode": "IMMEDIATE",
+            "timeout": 20,
+        },
+        # Datei statt In-Memory-DB, damit parallele Test-Threads echte
+        # SQLite-Sperren (mit Wartezeit) statt Shared-Cache-Fehlern sehen
+        "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
     }
 }
 
+# -------------------------------------------------------------------
+# Cache
+# -------------------------------------------------------------------
+# Lokaler Speicher reicht für einen Prozess; bei mehreren Workern ein
+# geteiltes Backend (Redis/Memcached) eintragen, sonst sehen die anderen
+# Prozesse die Invalidierung des Response-Caches nicht.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "myshop",
+    }
+}
+
+# Response-Cache der Katalog-Endpunkte (shop/cache.py); Timeout 0 = aus
+SHOP_RESPONSE_CACHE_ALIAS = "default"
+SHOP_RESPONSE_CACHE_TIMEOUT = 60 * 60
+
+# E-Mail: in der Entwicklung auf der Konsole, produktiv per SMTP (EMAIL_HOST usw.)
+EMAIL_BACKEND = (
+    "django.core.mail.backends.console.EmailBackend"
+    if DEBUG
+    else "django.core.mail.backends.smtp.EmailBackend"
+)
+DEFAULT_FROM_EMAIL = "shop@example.com"
+
+# E-Mail-Ausgang (shop/services/outbox_service.py), zugestellt von `manage.py run_outbox`.
+# EMAIL_OUTBOX_EAGER (Standard: DEBUG) stellt direkt nach dem Commit im Request-Prozess zu.
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_BACKOFF_SECONDS = 30
+
 # -------------------------------------------------------------------
 # Password validation
 # -------------------------------------------------------------------
@@ -115,6 +155,7 @@ CORS_ALLOWED_ORIGINS = [
 # Erweitert die erlaubten Header um den CSRF-Header
 CORS_ALLOW_HEADERS = list(default_headers) + [
     "X-CSRFToken",
+    "Idempotency-Key",
 ]
 
 # CSRF Settings
@@ -1,4 +1,6 @@
 from django.contrib import admin
+from django.core.exceptions import ValidationError
+from django.forms.models import BaseInlineFormSet
 from .models import (
     Category,
     Product,
@@ -11,7 +13,11 @@ from .models import (
     Order,
     OrderItem,
     OrderReturn,
+    ReturnStatusChange,
+    deferred_variation_key_refresh,
+    make_variation_key,
 )
+from .search import search_product_ids
 
 
 class ProductImageInline(admin.TabularInline):
@@ -20,26 +26,62 @@ class ProductImageInline(admin.TabularInline):
     fields = ["image", "external_image"]
 
 
+class ProductVariationInlineFormSet(BaseInlineFormSet):
+    def clean(self):
+        """Jede Attributkombination darf pro Produkt nur einmal vorkommen."""
+        super().clean()
+        seen = set()
+        for form in self.forms:
+            data = getattr(form, "cleaned_data", None)
+            if not data or data.get("DELETE"):
+                continue
+            key = make_variation_key(
+                (value.attribute_type.name, value.value)
+                for value in data.get("attributes") or ()
+            )
+            if key and key in seen:
+                raise ValidationError("Jede Attributkombination darf pro Produkt nur einmal vorkommen.")
+            seen.add(key)
+
+
 class ProductVariationInline(admin.TabularInline):
     model = ProductVariation
+    formset = ProductVariationInlineFormSet
     extra = 1
     filter_horizontal = ("attributes",)
     fields = ["attributes", "stock"]
 
+    def formfield_for_manytomany(self, db_field, request, **kwargs):
+        if db_field.name == "attributes":
+            kwargs["queryset"] = AttributeValue.objects.select_related("attribute_type")
+        return super().formfield_for_manytomany(db_field, request, **kwargs)
+
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ("title", "category", "price", "delivery_time", "rating_avg", "rating_count")
+    list_display = ("title", "category", "price", "delivery_time", "stock_total", "rating_avg", "rating_count")
     fields = (
         "title", "description", "price", 
         ("main_image", "external_image"),  # Beide Felder nebeneinander
-        "category", "delivery_time", "rating_avg", "rating_count"
+        "category", "delivery_time", "stock_total", "rating_avg", "rating_count"
     )
-    readonly_fields = ("rating_avg", "rating_count")
+    readonly_fields = ("stock_total", "rating_avg", "rating_count")
     list_filter = ("category",)
     search_fields = ("title", "description")
     inlines = [ProductImageInline, ProductVariationInline]
 
+    def save_related(self, request, form, formsets, change):
+        # variation_key erst nach allen Attributänderungen der Variationen neu berechnen
+        with deferred_variation_key_refresh():
+            super().save_related(request, form, formsets, change)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Volltextindex statt icontains-Scan über title/description
+        if not search_term:
+            return queryset, False
+        ids = search_product_ids(search_term, limit=None)
+        return queryset.filter(pk__in=ids), False
+
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -96,13 +138,40 @@ class ReviewAdmin(admin.ModelAdmin):
     list_display = ("product", "user", "rating", "approved", "created_at")
     list_filter = ("approved", "rating")
     search_fields = ("product__title", "user__username", "body")
-    actions = ["approve_reviews"]
+    actions = ["approve_reviews", "reject_reviews"]
+
+    def _moderate(self, request, queryset, approved):
+        from .services.review_service import set_reviews_approved
 
+        result = set_reviews_approved(queryset, approved)
+        self.message_user(
+            request,
+            f"{result['updated']} Bewertung(en) {'freigegeben' if approved else 'abgelehnt'}, "
+            f"{result['products']} Produkt(e) neu berechnet ({result['duration_ms']} ms).",
+        )
+
+    @admin.action(description="Ausgewählte Bewertungen freigeben")
     def approve_reviews(self, request, queryset):
-        queryset.update(approved=True)
+        self._moderate(request, queryset, True)
+
+    @admin.action(description="Ausgewählte Bewertungen ablehnen")
+    def reject_reviews(self, request, queryset):
+        self._moderate(request, queryset, False)
         
+class ReturnStatusChangeInline(admin.TabularInline):
+    model = ReturnStatusChange
+    extra = 0
+    can_delete = False
+    fields = ("old_status", "new_status", "changed_by", "changed_at")
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(OrderReturn)
 class OrderReturnAdmin(admin.ModelAdmin):
+    inlines = [ReturnStatusChangeInline]
     list_display = (
         "id",
         "order",        
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class ShopConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "shop"
+
+    def ready(self):
+        # Signal-Handler für Volltextsuche, Typeahead und Response-Cache registrieren
+        from . import search, suggest  # noqa: F401
+        from .cache import connect_signals
+
+        connect_signals()
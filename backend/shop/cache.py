@@ -0,0 +1,146 @@
+"""
+Versionierter Response-Cache für lesende Katalog-Endpunkte.
+
+Jedes relevante Model hat einen Generationszähler im Django-Cache. Er wird
+bei post_save/post_delete (bzw. nach Massen-Updates explizit über
+bump_generation) erhöht. Die Cache-Schlüssel der Antworten enthalten die
+Generationen aller Models, von denen ein Endpunkt abhängt – nach einer
+Änderung werden alte Einträge also nie mehr gelesen, ohne dass etwas
+gelöscht oder auf ein TTL gewartet werden muss.
+
+Backend und Lebensdauer: Einstellungen SHOP_RESPONSE_CACHE_ALIAS
+(Standard "default") und SHOP_RESPONSE_CACHE_TIMEOUT (Sekunden, 0 schaltet
+den Cache ab). Bei mehreren Worker-Prozessen muss das Backend geteilt
+sein (z.B. Redis/Memcached), sonst sehen andere Prozesse die Zähler nicht.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from rest_framework.response import Response
+
+# Models, deren Änderungen Katalog-Antworten betreffen
+CATALOG_MODELS = (
+    "shop.Product",
+    "shop.ProductImage",
+    "shop.ProductVariation",
+    "shop.AttributeType",
+    "shop.AttributeValue",
+    "shop.Category",
+    "shop.DeliveryTime",
+    "shop.Review",
+)
+
+
+def _cache():
+    return caches[getattr(settings, "SHOP_RESPONSE_CACHE_ALIAS", "default")]
+
+
+def _timeout():
+    return getattr(settings, "SHOP_RESPONSE_CACHE_TIMEOUT", 60 * 60)
+
+
+def _generation_key(label):
+    return f"shop:generation:{label}"
+
+
+def get_generations(labels):
+    """Aktuelle Generationen der Models (fehlende werden neu angelegt)."""
+    cache = _cache()
+    keys = [_generation_key(label) for label in labels]
+    found = cache.get_many(keys)
+    generations = []
+    for key in keys:
+        if key not in found:
+            # Startwert aus der Uhrzeit, damit nach Verdrängung keine alte Generation wiederkehrt
+            cache.add(key, time.time_ns(), timeout=None)
+            found[key] = cache.get(key)
+        generations.append(found[key])
+    return generations
+
+
+def _bump(labels):
+    cache = _cache()
+    for label in labels:
+        key = _generation_key(label)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+
+
+def bump_generation(*labels):
+    """
+    Invalidiert alle gecachten Antworten, die von den Models abhängen.
+
+    Sofort und noch einmal nach dem Commit: sonst könnte ein paralleler
+    Leser den alten Stand unter der neuen Generation cachen.
+    """
+    _bump(labels)
+    transaction.on_commit(lambda: _bump(labels))
+
+
+def _model_changed(sender, **kwargs):
+    bump_generation(sender._meta.label)
+
+
+def _attributes_changed(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        bump_generation("shop.ProductVariation")
+
+
+def connect_signals():
+    from django.apps import apps
+
+    for label in CATALOG_MODELS:
+        model = apps.get_model(label)
+        post_save.connect(_model_changed, sender=model, dispatch_uid=f"shop-cache-save-{label}")
+        post_delete.connect(_model_changed, sender=model, dispatch_uid=f"shop-cache-delete-{label}")
+    variation = apps.get_model("shop.ProductVariation")
+    m2m_changed.connect(
+        _attributes_changed, sender=variation.attributes.through, dispatch_uid="shop-cache-variation-attributes"
+    )
+
+
+class CachedResponseMixin:
+    """
+    Cacht die Antworten von list/retrieve eines ViewSets.
+
+    `cache_models` nennt die Models (App-Label), von denen die Antwort
+    abhängt. Eigene GET-Actions können `cached_response()` nutzen.
+    """
+    cache_models = ()
+
+    def _response_cache_key(self, request):
+        generations = ":".join(str(g) for g in get_generations(self.cache_models))
+        query = sorted((k, sorted(v)) for k, v in request.query_params.lists())
+        raw = f"{request.get_host()}|{request.path}|{query}"
+        digest = hashlib.sha1(raw.encode("utf-8")).hexdigest()
+        return f"shop:response:{self.basename}:{self.action}:{generations}:{digest}"
+
+    def cached_response(self, request, build):
+        timeout = _timeout()
+        if not timeout:
+            return build()
+
+        key = self._response_cache_key(request)
+        data = _cache().get(key)
+        if data is not None:
+            return Response(data, headers={"X-Cache": "HIT"})
+
+        response = build()
+        if response.status_code == 200:
+            _cache().set(key, response.data, timeout)
+            response["X-Cache"] = "MISS"
+        return response
+
+    def list(self, request, *args, **kwargs):
+        parent = super().list
+        return self.cached_response(request, lambda: parent(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        parent = super().retrieve
+        return self.cached_response(request, lambda: parent(request, *args, **kwargs))
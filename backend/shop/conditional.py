@@ -0,0 +1,89 @@
+"""
+Bedingte GET-Requests (ETag / Last-Modified) für die Shop-ViewSets.
+
+Die Validatoren werden aus billigen Aggregaten (max(updated_at), Anzahl
+Zeilen) der Queryset-Zeilen berechnet. Passt If-None-Match bzw.
+If-Modified-Since, antwortet der Endpunkt mit 304 – ohne die Objekte zu
+laden oder zu serialisieren.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def aggregate_validators(queryset, timestamp_field="updated_at"):
+    """(Anzahl, max(timestamp)) einer Queryset in einer Query."""
+    agg = queryset.order_by().aggregate(count=Count("pk"), last=Max(timestamp_field))
+    return agg["count"], agg["last"]
+
+
+def rows_fingerprint(queryset, *fields):
+    """Für kleine Tabellen ohne updated_at: Hash über die Werte der Zeilen."""
+    rows = list(queryset.order_by("pk").values_list("pk", *fields))
+    return hashlib.sha1(repr(rows).encode("utf-8")).hexdigest()
+
+
+class ConditionalGetMixin:
+    """
+    Setzt ETag/Last-Modified auf list/retrieve und beantwortet passende
+    bedingte Requests mit 304.
+
+    ViewSets überschreiben `get_validators(queryset)`; Rückgabe ist
+    (Liste hashbarer Bestandteile, datetime oder None für Last-Modified).
+    Standard: Anzahl und max(updated_at) der Queryset.
+    """
+
+    def get_validators(self, queryset):
+        count, last_modified = aggregate_validators(queryset)
+        return [count, last_modified], last_modified
+
+    def _conditional_response(self, request, queryset, build):
+        parts, last_modified = self.get_validators(queryset)
+        # Pfad + Query gehören dazu (Filter, Felder, Darstellung, Cursor)
+        query = sorted((k, sorted(v)) for k, v in request.query_params.lists())
+        raw = repr((request.path, query, parts))
+        etag = quote_etag(hashlib.sha1(raw.encode("utf-8")).hexdigest())
+        last_modified_ts = int(last_modified.timestamp()) if last_modified else None
+
+        if self._not_modified(request, etag, last_modified_ts):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = build()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+
+        response["ETag"] = etag
+        if last_modified_ts is not None:
+            response["Last-Modified"] = http_date(last_modified_ts)
+        return response
+
+    def _not_modified(self, request, etag, last_modified_ts):
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match:
+            # schwacher Vergleich wie in django.utils.cache
+            candidates = {e.removeprefix("W/") for e in parse_etags(if_none_match)}
+            return "*" in candidates or etag in candidates
+        if_modified_since = parse_http_date_safe(request.headers.get("If-Modified-Since", ""))
+        return (
+            if_modified_since is not None
+            and last_modified_ts is not None
+            and last_modified_ts <= if_modified_since
+        )
+
+    def _object_queryset(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        return self.get_queryset().filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+
+    def list(self, request, *args, **kwargs):
+        parent = super().list
+        queryset = self.filter_queryset(self.get_queryset())
+        return self._conditional_response(request, queryset, lambda: parent(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        parent = super().retrieve
+        return self._conditional_response(
+            request, self._object_queryset(), lambda: parent(request, *args, **kwargs)
+        )
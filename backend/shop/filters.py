@@ -0,0 +1,238 @@
+from datetime import datetime, time
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Count, Exists, Max, Min, OuterRef, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+
+from .models import AttributeValue, Order, OrderReturn, ProductVariation
+
+TRUE_VALUES = {"1", "true", "yes", "on"}
+
+
+def _decimal_param(params, name):
+    raw = params.get(name)
+    if raw in (None, ""):
+        return None
+    try:
+        return Decimal(raw)
+    except InvalidOperation:
+        raise ValidationError({name: "Ungültige Zahl."})
+
+
+def _list_param(params, name):
+    """Unterstützt ?name=1&name=2 sowie ?name=1,2."""
+    values = []
+    for raw in params.getlist(name):
+        values.extend(v.strip() for v in raw.split(",") if v.strip())
+    return values
+
+
+def parse_attribute_filters(params):
+    """
+    `attr=size:M&attr=color:red` -> {"size": {"m"}, "color": {"red"}}.
+    Mehrere Werte desselben Typs sind ODER-verknüpft, verschiedene Typen UND.
+    """
+    groups = {}
+    for raw in params.getlist("attr"):
+        name, sep, value = raw.partition(":")
+        if not sep or not name.strip() or not value.strip():
+            raise ValidationError({"attr": f"Erwartet Typ:Wert, erhalten '{raw}'."})
+        groups.setdefault(name.strip().lower(), set()).add(value.strip().lower())
+    return groups
+
+
+def filter_products(queryset, params):
+    """
+    Filtert Produkte nach Query-Parametern:
+
+    - category: Kategorie-ID(s)
+    - min_price / max_price
+    - min_rating: Mindest-Durchschnittsbewertung
+    - in_stock: nur Produkte mit Bestand (stock_total > 0)
+    - attr: Typ:Wert, z.B. attr=size:M&attr=color:red; eine einzelne
+      Variation muss alle angegebenen Attribut-Typen erfüllen
+    """
+    categories = _list_param(params, "category")
+    if categories:
+        try:
+            queryset = queryset.filter(category_id__in=[int(c) for c in categories])
+        except ValueError:
+            raise ValidationError({"category": "Kategorie-IDs müssen Zahlen sein."})
+
+    min_price = _decimal_param(params, "min_price")
+    if min_price is not None:
+        queryset = queryset.filter(price__gte=min_price)
+    max_price = _decimal_param(params, "max_price")
+    if max_price is not None:
+        queryset = queryset.filter(price__lte=max_price)
+
+    min_rating = _decimal_param(params, "min_rating")
+    if min_rating is not None:
+        queryset = queryset.filter(rating_avg__gte=min_rating)
+
+    in_stock = params.get("in_stock", "").lower() in TRUE_VALUES
+    if in_stock:
+        queryset = queryset.filter(stock_total__gt=0)
+
+    groups = parse_attribute_filters(params)
+    if groups:
+        variations = ProductVariation.objects.filter(product=OuterRef("pk"))
+        if in_stock:
+            variations = variations.filter(stock__gt=0)
+        for type_name, values in groups.items():
+            matches = Q()
+            for value in values:
+                matches |= Q(value__iexact=value)
+            attribute_ids = AttributeValue.objects.filter(
+                matches, attribute_type__name__iexact=type_name
+            ).values("pk")
+            # eigener Join pro Typ: dieselbe Variation muss jeden Typ erfüllen
+            variations = variations.filter(attributes__in=attribute_ids)
+        queryset = queryset.filter(Exists(variations))
+
+    return queryset
+
+
+def product_facets(queryset):
+    """
+    Facetten-Zählungen für eine (bereits gefilterte) Produktmenge,
+    jeweils mit einer aggregierenden SQL-Query.
+    """
+    product_ids = queryset.order_by().values("pk")
+
+    categories = (
+        queryset.order_by()
+        .filter(category__isnull=False)
+        .values("category_id", "category__name", "category__display_name")
+        .annotate(count=Count("pk"))
+        .order_by("category__name")
+    )
+    attributes = (
+        AttributeValue.objects.filter(variations__product__in=product_ids)
+        .values("id", "attribute_type__name", "value")
+        .annotate(count=Count("variations__product", distinct=True))
+        .order_by("attribute_type__name", "value")
+    )
+    price = queryset.order_by().aggregate(min=Min("price"), max=Max("price"))
+
+    return {
+        "categories": [
+            {
+                "id": row["category_id"],
+                "name": row["category__name"],
+                "display_name": row["category__display_name"],
+                "count": row["count"],
+            }
+            for row in categories
+        ],
+        "attributes": [
+            {
+                "id": row["id"],
+                "attribute_type": row["attribute_type__name"],
+                "value": row["value"],
+                "count": row["count"],
+            }
+            for row in attributes
+        ],
+        "price": price,
+    }
+
+
+def _datetime_param(params, name, end_of_day=False):
+    """ISO-Datum (2026-10-01) oder Zeitpunkt (2026-10-01T12:00); Datum gilt ganztägig."""
+    raw = params.get(name)
+    if raw in (None, ""):
+        return None
+    value = parse_datetime(raw)
+    if value is None:
+        day = parse_date(raw)
+        if day is None:
+            raise ValidationError({name: "Ungültiges Datum (erwartet JJJJ-MM-TT)."})
+        value = datetime.combine(day, time.max if end_of_day else time.min)
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+def filter_orders(queryset, params, default_statuses=()):
+    """
+    Filtert Bestellungen nach Query-Parametern:
+
+    - status: Status-Werte (Liste), sonst `default_statuses`
+    - carrier: Versanddienstleister; "none" für Bestellungen ohne
+    - date_from / date_to: Bestelldatum (inklusive)
+    """
+    valid = {value for value, _ in Order.STATUS_CHOICES}
+    statuses = _list_param(params, "status") or list(default_statuses)
+    unknown = set(statuses) - valid
+    if unknown:
+        raise ValidationError({"status": f"Unbekannter Status: {', '.join(sorted(unknown))}"})
+    if statuses:
+        queryset = queryset.filter(status__in=statuses)
+
+    carriers = _list_param(params, "carrier")
+    if carriers:
+        valid_carriers = {value for value, _ in Order.SHIPPING_CARRIER_CHOICES}
+        unknown = set(carriers) - valid_carriers - {"none"}
+        if unknown:
+            raise ValidationError({"carrier": f"Unbekannter Versanddienstleister: {', '.join(sorted(unknown))}"})
+        condition = Q(shipping_carrier__in=[c for c in carriers if c != "none"])
+        if "none" in carriers:
+            condition |= Q(shipping_carrier__isnull=True) | Q(shipping_carrier="")
+        queryset = queryset.filter(condition)
+
+    date_from = _datetime_param(params, "date_from")
+    date_to = _datetime_param(params, "date_to", end_of_day=True)
+    if date_from:
+        queryset = queryset.filter(created_at__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(created_at__lte=date_to)
+    return queryset
+
+
+RETURN_TABS = {
+    "open": OrderReturn.OPEN_STATUSES,
+    "closed": OrderReturn.CLOSED_STATUSES,
+    "rejected": ("rejected",),
+    "refunded": ("refunded",),
+}
+
+
+def filter_returns(queryset, params):
+    """
+    Filtert Retouren nach Query-Parametern:
+
+    - tab: open | closed | rejected | refunded (Tabs der Versand-Ansicht)
+    - status: Status-Werte (Liste), zusätzlich zum Tab
+    - reason: Rückgabegründe (Liste)
+    - date_from / date_to: Eingangsdatum der Retour (inklusive)
+    """
+    tab = params.get("tab")
+    if tab:
+        if tab not in RETURN_TABS:
+            raise ValidationError({"tab": f"Unbekannter Tab. Erlaubt: {', '.join(RETURN_TABS)}"})
+        queryset = queryset.filter(status__in=RETURN_TABS[tab])
+
+    statuses = _list_param(params, "status")
+    unknown = set(statuses) - {value for value, _ in OrderReturn.STATUS_CHOICES}
+    if unknown:
+        raise ValidationError({"status": f"Unbekannter Status: {', '.join(sorted(unknown))}"})
+    if statuses:
+        queryset = queryset.filter(status__in=statuses)
+
+    reasons = _list_param(params, "reason")
+    unknown = set(reasons) - {value for value, _ in OrderReturn.REASON_CHOICES}
+    if unknown:
+        raise ValidationError({"reason": f"Unbekannter Rückgabegrund: {', '.join(sorted(unknown))}"})
+    if reasons:
+        queryset = queryset.filter(reason__in=reasons)
+
+    date_from = _datetime_param(params, "date_from")
+    date_to = _datetime_param(params, "date_to", end_of_day=True)
+    if date_from:
+        queryset = queryset.filter(created_at__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(created_at__lte=date_to)
+    return queryset
@@ -0,0 +1,65 @@
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.template import Context, Engine
+from django.utils import timezone
+
+from shop.models import Order, OrderItem, ReturnRequest
+from shop.services.email_service import RETURN_EMAILS, email_context, render_return_email
+
+
+class Command(BaseCommand):
+    help = (
+        "Misst, wie viele Retouren-E-Mails pro Sekunde gerendert werden – mit dem "
+        "gecachten Template-Loader und zum Vergleich mit erneutem Parsen je E-Mail."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=10000, help="Renderings pro Status (Standard: 10000)")
+        parser.add_argument(
+            "--status",
+            choices=sorted(RETURN_EMAILS),
+            action="append",
+            help="Nur diese(n) Status messen (mehrfach möglich)",
+        )
+
+    def _sample(self, status):
+        # Objekte nur im Speicher: gemessen wird das Rendern, nicht die Datenbank
+        user = get_user_model()(pk=1, username="kunde", email="kunde@example.com")
+        order = Order(pk=1000, user=user, total=Decimal("59.90"))
+        item = OrderItem(pk=1, order=order, product_title="Blaues Hemd", price=Decimal("59.90"), quantity=1)
+        return ReturnRequest(
+            pk=1, order=order, item=item, user=user, reason="defekt", status=status,
+            rejection_reason="zeitraum_abgelaufen", refund_name="Kunde", refund_amount=Decimal("59.90"),
+            refund_iban="DE89370400440532013000", created_at=timezone.now(),
+        )
+
+    def _rate(self, count, func):
+        started = time.perf_counter()
+        for _ in range(count):
+            func()
+        return count / (time.perf_counter() - started)
+
+    def handle(self, *args, **options):
+        count = options["count"]
+        # eigene Engine ohne Cache-Loader: jedes get_template liest und parst neu
+        uncached = Engine(loaders=["django.template.loaders.app_directories.Loader"])
+
+        self.stdout.write(f"{'Status':<12}{'gecacht/s':>12}{'ungecacht/s':>14}{'Faktor':>9}")
+        for status in options["status"] or sorted(RETURN_EMAILS):
+            return_request = self._sample(status)
+            kind = RETURN_EMAILS[status][0]
+            render_return_email(return_request)  # Templates kompilieren/cachen
+
+            def render_uncached():
+                context = Context(email_context(return_request, status))
+                uncached.get_template(f"shop/emails/{kind}.txt").render(context)
+                uncached.get_template(f"shop/emails/{kind}.html").render(context)
+
+            cached_rate = self._rate(count, lambda: render_return_email(return_request))
+            uncached_rate = self._rate(max(count // 10, 1), render_uncached)
+            self.stdout.write(
+                f"{status:<12}{cached_rate:>12.0f}{uncached_rate:>14.0f}{cached_rate / uncached_rate:>8.1f}x"
+            )
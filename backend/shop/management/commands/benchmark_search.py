@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from shop.search import search_product_ids
+
+
+class Command(BaseCommand):
+    help = "Vergleicht die Antwortzeit der Volltextsuche mit der icontains-Suche."
+
+    def add_arguments(self, parser):
+        parser.add_argument("queries", nargs="+", help="Suchbegriffe, z.B. hemd 'blaue jacke'")
+        parser.add_argument("--repeat", type=int, default=50, help="Wiederholungen pro Suchbegriff")
+        parser.add_argument("--limit", type=int, default=20, help="Maximale Trefferzahl")
+
+    def _measure(self, query, backend, repeat, limit):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            ids = search_product_ids(query, limit=limit, backend=backend)
+        return (time.perf_counter() - started) * 1000 / repeat, len(ids)
+
+    def handle(self, *args, **options):
+        repeat, limit = options["repeat"], options["limit"]
+        self.stdout.write(f"{'Suche':<25}{'Volltext ms':>14}{'icontains ms':>14}{'Faktor':>9}")
+        for query in options["queries"]:
+            fts_ms, fts_hits = self._measure(query, None, repeat, limit)
+            like_ms, like_hits = self._measure(query, "icontains", repeat, limit)
+            factor = like_ms / fts_ms if fts_ms else 0
+            self.stdout.write(
+                f"{query[:24]:<25}{fts_ms:>14.3f}{like_ms:>14.3f}{factor:>8.1f}x"
+                f"   ({fts_hits} / {like_hits} Treffer)"
+            )
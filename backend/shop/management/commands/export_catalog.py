@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.services.export_service import FORMATS, export_chunks
+
+
+class Command(BaseCommand):
+    help = "Exportiert alle Produkte als CSV oder JSONL (Stream, konstanter Speicherbedarf)."
+    dataset = "catalog"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=FORMATS, default="csv", help="Ausgabeformat (Standard: csv)")
+        parser.add_argument("--output", "-o", help="Zieldatei (Standard: stdout)")
+        parser.add_argument("--gzip", action="store_true", help="Ausgabe gzip-komprimieren")
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Zeilen pro Datenbankabruf (Standard: 2000)",
+        )
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size muss mindestens 1 sein.")
+        if options["gzip"] and not options["output"]:
+            raise CommandError("--gzip benötigt --output.")
+
+        started = time.perf_counter()
+        chunks = export_chunks(
+            self.dataset,
+            fmt=options["format"],
+            gzip=options["gzip"],
+            chunk_size=options["chunk_size"],
+        )
+
+        if not options["output"]:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
+            return
+
+        written = 0
+        with open(options["output"], "wb") as handle:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode("utf-8")
+                handle.write(chunk)
+                written += len(chunk)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{options['output']}: {written} Bytes in {time.perf_counter() - started:.1f}s geschrieben."
+        ))
@@ -0,0 +1,6 @@
+from .export_catalog import Command as ExportCatalogCommand
+
+
+class Command(ExportCatalogCommand):
+    help = "Exportiert alle Bestellpositionen mit Bestelldaten als CSV oder JSONL (Stream)."
+    dataset = "orders"
@@ -0,0 +1,70 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.services.catalog_import import ProductImporter, iter_csv, iter_jsonl
+
+
+class Command(BaseCommand):
+    help = (
+        "Importiert Produkte mit Variationen, Attributwerten und Bildern aus CSV- "
+        "oder JSONL-Dateien (Format siehe shop/services/catalog_import.py)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("files", nargs="+", help="CSV- oder JSONL-Dateien")
+        parser.add_argument(
+            "--format",
+            choices=["csv", "jsonl"],
+            help="Dateiformat (Standard: anhand der Dateiendung)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Produkte pro Transaktion (Standard: 1000)",
+        )
+        parser.add_argument(
+            "--update",
+            action="store_true",
+            help="Bestehende Produkte (gleicher Titel) aktualisieren statt neu anlegen",
+        )
+
+    def _progress(self, stats):
+        self.stdout.write(
+            f"  {stats.rows} Zeilen, {stats.created} neu, {stats.updated} aktualisiert "
+            f"({stats.rows_per_second:.0f} Zeilen/s)"
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size muss mindestens 1 sein.")
+
+        importer = ProductImporter(
+            batch_size=options["batch_size"],
+            update=options["update"],
+            progress=self._progress if options["verbosity"] >= 2 else None,
+        )
+
+        for name in options["files"]:
+            path = Path(name)
+            if not path.exists():
+                raise CommandError(f"Datei nicht gefunden: {path}")
+            fmt = options["format"] or ("csv" if path.suffix.lower() == ".csv" else "jsonl")
+            reader = iter_csv if fmt == "csv" else iter_jsonl
+            self.stdout.write(f"Importiere {path} ({fmt}) ...")
+            with path.open(encoding="utf-8", newline="") as handle:
+                importer.run(reader(handle))
+
+        stats = importer.stats
+        for line_no, message in stats.errors[:50]:
+            self.stderr.write(f"Zeile {line_no}: {message}")
+        if len(stats.errors) > 50:
+            self.stderr.write(f"... und {len(stats.errors) - 50} weitere Fehler")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats.created} Produkt(e) angelegt, {stats.updated} aktualisiert, "
+            f"{stats.variations} Variation(en), {stats.images} Bild(er), "
+            f"{len(stats.errors)} Fehler – {stats.rows} Zeilen in {stats.seconds:.1f}s "
+            f"({stats.rows_per_second:.0f} Zeilen/s)"
+        ))
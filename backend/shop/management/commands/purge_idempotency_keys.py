@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from shop.services.idempotency_service import key_ttl, purge_expired
+
+
+class Command(BaseCommand):
+    help = "Löscht abgelaufene Idempotency-Keys des Checkouts."
+
+    def handle(self, *args, **options):
+        deleted = purge_expired()
+        self.stdout.write(
+            self.style.SUCCESS(f"{deleted} Idempotency-Key(s) älter als {key_ttl()} gelöscht.")
+        )
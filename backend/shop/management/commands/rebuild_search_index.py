@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from shop.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Baut den SQLite-FTS5-Suchindex der Produkte neu auf."
+
+    def handle(self, *args, **options):
+        count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"{count} Produkt(e) indiziert."))
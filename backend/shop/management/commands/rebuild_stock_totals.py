@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.db.models.functions import Coalesce
+
+from shop.models import Product, refresh_stock_totals
+
+
+class Command(BaseCommand):
+    help = "Prüft Product.stock_total gegen die Variationsbestände und korrigiert Abweichungen."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Nur prüfen, nichts schreiben (Exit-Code 1 bei Abweichungen).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Anzahl Produkte pro UPDATE (Standard: 1000).",
+        )
+
+    def handle(self, *args, **options):
+        drifted = list(
+            Product.objects.annotate(actual=Coalesce(Sum("variations__stock"), 0))
+            .filter(~Q(stock_total=F("actual")))
+            .values_list("id", "stock_total", "actual")
+        )
+
+        for pid, stored, actual in drifted:
+            self.stdout.write(f"Produkt #{pid}: gespeichert {stored}, tatsächlich {actual}")
+
+        if options["check"]:
+            if drifted:
+                raise CommandError(f"{len(drifted)} Produkt(e) mit falschem stock_total.")
+            self.stdout.write(self.style.SUCCESS("Alle stock_total-Werte sind korrekt."))
+            return
+
+        ids = [pid for pid, _, _ in drifted]
+        batch_size = options["batch_size"]
+        with transaction.atomic():
+            for start in range(0, len(ids), batch_size):
+                refresh_stock_totals(ids[start:start + batch_size])
+
+        self.stdout.write(self.style.SUCCESS(f"{len(ids)} Produkt(e) korrigiert."))
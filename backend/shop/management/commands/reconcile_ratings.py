@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
+
+from shop.models import Product, recalculate_product_ratings
+
+
+class Command(BaseCommand):
+    help = "Gleicht rating_sum/rating_count der Produkte mit den freigegebenen Bewertungen ab."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Nur prüfen, nichts schreiben (Fehler bei Abweichungen).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Anzahl Produkte pro UPDATE (Standard: 1000).",
+        )
+
+    def handle(self, *args, **options):
+        approved = Q(reviews__approved=True)
+        drifted = list(
+            Product.objects.annotate(
+                actual_sum=Coalesce(Sum("reviews__rating", filter=approved), 0),
+                actual_count=Count("reviews", filter=approved),
+            )
+            .filter(~Q(rating_sum=F("actual_sum")) | ~Q(rating_count=F("actual_count")))
+            .values_list("id", "rating_sum", "rating_count", "actual_sum", "actual_count")
+        )
+
+        for pid, stored_sum, stored_count, actual_sum, actual_count in drifted:
+            self.stdout.write(
+                f"Produkt #{pid}: gespeichert {stored_sum}/{stored_count}, "
+                f"tatsächlich {actual_sum}/{actual_count}"
+            )
+
+        if options["check"]:
+            if drifted:
+                raise CommandError(f"{len(drifted)} Produkt(e) mit abweichender Bewertung.")
+            self.stdout.write(self.style.SUCCESS("Alle Bewertungsaggregate sind korrekt."))
+            return
+
+        ids = [row[0] for row in drifted]
+        batch_size = options["batch_size"]
+        with transaction.atomic():
+            for start in range(0, len(ids), batch_size):
+                recalculate_product_ratings(ids[start:start + batch_size])
+
+        self.stdout.write(self.style.SUCCESS(f"{len(ids)} Produkt(e) korrigiert."))
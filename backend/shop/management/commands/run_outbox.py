@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.services.outbox_service import process_batch, release_stale_claims
+
+
+class Command(BaseCommand):
+    help = (
+        "Stellt wartende E-Mails aus dem Ausgang zu (Thread-Pool, eine SMTP-Verbindung "
+        "pro Worker, Wiederholung mit Backoff)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="Parallele Sende-Threads (Standard: 4)")
+        parser.add_argument("--batch-size", type=int, default=100, help="E-Mails pro Durchlauf (Standard: 100)")
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Dauerhaft laufen und den Ausgang regelmäßig abfragen",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5.0,
+            help="Wartezeit in Sekunden, wenn der Ausgang leer ist (nur mit --loop)",
+        )
+
+    def handle(self, *args, **options):
+        if options["workers"] < 1 or options["batch_size"] < 1:
+            raise CommandError("--workers und --batch-size müssen mindestens 1 sein.")
+
+        sent = failed = 0
+        started = time.perf_counter()
+        try:
+            while True:
+                # in jedem Durchlauf, damit auch im --loop-Betrieb Nachrichten abgestürzter
+                # Worker wieder zugestellt werden
+                released = release_stale_claims()
+                if released:
+                    self.stdout.write(f"{released} verwaiste E-Mail(s) wieder eingereiht.")
+                result = process_batch(limit=options["batch_size"], workers=options["workers"])
+                sent += result["sent"]
+                failed += result["failed"]
+                if result["sent"] or result["failed"]:
+                    if options["verbosity"] >= 2:
+                        self.stdout.write(f"  {result['sent']} gesendet, {result['failed']} fehlgeschlagen")
+                    continue
+                if not options["loop"]:
+                    break
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{sent} E-Mail(s) gesendet, {failed} Fehlversuch(e) in {time.perf_counter() - started:.1f}s."
+        ))
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:39
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def populate_stock_total(apps, schema_editor):
+    Product = apps.get_model('shop', 'Product')
+    ProductVariation = apps.get_model('shop', 'ProductVariation')
+    totals = (
+        ProductVariation.objects.filter(product=OuterRef('pk'))
+        .order_by()
+        .values('product')
+        .annotate(total=Sum('stock'))
+        .values('total')
+    )
+    Product.objects.update(stock_total=Coalesce(Subquery(totals), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0029_product_created_at_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='stock_total',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(populate_stock_total, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:52
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def populate_rating_sum(apps, schema_editor):
+    Product = apps.get_model('shop', 'Product')
+    Review = apps.get_model('shop', 'Review')
+    approved = (
+        Review.objects.filter(product=OuterRef('pk'), approved=True)
+        .order_by()
+        .values('product')
+    )
+    Product.objects.update(
+        rating_sum=Coalesce(Subquery(approved.annotate(total=Sum('rating')).values('total')), 0),
+        rating_count=Coalesce(Subquery(approved.annotate(cnt=Count('id')).values('cnt')), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0030_product_stock_total'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_rating_sum, migrations.RunPython.noop),
+    ]
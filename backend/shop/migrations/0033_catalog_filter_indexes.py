@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0032_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attributevalue',
+            index=models.Index(fields=['attribute_type', 'value'], name='shop_attrib_attribu_1f2705_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'price'], name='shop_produc_categor_d4b9f0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['rating_avg'], name='shop_produc_rating__55d98a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productvariation',
+            index=models.Index(fields=['product', 'stock'], name='shop_produc_product_329e85_idx'),
+        ),
+    ]
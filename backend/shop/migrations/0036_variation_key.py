@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:05
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def populate_variation_key(apps, schema_editor):
+    ProductVariation = apps.get_model('shop', 'ProductVariation')
+    Through = ProductVariation.attributes.through
+
+    pairs = defaultdict(list)
+    for variation_id, name, value in Through.objects.values_list(
+        'productvariation_id', 'attributevalue__attribute_type__name', 'attributevalue__value'
+    ).iterator(chunk_size=2000):
+        pairs[variation_id].append((name.strip().lower(), value.strip().lower()))
+
+    seen = {}
+    duplicates = []
+    batch = []
+    for variation_id, product_id in ProductVariation.objects.values_list('pk', 'product_id').iterator(chunk_size=2000):
+        key = '|'.join(f'{name}:{value}' for name, value in sorted(pairs.get(variation_id, ())))
+        if key and (product_id, key) in seen:
+            duplicates.append((seen[(product_id, key)], variation_id))
+        seen.setdefault((product_id, key), variation_id)
+        batch.append(ProductVariation(pk=variation_id, variation_key=key))
+    ProductVariation.objects.bulk_update(batch, ['variation_key'], batch_size=1000)
+
+    if duplicates:
+        raise RuntimeError(
+            'Variationen mit gleicher Attributkombination (bitte zusammenführen): '
+            + ', '.join(f'{a}/{b}' for a, b in duplicates[:20])
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0035_updated_at_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productvariation',
+            name='variation_key',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(populate_variation_key, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='productvariation',
+            constraint=models.UniqueConstraint(condition=models.Q(('variation_key', ''), _negated=True), fields=('product', 'variation_key'), name='unique_product_variation_key'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0038_outboxemail'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='orderreturn',
+            index=models.Index(fields=['status', 'created_at'], name='shop_orderr_status_3d705b_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:19
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0039_orderreturn_status_created_at_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReturnStatusChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('old_status', models.CharField(choices=[('pending', 'Offen'), ('approved', 'Genehmigt'), ('rejected', 'Abgelehnt'), ('received', 'Eingetroffen'), ('refunded', 'Erstattet')], max_length=20)),
+                ('new_status', models.CharField(choices=[('pending', 'Offen'), ('approved', 'Genehmigt'), ('rejected', 'Abgelehnt'), ('received', 'Eingetroffen'), ('refunded', 'Erstattet')], max_length=20)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('changed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('return_request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_changes', to='shop.orderreturn')),
+            ],
+            options={
+                'ordering': ['changed_at', 'id'],
+            },
+        ),
+    ]
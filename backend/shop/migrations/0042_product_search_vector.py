@@ -0,0 +1,41 @@
+from django.db import migrations
+
+# Gespeicherte tsvector-Spalte mit GIN-Index für die PostgreSQL-Suche
+# (shop/search.py). Als GENERATED-Spalte pflegt PostgreSQL sie selbst, auch
+# bei bulk_create/bulk_update/update() ohne Signale. Das Modell kennt die
+# Spalte nicht; SQLite nutzt weiterhin die FTS5-Tabelle aus 0034.
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('simple'::regconfig, COALESCE(title, '')), 'A') || "
+    "setweight(to_tsvector('simple'::regconfig, COALESCE(description, '')), 'B')"
+)
+
+
+def add_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f"ALTER TABLE shop_product ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        f"GENERATED ALWAYS AS ({SEARCH_VECTOR_SQL}) STORED"
+    )
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS shop_product_search_vector_gin "
+        "ON shop_product USING gin (search_vector)"
+    )
+
+
+def drop_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS shop_product_search_vector_gin")
+    schema_editor.execute("ALTER TABLE shop_product DROP COLUMN IF EXISTS search_vector")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0041_product_ratings_not_editable'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_search_vector, drop_search_vector),
+    ]
@@ -1,16 +1,25 @@
+import threading
+from contextlib import contextmanager
+
 from django.db import models
 from django.conf import settings
-from django.db.models import Avg, Count
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, DecimalField, F, FloatField, OuterRef, Prefetch, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, Now, NullIf, Round
 from django.dispatch import receiver
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_delete
+from django.utils import timezone
 from django.utils.text import slugify
 
+from .cache import bump_generation
+
 
 class Category(models.Model):
     """Produktkategorie (z. B. Kleidung, Elektronik etc.)"""
     name = models.CharField(max_length=100)
     # Optionaler, lokalisierter Anzeigename (z.B. Deutsch)
     display_name = models.CharField(max_length=100, blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         # If display_name is available, prefer it for human-readable output
@@ -27,6 +36,35 @@ class DeliveryTime(models.Model):
         return f"{self.name} ({self.min_days}-{self.max_days} Tage)"
 
 
+# Anzahl der freigegebenen Bewertungen, die mit einem Produkt ausgeliefert werden
+RECENT_REVIEWS_LIMIT = 5
+
+
+class ProductQuerySet(models.QuerySet):
+    def for_catalog(self):
+        """
+        Lädt alle Relationen, die ProductSerializer braucht, in einer festen
+        Anzahl von Queries (unabhängig von der Anzahl der Produkte).
+        Die neuesten freigegebenen Bewertungen landen in `prefetched_recent_reviews`.
+        """
+        recent_reviews = (
+            Review.objects.filter(approved=True)
+            .select_related("user")
+            .order_by("-created_at", "-id")[:RECENT_REVIEWS_LIMIT]
+        )
+        variations = ProductVariation.objects.prefetch_related(
+            Prefetch(
+                "attributes",
+                queryset=AttributeValue.objects.select_related("attribute_type"),
+            )
+        )
+        return self.select_related("category").prefetch_related(
+            "images",
+            Prefetch("variations", queryset=variations),
+            Prefetch("reviews", queryset=recent_reviews, to_attr="prefetched_recent_reviews"),
+        )
+
+
 class Product(models.Model):
     title = models.CharField(max_length=255)
     slug = models.SlugField(max_length=255, unique=False, blank=True, null=True)
@@ -52,16 +90,46 @@ class Product(models.Model):
         related_name="products"
     )
 
-    # Bewertungsfelder
-    rating_avg = models.DecimalField(max_digits=3, decimal_places=2, default=0.00)
-    rating_count = models.PositiveIntegerField(default=0)
+    # Bewertungsfelder (per F()-Delta aus den Review-Signalen gepflegt)
+    rating_avg = models.DecimalField(max_digits=3, decimal_places=2, default=0.00, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    # Summe der freigegebenen Bewertungen; rating_avg = rating_sum / rating_count
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+
+    # Summe der Variationsbestände, denormalisiert für Filter/Sortierung in SQL.
+    # Wird über refresh_stock_totals() bzw. die ProductVariation-Signale gepflegt.
+    stock_total = models.PositiveIntegerField(default=0, db_index=True, editable=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
+    # Wird auch bei Massen-Updates (stock_total, Bewertungen) explizit gesetzt
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = ProductQuerySet.as_manager()
+
+    # Denormalisierte Spalten, die nur per UPDATE (Signale, refresh_*) geschrieben werden
+    DERIVED_FIELDS = ("rating_avg", "rating_count", "rating_sum", "stock_total")
+
+    class Meta:
+        indexes = [
+            # Keyset-Pagination der Produktliste
+            models.Index(fields=["created_at", "id"]),
+            # Filter der Produktliste (shop/filters.py)
+            models.Index(fields=["category", "price"]),
+            models.Index(fields=["rating_avg"]),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.slug:
             generated = slugify(self.title)
             self.slug = generated or f"product-{self.id or ''}"
+        if not self._state.adding and not kwargs.get("force_insert") and kwargs.get("update_fields") is None:
+            # Ein veraltetes Objekt (Admin, Serializer) darf die per Delta gepflegten
+            # Bewertungs- und Bestandssummen nicht mit alten Werten überschreiben
+            kwargs["update_fields"] = [
+                field.attname
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.DERIVED_FIELDS
+            ]
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -84,10 +152,6 @@ class Product(models.Model):
         # Fallback
         return "/media/default.png"
 
-    @property
-    def stock_total(self):
-        return sum((v.stock or 0) for v in self.variations.all())
-
 
 class ProductImage(models.Model):
     """Zusätzliche Bilder zu einem Produkt"""
@@ -131,6 +195,11 @@ class AttributeValue(models.Model):
     attribute_type = models.ForeignKey(AttributeType, on_delete=models.CASCADE, related_name="values")
     value = models.CharField(max_length=50)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["attribute_type", "value"]),
+        ]
+
     def __str__(self):
         return f"{self.attribute_type.name}: {self.value}"
 
@@ -143,6 +212,22 @@ class ProductVariation(models.Model):
     )
     attributes = models.ManyToManyField(AttributeValue, related_name="variations")
     stock = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Normalisierte Attributkombination, z.B. "color:rot|size:m" (wird bei
+    # Attributänderungen über refresh_variation_keys gepflegt)
+    variation_key = models.CharField(max_length=255, blank=True, default="", editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["product", "stock"]),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "variation_key"],
+                condition=~models.Q(variation_key=""),
+                name="unique_product_variation_key",
+            ),
+        ]
 
     def __str__(self):
         attrs = ", ".join([f"{a.attribute_type.name}: {a.value}" for a in self.attributes.all()])
@@ -150,18 +235,239 @@ class ProductVariation(models.Model):
 
     @property
     def attributes_dict(self):
-        return {
-            a.attribute_type.name.lower(): a.value.lower()
-            for a in self.attributes.all()
-        }
+        return parse_variation_key(self.variation_key)
 
     @property
     def is_in_stock(self):
         return self.stock > 0
 
-    @property
-    def variation_key(self):
-        return "|".join([f"{k}:{v}" for k, v in self.attributes_dict.items()])
+
+def make_variation_key(pairs):
+    """
+    Normalisierter Schlüssel aus (Attributtyp, Wert)-Paaren: klein geschrieben,
+    nach Typ sortiert, z.B. [("Size", "M"), ("Color", "Rot")] -> "color:rot|size:m".
+    """
+    normalized = sorted(
+        (str(name).strip().lower(), str(value).strip().lower()) for name, value in pairs
+    )
+    return "|".join(f"{name}:{value}" for name, value in normalized)
+
+
+def parse_variation_key(key):
+    return dict(part.split(":", 1) for part in (key or "").split("|") if part)
+
+
+def refresh_variation_keys(variation_ids):
+    """
+    Berechnet variation_key der angegebenen Variationen mit zwei Abfragen neu
+    und schreibt nur geänderte Schlüssel zurück.
+    """
+    variation_ids = set(variation_ids)
+    if not variation_ids:
+        return 0
+    pairs = {pk: [] for pk in variation_ids}
+    through = ProductVariation.attributes.through
+    for variation_id, name, value in through.objects.filter(
+        productvariation_id__in=variation_ids
+    ).values_list("productvariation_id", "attributevalue__attribute_type__name", "attributevalue__value"):
+        pairs[variation_id].append((name, value))
+
+    changed = [
+        ProductVariation(pk=pk, variation_key=make_variation_key(pairs[pk]))
+        for pk, current in ProductVariation.objects.filter(pk__in=variation_ids).values_list("pk", "variation_key")
+        if current != make_variation_key(pairs[pk])
+    ]
+    if len(changed) > 1:
+        # erst leeren, damit getauschte Schlüssel nicht kurzzeitig kollidieren
+        ProductVariation.objects.filter(pk__in=[v.pk for v in changed]).update(variation_key="")
+    ProductVariation.objects.bulk_update(changed, ["variation_key"])
+    if changed:
+        bump_generation("shop.ProductVariation")
+    return len(changed)
+
+
+def variation_key_taken(product_id, attribute_ids, exclude_pk=None):
+    """
+    True, wenn das Produkt bereits eine Variation mit dieser Attributkombination
+    hat (Prüfung vor dem Speichern statt IntegrityError aus der Constraint).
+    """
+    key = make_variation_key(
+        AttributeValue.objects.filter(pk__in=attribute_ids).values_list("attribute_type__name", "value")
+    )
+    if not key:
+        return False
+    return ProductVariation.objects.filter(product_id=product_id, variation_key=key).exclude(pk=exclude_pk).exists()
+
+
+_key_refresh = threading.local()
+
+
+@contextmanager
+def deferred_variation_key_refresh():
+    """
+    Berechnet variation_key der innerhalb des Blocks geänderten Variationen
+    erst am Ende neu. attributes.set() entfernt und ergänzt Werte in zwei
+    Schritten; der Zwischenstand darf nicht gegen unique_product_variation_key
+    geprüft werden. Eine echte Kollision löst am Ende IntegrityError aus.
+    """
+    if getattr(_key_refresh, "pending", None) is not None:
+        # verschachtelt: der äußere Block aktualisiert
+        yield
+        return
+    _key_refresh.pending = pending = set()
+    try:
+        yield
+    finally:
+        _key_refresh.pending = None
+    if pending:
+        refresh_variation_keys(pending)
+
+
+def _variation_keys_changed(variation_ids):
+    pending = getattr(_key_refresh, "pending", None)
+    if pending is not None:
+        pending.update(variation_ids)
+    else:
+        refresh_variation_keys(variation_ids)
+
+
+@receiver(m2m_changed, sender=ProductVariation.attributes.through)
+def variation_attributes_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            _variation_keys_changed([instance.pk])
+    elif action == "pre_clear":
+        # clear() liefert kein pk_set; betroffene Variationen vorher merken
+        instance._cleared_variation_ids = list(instance.variations.values_list("pk", flat=True))
+    elif action == "post_clear":
+        _variation_keys_changed(getattr(instance, "_cleared_variation_ids", ()))
+    elif action in ("post_add", "post_remove"):
+        _variation_keys_changed(pk_set)
+
+
+def touch_products(product_ids):
+    """
+    Setzt Product.updated_at für Änderungen an mitgelieferten Daten ohne
+    eigenen Zeitstempel (Bilder, Attributwerte/-typen), damit ETag und
+    Last-Modified der Produktdarstellung sie erfassen.
+    """
+    Product.objects.filter(pk__in=product_ids).update(updated_at=Now())
+    bump_generation("shop.Product")
+
+
+@receiver(post_save, sender=AttributeValue)
+def attribute_value_renamed(sender, instance: AttributeValue, created, **kwargs):
+    if not created:
+        refresh_variation_keys(instance.variations.values_list("pk", flat=True))
+        touch_products(instance.variations.values("product_id"))
+
+
+@receiver(post_save, sender=AttributeType)
+def attribute_type_renamed(sender, instance: AttributeType, created, **kwargs):
+    if not created:
+        variations = ProductVariation.objects.filter(attributes__attribute_type=instance)
+        refresh_variation_keys(variations.values_list("pk", flat=True))
+        touch_products(variations.values("product_id"))
+
+
+@receiver(pre_delete, sender=AttributeValue)
+def attribute_value_deleting(sender, instance: AttributeValue, **kwargs):
+    instance._variation_ids = list(instance.variations.values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=AttributeValue)
+def attribute_value_deleted(sender, instance: AttributeValue, **kwargs):
+    variation_ids = getattr(instance, "_variation_ids", ())
+    refresh_variation_keys(variation_ids)
+    if variation_ids:
+        touch_products(ProductVariation.objects.filter(pk__in=variation_ids).values("product_id"))
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def product_image_changed(sender, instance: ProductImage, **kwargs):
+    touch_products([instance.product_id])
+
+
+def refresh_stock_totals(product_ids):
+    """
+    Setzt Product.stock_total für die angegebenen Produkte mit einem einzigen
+    UPDATE auf die Summe ihrer Variationsbestände.
+    """
+    totals = (
+        ProductVariation.objects.filter(product=OuterRef("pk"))
+        .order_by()
+        .values("product")
+        .annotate(total=Sum("stock"))
+        .values("total")
+    )
+    updated = Product.objects.filter(pk__in=product_ids).update(
+        stock_total=Coalesce(Subquery(totals), 0),
+        updated_at=Now(),
+    )
+    bump_generation("shop.Product")
+    return updated
+
+
+_stock_refresh = threading.local()
+
+
+@contextmanager
+def deferred_stock_refresh():
+    """
+    Sammelt die Produkte, deren Variationen innerhalb des Blocks gespeichert
+    oder gelöscht werden, und aktualisiert stock_total erst am Ende – einmal
+    statt pro Variation (z. B. beim Löschen vieler Variationen per QuerySet).
+    """
+    if getattr(_stock_refresh, "pending", None) is not None:
+        # verschachtelt: der äußere Block aktualisiert
+        yield
+        return
+    _stock_refresh.pending = pending = set()
+    try:
+        yield
+    finally:
+        _stock_refresh.pending = None
+    if pending:
+        refresh_stock_totals(pending)
+
+
+def _variation_stock_changed(product_id):
+    pending = getattr(_stock_refresh, "pending", None)
+    if pending is not None:
+        pending.add(product_id)
+    else:
+        refresh_stock_totals([product_id])
+
+
+@receiver(post_save, sender=ProductVariation)
+def variation_saved(sender, instance: ProductVariation, **kwargs):
+    _variation_stock_changed(instance.product_id)
+
+
+@receiver(post_delete, sender=ProductVariation)
+def variation_deleted(sender, instance: ProductVariation, **kwargs):
+    _variation_stock_changed(instance.product_id)
+
+
+class OrderQuerySet(models.QuerySet):
+    def with_return_count(self):
+        """Annotiert `return_count` (Anzahl der Retouren) per Subquery statt COUNT pro Bestellung."""
+        returns = (
+            OrderReturn.objects.filter(order=OuterRef("pk"))
+            .order_by()
+            .values("order")
+            .annotate(c=Count("pk"))
+            .values("c")
+        )
+        return self.annotate(return_count=Coalesce(Subquery(returns), 0))
+
+    def for_listing(self):
+        """Alles, was OrderSerializer braucht, in einer festen Anzahl von Queries."""
+        return self.with_return_count().select_related("user").prefetch_related(
+            "items",
+            Prefetch("returns", queryset=OrderReturn.objects.select_related("item", "user")),
+        )
 
 
 class Order(models.Model):
@@ -200,6 +506,14 @@ class Order(models.Model):
     )
     tracking_number = models.CharField(max_length=100, blank=True, null=True)
 
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Versand-Warteschlange: WHERE status IN (...) ORDER BY created_at, id
+            models.Index(fields=["status", "created_at"]),
+        ]
+
     def __str__(self):
         return f"Order #{self.pk} by {self.user}"
 
@@ -219,6 +533,33 @@ class OrderItem(models.Model):
         return f"{self.quantity} × {self.product_title} (Order #{self.order_id})"
 
 
+class IdempotencyKey(models.Model):
+    """
+    Gespeicherte Antwort einer Bestellung zu einem Idempotency-Key.
+    Wiederholt der Client denselben Request (z.B. nach Timeout), wird die
+    ursprüngliche Antwort zurückgegeben statt erneut zu bestellen.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="idempotency_keys")
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    order = models.ForeignKey(Order, null=True, blank=True, on_delete=models.SET_NULL)
+    response_status = models.PositiveSmallIntegerField()
+    response_body = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "key"], name="unique_idempotency_key_per_user"),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.user})"
+
+
+# Bewertungszustand einer mit zurückgestellten Feldern geladenen Review
+RATING_STATE_UNKNOWN = object()
+
+
 class Review(models.Model):
     product = models.ForeignKey(Product, related_name="reviews", on_delete=models.CASCADE)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="product_reviews")
@@ -239,32 +580,113 @@ class Review(models.Model):
     def __str__(self):
         return f"Review {self.rating}★ for {self.product.title} by {self.user}"
 
-
-def _recalculate_product_rating(product: Product):
-    agg = product.reviews.filter(approved=True).aggregate(
-        avg=Avg("rating"),
-        cnt=Count("id")
+    # Felder, aus denen rating_contribution() berechnet wird
+    RATING_FIELDS = frozenset({"approved", "product_id", "rating"})
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Zustand beim Laden merken, damit beim Speichern nur das Delta angewendet wird.
+        # Bei only()/defer() nicht nachladen (rekursives from_db), sondern als
+        # unbekannt markieren; review_saved rechnet dann das Produkt neu.
+        if cls.RATING_FIELDS.issubset(field_names):
+            instance._rating_state = instance.rating_contribution()
+        else:
+            instance._rating_state = RATING_STATE_UNKNOWN
+            instance._loaded_product_id = instance.__dict__.get("product_id")
+        return instance
+
+    def rating_contribution(self):
+        """(product_id, rating), wenn die Bewertung in den Produktschnitt eingeht, sonst None."""
+        if not self.approved:
+            return None
+        return (self.product_id, self.rating)
+
+
+def _rating_avg_expression(rating_sum, rating_count):
+    avg = Cast(rating_sum, FloatField()) / NullIf(rating_count, 0)
+    return Coalesce(
+        Round(Cast(avg, DecimalField(max_digits=7, decimal_places=4)), 2),
+        Value(0),
+        output_field=DecimalField(max_digits=3, decimal_places=2),
     )
-    avg = agg["avg"] or 0
-    cnt = agg["cnt"] or 0
 
-    product.rating_count = cnt
-    product.rating_avg = round(float(avg), 2)
-    product.save(update_fields=["rating_avg", "rating_count"])
+
+def _apply_rating_delta(product_id, sum_delta, count_delta):
+    """Aktualisiert Summe, Anzahl und Schnitt eines Produkts in einem einzigen UPDATE."""
+    new_sum = F("rating_sum") + sum_delta
+    new_count = F("rating_count") + count_delta
+    Product.objects.filter(pk=product_id).update(
+        rating_sum=new_sum,
+        rating_count=new_count,
+        rating_avg=_rating_avg_expression(new_sum, new_count),
+        updated_at=Now(),
+    )
+    bump_generation("shop.Product")
+
+
+def _apply_review_change(old, new):
+    """old/new: Ergebnis von Review.rating_contribution() vor bzw. nach der Änderung."""
+    if old == new:
+        return
+    if old and new and old[0] == new[0]:
+        _apply_rating_delta(new[0], new[1] - old[1], 0)
+        return
+    if old:
+        _apply_rating_delta(old[0], -old[1], -1)
+    if new:
+        _apply_rating_delta(new[0], new[1], 1)
+
+
+def recalculate_product_ratings(product_ids):
+    """
+    Berechnet Summe, Anzahl und Schnitt der freigegebenen Bewertungen für die
+    angegebenen Produkte vollständig neu (ein UPDATE für alle Produkte).
+    """
+    approved = (
+        Review.objects.filter(product=OuterRef("pk"), approved=True)
+        .order_by()
+        .values("product")
+    )
+    new_sum = Coalesce(Subquery(approved.annotate(total=Sum("rating")).values("total")), 0)
+    new_count = Coalesce(Subquery(approved.annotate(cnt=Count("id")).values("cnt")), 0)
+    updated = Product.objects.filter(pk__in=product_ids).update(
+        rating_sum=new_sum,
+        rating_count=new_count,
+        rating_avg=_rating_avg_expression(new_sum, new_count),
+        updated_at=Now(),
+    )
+    bump_generation("shop.Product", "shop.Review")
+    return updated
 
 
 @receiver(post_save, sender=Review)
 def review_saved(sender, instance: Review, **kwargs):
+    old_state = getattr(instance, "_rating_state", None)
+    new_state = instance.rating_contribution()
     try:
-        _recalculate_product_rating(instance.product)
+        if old_state is RATING_STATE_UNKNOWN:
+            # alter Beitrag unbekannt: kein Delta, sondern vollständige Neuberechnung
+            product_ids = {instance.product_id, getattr(instance, "_loaded_product_id", None)}
+            recalculate_product_ratings([pk for pk in product_ids if pk is not None])
+        else:
+            _apply_review_change(old_state, new_state)
     except Exception:
         pass
+    instance._rating_state = new_state
+
+
+@receiver(pre_delete, sender=Review)
+def review_deleting(sender, instance: Review, **kwargs):
+    if getattr(instance, "_rating_state", None) is RATING_STATE_UNKNOWN:
+        # Zeile existiert noch: zurückgestellte Felder lassen sich jetzt nachladen
+        instance._rating_state = instance.rating_contribution()
 
 
 @receiver(post_delete, sender=Review)
 def review_deleted(sender, instance: Review, **kwargs):
     try:
-        _recalculate_product_rating(instance.product)
+        _apply_review_change(getattr(instance, "_rating_state", None), None)
     except Exception:
         pass
     
@@ -284,6 +706,9 @@ class OrderReturn(models.Model):
         ("received", "Eingetroffen"),
         ("refunded", "Erstattet"),
     )
+    # Tabs in der Versand-Ansicht
+    OPEN_STATUSES = ("pending", "approved", "received")
+    CLOSED_STATUSES = ("rejected", "refunded")
     
     order = models.ForeignKey(
         "Order",                 
@@ -361,8 +786,85 @@ class OrderReturn(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Versand-Retouren: WHERE status IN (...) ORDER BY created_at
+            models.Index(fields=["status", "created_at"]),
+        ]
+
     def __str__(self):
         return f"Retour #{self.id} für Order #{self.order_id} – {self.status}"
     
 # Kompatibilitäts-Alias: ReturnRequest wird an vielen Stellen erwartet
-ReturnRequest = OrderReturn
\ No newline at end of file
+ReturnRequest = OrderReturn
+
+class ReturnStatusChange(models.Model):
+    """
+    Verlauf der Statuswechsel einer Retour: eine Zeile pro Übergang, geschrieben
+    in derselben Transaktion wie der Übergang (siehe services/return_service.py).
+    """
+    return_request = models.ForeignKey(
+        OrderReturn,
+        on_delete=models.CASCADE,
+        related_name="status_changes",
+    )
+    old_status = models.CharField(max_length=20, choices=OrderReturn.STATUS_CHOICES)
+    new_status = models.CharField(max_length=20, choices=OrderReturn.STATUS_CHOICES)
+    changed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="+",
+    )
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["changed_at", "id"]
+
+    def __str__(self):
+        return f"Retour #{self.return_request_id}: {self.old_status} → {self.new_status}"
+
+
+class OutboxEmail(models.Model):
+    """
+    Transaktionaler E-Mail-Ausgang: Benachrichtigungen werden in derselben
+    Transaktion wie die auslösende Änderung gespeichert und von
+    `manage.py run_outbox` zugestellt (mit Wiederholungen und Backoff).
+    """
+    STATUS_CHOICES = (
+        ("pending", "Wartend"),
+        ("sending", "Wird gesendet"),
+        ("sent", "Gesendet"),
+        ("failed", "Fehlgeschlagen"),
+    )
+
+    kind = models.CharField(max_length=50)
+    return_request = models.ForeignKey(
+        OrderReturn,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="emails",
+    )
+    recipient = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True, default="")
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Worker: WHERE status = 'pending' AND next_attempt_at <= now ORDER BY next_attempt_at
+            models.Index(fields=["status", "next_attempt_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} an {self.recipient} ({self.status})"
@@ -0,0 +1,42 @@
+from rest_framework.pagination import CursorPagination
+
+
+class OptInCursorPagination(CursorPagination):
+    """
+    Keyset-Pagination, die nur greift, wenn der Client `cursor` oder
+    `page_size` mitschickt – ohne diese Parameter liefert die API weiterhin
+    die ungepaginierte Liste (kompatibel zum bestehenden Frontend).
+    """
+    page_size_query_param = "page_size"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = (self.cursor_query_param, self.page_size_query_param)
+        if not any(p in request.query_params for p in params):
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+
+class ProductCursorPagination(OptInCursorPagination):
+    """
+    Keyset-Pagination für den Produktkatalog.
+
+    Sortiert stabil nach (created_at, id), damit die Seiten auch bei
+    zehntausenden Produkten gleich schnell bleiben.
+    """
+    ordering = ("-created_at", "-id")
+    page_size = 24
+    max_page_size = 100
+
+
+class ShippingOrderCursorPagination(OptInCursorPagination):
+    """Versand-Warteschlange: älteste Bestellungen zuerst (Index status, created_at)."""
+    ordering = ("created_at", "id")
+    page_size = 50
+    max_page_size = 200
+
+
+class ShippingReturnCursorPagination(OptInCursorPagination):
+    """Versand-Retouren: neueste zuerst (Index status, created_at)."""
+    ordering = ("-created_at", "-id")
+    page_size = 50
+    max_page_size = 200
@@ -0,0 +1,154 @@
+"""
+Volltextsuche über Produkttitel und -beschreibung.
+
+Backends:
+- SQLite: FTS5-Tabelle `shop_product_fts` (rowid = Product.id), per
+  Signal bei save/delete gepflegt, Ranking über bm25()
+- PostgreSQL: gespeicherte tsvector-Spalte `search_vector` mit GIN-Index
+  (Migration 0042, von PostgreSQL selbst gepflegt), Ranking über SearchRank
+- sonst (oder ohne FTS5): icontains als Fallback
+
+Alle Backends unterstützen Präfixsuche ("hem" findet "Hemd") für Autocomplete.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Product
+
+FTS_TABLE = "shop_product_fts"
+MAX_TERMS = 10
+
+
+
+def search_terms(query):
+    return re.findall(r"\w+", query or "")[:MAX_TERMS]
+
+
+_fts5_ready = set()
+
+
+def _fts5_available():
+    if connection.vendor != "sqlite":
+        return False
+    # Positives Ergebnis pro Datenbank merken, um nicht bei jedem save() nachzuschlagen
+    name = connection.settings_dict["NAME"]
+    if name in _fts5_ready:
+        return True
+    if FTS_TABLE in connection.introspection.table_names():
+        _fts5_ready.add(name)
+        return True
+    return False
+
+
+def _fts5_match_expression(terms):
+    # Jeder Begriff als Phrase mit Präfix-Stern; mehrere Begriffe sind UND-verknüpft
+    return " ".join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+
+def _search_sqlite(terms, limit):
+    # Titel zählt bei bm25 zehnmal so viel wie die Beschreibung
+    sql = (
+        f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+        f"ORDER BY bm25({FTS_TABLE}, 10.0, 1.0)"
+    )
+    params = [_fts5_match_expression(terms)]
+    if limit:
+        sql += " LIMIT %s"
+        params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _search_postgres(terms, limit):
+    from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField
+
+    # Indizierte Spalte statt to_tsvector() pro Zeile und Abfrage
+    vector = RawSQL(f'"{Product._meta.db_table}"."search_vector"', [], output_field=SearchVectorField())
+    # to_tsquery mit :* für Präfixsuche; Begriffe bestehen nur aus \w-Zeichen
+    query = SearchQuery(" & ".join(f"{term}:*" for term in terms), search_type="raw", config="simple")
+    qs = (
+        Product.objects.annotate(search=vector, rank=SearchRank(vector, query))
+        .filter(search=query)
+        .order_by("-rank", "pk")
+        .values_list("pk", flat=True)
+    )
+    return list(qs[:limit] if limit else qs)
+
+
+def _search_icontains(terms, limit):
+    condition = Q()
+    for term in terms:
+        condition &= Q(title__icontains=term) | Q(description__icontains=term)
+    qs = Product.objects.filter(condition).order_by("title", "pk").values_list("pk", flat=True)
+    return list(qs[:limit] if limit else qs)
+
+
+def search_product_ids(query, limit=50, backend=None):
+    """
+    Liefert die IDs der passenden Produkte, beste Treffer zuerst.
+
+    Args:
+        query: Suchbegriff(e) des Nutzers
+        limit: maximale Anzahl Treffer (None = alle)
+        backend: "fts", "icontains" oder None für automatische Wahl
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+    if backend == "icontains":
+        return _search_icontains(terms, limit)
+    if connection.vendor == "postgresql":
+        return _search_postgres(terms, limit)
+    if _fts5_available():
+        return _search_sqlite(terms, limit)
+    return _search_icontains(terms, limit)
+
+
+def index_products(products):
+    """Schreibt die Produkte (neu) in den FTS5-Index."""
+    if not _fts5_available():
+        return
+    rows = [(p.pk, p.title or "", p.description or "") for p in products]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(row[0],) for row in rows])
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, description) VALUES (%s, %s, %s)", rows
+        )
+
+
+def unindex_product_ids(product_ids):
+    if not _fts5_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(pk,) for pk in product_ids])
+
+
+def rebuild_index():
+    """Baut den FTS5-Index komplett aus der Produkttabelle neu auf."""
+    if not _fts5_available():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, description) "
+            f"SELECT id, COALESCE(title, ''), COALESCE(description, '') FROM {Product._meta.db_table}"
+        )
+        return cursor.rowcount
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance: Product, **kwargs):
+    index_products([instance])
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance: Product, **kwargs):
+    unindex_product_ids([instance.pk])
@@ -1,5 +1,7 @@
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
 from .models import (
+    RECENT_REVIEWS_LIMIT,
     Product,
     Category,
     ProductImage,
@@ -11,9 +13,33 @@ from .models import (
     Order,
     ReturnRequest,
     OrderItem,
+    deferred_variation_key_refresh,
+    variation_key_taken,
 )
 
 
+class SparseFieldsMixin:
+    """
+    Erlaubt bei GET-Requests `?fields=id,title,...`, um nur die angefragten
+    Felder zu serialisieren. Nicht angefragte Felder (inkl. teurer
+    SerializerMethodFields) werden gar nicht erst berechnet.
+    Felder in `optional_fields` werden nur geliefert, wenn sie angefragt sind.
+    """
+    optional_fields = ()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get("request")
+        raw = request.query_params.get("fields") if request is not None and request.method == "GET" else None
+        if not raw:
+            for name in self.optional_fields:
+                self.fields.pop(name, None)
+            return
+        requested = {name.strip() for name in raw.split(",") if name.strip()}
+        for name in set(self.fields) - requested:
+            self.fields.pop(name)
+
+
 class ProductImageSerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
     
@@ -40,9 +66,16 @@ class AttributeValueSerializer(serializers.ModelSerializer):
         fields = ("id", "attribute_type", "value")
 
 
+class VariationAttributeSerializer(AttributeValueSerializer):
+    """Attributwert einer Variation; beim Schreiben zählt nur die ID."""
+    id = serializers.IntegerField()
+    value = serializers.CharField(required=False)
+
+
 class ProductVariationSerializer(serializers.ModelSerializer):
-    id = serializers.IntegerField(required=False, read_only=True)
-    attributes = AttributeValueSerializer(many=True)
+    # beschreibbar, damit beim Speichern eines Produkts bestehende Variationen erkannt werden
+    id = serializers.IntegerField(required=False)
+    attributes = VariationAttributeSerializer(many=True)
 
     class Meta:
         model = ProductVariation
@@ -60,29 +93,78 @@ class ProductVariationSerializer(serializers.ModelSerializer):
                 ids.append(aid)
         return ids
 
+    duplicate_message = "Für dieses Produkt gibt es bereits eine Variation mit dieser Attributkombination."
+
+    def _check_unique(self, product_id, attr_ids, exclude_pk=None):
+        # sonst schlägt unique_product_variation_key erst beim Speichern mit IntegrityError fehl
+        if product_id and variation_key_taken(product_id, attr_ids, exclude_pk):
+            raise serializers.ValidationError({"attributes": [self.duplicate_message]})
+
     def create(self, validated_data):
         attributes_data = validated_data.pop("attributes", [])
         validated_data.pop("id", None)  # don't pass id to create()
-        variation = ProductVariation.objects.create(**validated_data)
-        variation.attributes.set(self._attr_ids(attributes_data))
+        attr_ids = self._attr_ids(attributes_data)
+        product = validated_data.get("product")
+        self._check_unique(getattr(product, "pk", product), attr_ids)
+        try:
+            # Schlüssel erst nach dem vollständigen set() berechnen
+            with transaction.atomic(), deferred_variation_key_refresh():
+                variation = ProductVariation.objects.create(**validated_data)
+                variation.attributes.set(attr_ids)
+        except IntegrityError:
+            # parallel angelegte Kombination
+            raise serializers.ValidationError({"attributes": [self.duplicate_message]})
         return variation
 
     def update(self, instance, validated_data):
         attributes_data = validated_data.pop("attributes", None)
         validated_data.pop("id", None)
-        for key, value in validated_data.items():
-            setattr(instance, key, value)
-        instance.save()
         if attributes_data is not None:
-            instance.attributes.set(self._attr_ids(attributes_data))
+            attr_ids = self._attr_ids(attributes_data)
+            self._check_unique(instance.product_id, attr_ids, exclude_pk=instance.pk)
+        try:
+            with transaction.atomic(), deferred_variation_key_refresh():
+                for key, value in validated_data.items():
+                    setattr(instance, key, value)
+                instance.save()
+                if attributes_data is not None:
+                    instance.attributes.set(attr_ids)
+        except IntegrityError:
+            raise serializers.ValidationError({"attributes": [self.duplicate_message]})
         return instance
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """Schlanke Darstellung für Produktlisten/Grids (ohne Variationen, Bilder, Reviews)."""
+    stock_total = serializers.IntegerField(read_only=True)
+    image_url = serializers.SerializerMethodField()
+    # nur mit ?fields=...,description (Textsuche im Grid, Produktverwaltung)
+    optional_fields = ("description",)
+
+    class Meta:
+        model = Product
+        fields = (
+            "id",
+            "title",
+            "description",
+            "price",
+            "image_url",
+            "rating_avg",
+            "rating_count",
+            "stock_total",
+            "category",
+        )
+        read_only_fields = fields
+
+    def get_image_url(self, obj):
+        return obj.image_url
+
+
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     images = ProductImageSerializer(many=True, read_only=True)
     variations = ProductVariationSerializer(many=True, read_only=False)
     recent_reviews = serializers.SerializerMethodField()
-    # expose the model property that sums variation stock
+    # gespeicherte Spalte, per Signale bzw. refresh_stock_totals() gepflegt
     stock_total = serializers.IntegerField(read_only=True)
     # main_image kann jetzt sowohl File-Uploads als auch URLs sein
     main_image = serializers.ImageField(required=False, allow_null=True)
@@ -110,51 +192,49 @@ class ProductSerializer(serializers.ModelSerializer):
             "recent_reviews",
         )
 
-    def update(self, instance, validated_data):
-        variations_data = validated_data.pop('variations', [])
-        instance = super().update(instance, validated_data)
-        
-        # Handle variations
-        existing_variations = {v.id: v for v in instance.variations.all()}
-        variation_serializer = ProductVariationSerializer()
+    def _sync_variations(self, instance, variations_data):
+        from .services.variation_sync import VariationSyncError, sync_variations
 
+        attr_ids = ProductVariationSerializer()._attr_ids
+        entries = []
         for variation_data in variations_data:
-            variation_id = variation_data.get("id")
-            if variation_id and variation_id in existing_variations:
-                # Update existing
-                variation = existing_variations[variation_id]
-                for key, value in variation_data.items():
-                    if key == "id":
-                        continue
-                    if key == "attributes":
-                        variation.attributes.set(
-                            variation_serializer._attr_ids(value)
-                        )
-                    else:
-                        setattr(variation, key, value)
-                variation.save()
-            else:
-                # Create new: don't pass 'id' to create()
-                variation_data = dict(variation_data)
-                variation_data.pop("id", None)
-                variation_data["product"] = instance
-                attributes = variation_data.pop("attributes", [])
-                variation = ProductVariation.objects.create(**variation_data)
-                variation.attributes.set(
-                    variation_serializer._attr_ids(attributes)
-                )
-        
-        # Delete variations not in data
-        new_ids = {v.get('id') for v in variations_data if v.get('id')}
-        for existing_id, variation in existing_variations.items():
-            if existing_id not in new_ids:
-                variation.delete()
-        
+            entry = {"attributes": attr_ids(variation_data.get("attributes"))}
+            if variation_data.get("id") is not None:
+                entry["id"] = variation_data["id"]
+            if "stock" in variation_data:
+                entry["stock"] = variation_data["stock"]
+            entries.append(entry)
+        try:
+            sync_variations(instance, entries)
+        except VariationSyncError as exc:
+            raise serializers.ValidationError({"variations": [str(exc)]})
+
+    def create(self, validated_data):
+        variations_data = validated_data.pop("variations", [])
+        with transaction.atomic():
+            instance = super().create(validated_data)
+            self._sync_variations(instance, variations_data)
         return instance
-    
+
+    def update(self, instance, validated_data):
+        # Bei PATCH ohne "variations" bleiben die Variationen unverändert
+        variations_data = validated_data.pop("variations", None)
+        with transaction.atomic():
+            instance = super().update(instance, validated_data)
+            if variations_data is not None:
+                self._sync_variations(instance, variations_data)
+        return instance
+
     def get_recent_reviews(self, obj):
         """Get approved reviews for the product"""
-        reviews = obj.reviews.filter(approved=True).order_by("-created_at")[:5]
+        # Bereits per Product.objects.for_catalog() vorgeladen? Dann keine Query.
+        reviews = getattr(obj, "prefetched_recent_reviews", None)
+        if reviews is None:
+            reviews = (
+                obj.reviews.filter(approved=True)
+                .select_related("user")
+                .order_by("-created_at", "-id")[:RECENT_REVIEWS_LIMIT]
+            )
         data = []
         for review in reviews:
             data.append({
@@ -294,11 +374,15 @@ class OrderSerializer(serializers.ModelSerializer):
         ]
 
     def get_return_request_count(self, obj):
-        try:
-            return obj.returns.count()
-        except Exception:
-            from .models import OrderReturn as _OrderReturn
-            return _OrderReturn.objects.filter(order=obj).count()
+        # von Order.objects.with_return_count() annotiert: keine weitere Query
+        count = getattr(obj, "return_count", None)
+        if count is not None:
+            return count
+        # einzelne, nicht annotierte Bestellung (z.B. direkt nach dem Anlegen)
+        if "returns" in getattr(obj, "_prefetched_objects_cache", {}):
+            return len(obj.returns.all())
+        obj.return_count = obj.returns.count()
+        return obj.return_count
 
     def get_return_requested(self, obj):
         return self.get_return_request_count(obj) > 0
\ No newline at end of file
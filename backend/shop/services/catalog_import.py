@@ -0,0 +1,329 @@
+"""
+Bulk product import from CSV or JSONL files.
+
+Files are parsed as a stream and written in batches with bulk_create /
+bulk_update, so memory use depends on the batch size, not on the file.
+Categories, delivery times, attribute types and attribute values are
+resolved by name through in-memory caches.
+
+JSONL: one product per line::
+
+    {"title": "Hemd", "price": "19.90", "description": "...",
+     "category": "clothing", "delivery_time": "Standard",
+     "external_image": "https://...", "images": ["https://..."],
+     "variations": [{"stock": 5, "attributes": {"Size": "M", "Color": "Red"}}]}
+
+CSV: one row per variation; consecutive rows with the same title form one
+product. Columns: title, price, description, category, delivery_time,
+external_image, images ("url|url"), stock, attributes ("Size:M|Color:Red").
+"""
+import csv
+import json
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from itertools import groupby
+
+from django.db import transaction
+from django.utils.text import slugify
+
+from shop.cache import bump_generation
+from shop.models import (
+    AttributeType,
+    AttributeValue,
+    Category,
+    DeliveryTime,
+    Product,
+    ProductImage,
+    ProductVariation,
+    refresh_stock_totals,
+    refresh_variation_keys,
+)
+from shop.search import index_products
+from shop.suggest import index as suggest_index
+
+PRODUCT_FIELDS = ("description", "price", "category", "delivery_time", "external_image")
+
+
+class ImportRowError(Exception):
+    pass
+
+
+@dataclass
+class ImportStats:
+    rows: int = 0
+    created: int = 0
+    updated: int = 0
+    variations: int = 0
+    images: int = 0
+    errors: list = field(default_factory=list)
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def seconds(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def _split(value, sep="|"):
+    return [part.strip() for part in (value or "").split(sep) if part.strip()]
+
+
+def _parse_attributes(value):
+    if isinstance(value, dict):
+        return {str(k).strip(): str(v).strip() for k, v in value.items() if str(v).strip()}
+    attributes = {}
+    for part in _split(value):
+        name, sep, val = part.partition(":")
+        if not sep or not name.strip() or not val.strip():
+            raise ImportRowError(f"Ungültiges Attribut '{part}' (erwartet Typ:Wert).")
+        attributes[name.strip()] = val.strip()
+    return attributes
+
+
+def _parse_stock(value):
+    try:
+        stock = int(value or 0)
+    except (TypeError, ValueError):
+        raise ImportRowError(f"Ungültiger Bestand '{value}'.")
+    if stock < 0:
+        raise ImportRowError(f"Negativer Bestand '{value}'.")
+    return stock
+
+
+def iter_jsonl(handle):
+    for line_no, line in enumerate(handle, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield line_no, ImportRowError(f"Ungültiges JSON: {exc.msg}")
+            continue
+        if not isinstance(record, dict):
+            yield line_no, ImportRowError("Jede Zeile muss ein JSON-Objekt sein.")
+            continue
+        record.setdefault("images", [])
+        record.setdefault("variations", [])
+        yield line_no, record
+
+
+def iter_csv(handle):
+    reader = csv.DictReader(handle)
+    numbered = ((reader.line_num, row) for row in reader)
+    for title, group in groupby(numbered, key=lambda item: (item[1].get("title") or "").strip()):
+        group = list(group)
+        line_no, first = group[0]
+        record = {"title": title, "images": _split(first.get("images")), "variations": []}
+        for name in PRODUCT_FIELDS:
+            record[name] = first.get(name)
+        for _, row in group:
+            if row.get("stock") not in (None, "") or row.get("attributes"):
+                record["variations"].append({
+                    "stock": row.get("stock"),
+                    "attributes": row.get("attributes"),
+                })
+        yield line_no, record
+
+
+class ProductImporter:
+    """
+    Imports product records in batches.
+
+    Args:
+        batch_size: number of products written per transaction
+        update: match existing products by title and update them instead
+            of creating duplicates
+        progress: optional callback(stats) called after every batch
+    """
+
+    def __init__(self, batch_size=1000, update=False, progress=None):
+        self.batch_size = batch_size
+        self.update = update
+        self.progress = progress
+        self.stats = ImportStats()
+        self._categories = {c.name.lower(): c.pk for c in Category.objects.only("pk", "name")}
+        self._delivery_times = {d.name.lower(): d.pk for d in DeliveryTime.objects.only("pk", "name")}
+        self._attribute_types = {t.name.lower(): t.pk for t in AttributeType.objects.only("pk", "name")}
+        self._attribute_values = {
+            (type_id, value.lower()): pk
+            for pk, type_id, value in AttributeValue.objects.values_list("pk", "attribute_type_id", "value")
+        }
+
+    # --- lookups -----------------------------------------------------
+
+    def _category_id(self, name):
+        if not name:
+            return None
+        key = name.strip().lower()
+        if key not in self._categories:
+            self._categories[key] = Category.objects.create(name=name.strip()).pk
+        return self._categories[key]
+
+    def _delivery_time_id(self, name):
+        if not name:
+            return None
+        try:
+            return self._delivery_times[name.strip().lower()]
+        except KeyError:
+            raise ImportRowError(f"Unbekannte Lieferzeit '{name}'.")
+
+    def _attribute_value_id(self, type_name, value):
+        type_key = type_name.lower()
+        if type_key not in self._attribute_types:
+            self._attribute_types[type_key] = AttributeType.objects.create(name=type_name).pk
+        type_id = self._attribute_types[type_key]
+        value_key = (type_id, value.lower())
+        if value_key not in self._attribute_values:
+            self._attribute_values[value_key] = AttributeValue.objects.create(
+                attribute_type_id=type_id, value=value
+            ).pk
+        return self._attribute_values[value_key]
+
+    # --- parsing -----------------------------------------------------
+
+    def _prepare(self, record):
+        title = (record.get("title") or "").strip()
+        if not title:
+            raise ImportRowError("Titel fehlt.")
+        try:
+            price = Decimal(str(record.get("price")).strip())
+        except (InvalidOperation, TypeError):
+            raise ImportRowError(f"Ungültiger Preis '{record.get('price')}'.")
+
+        # gleiche Attributkombination mehrfach: letzte Zeile gewinnt (variation_key ist eindeutig)
+        variations = {}
+        for variation in record.get("variations") or []:
+            attributes = _parse_attributes(variation.get("attributes"))
+            attribute_ids = frozenset(
+                self._attribute_value_id(name, value) for name, value in attributes.items()
+            )
+            variations[attribute_ids] = _parse_stock(variation.get("stock"))
+        variations = list(variations.items())
+
+        images = record.get("images") or []
+        if isinstance(images, str):
+            images = _split(images)
+
+        product = Product(
+            title=title,
+            slug=slugify(title) or None,
+            description=record.get("description") or None,
+            price=price,
+            category_id=self._category_id(record.get("category")),
+            delivery_time_id=self._delivery_time_id(record.get("delivery_time")),
+            external_image=record.get("external_image") or None,
+        )
+        return product, variations, images
+
+    # --- writing -----------------------------------------------------
+
+    def run(self, records):
+        """Consumes (line_no, record | ImportRowError) pairs and writes them in batches."""
+        batch = []
+        for line_no, record in records:
+            self.stats.rows += 1
+            try:
+                if isinstance(record, ImportRowError):
+                    raise record
+                batch.append(self._prepare(record))
+            except ImportRowError as exc:
+                self.stats.errors.append((line_no, str(exc)))
+                continue
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+        if batch:
+            self._flush(batch)
+
+        bump_generation("shop.Product", "shop.ProductVariation", "shop.ProductImage")
+        suggest_index.reset()
+        return self.stats
+
+    def _flush(self, batch):
+        with transaction.atomic():
+            existing = {}
+            if self.update:
+                titles = [product.title for product, _, _ in batch]
+                existing = {p.title: p.pk for p in Product.objects.filter(title__in=titles).only("pk", "title")}
+
+            to_create, to_update = [], []
+            for product, _, _ in batch:
+                if product.title in existing:
+                    product.pk = existing[product.title]
+                    to_update.append(product)
+                else:
+                    to_create.append(product)
+
+            Product.objects.bulk_create(to_create)
+            if to_update:
+                Product.objects.bulk_update(to_update, ["slug", *PRODUCT_FIELDS])
+
+            self._write_variations(batch, updated_ids={p.pk for p in to_update})
+            self._write_images(batch, updated_ids={p.pk for p in to_update})
+
+            product_ids = [product.pk for product, _, _ in batch]
+            refresh_stock_totals(product_ids)
+            index_products([product for product, _, _ in batch])
+
+        self.stats.created += len(to_create)
+        self.stats.updated += len(to_update)
+        if self.progress:
+            self.progress(self.stats)
+
+    def _write_variations(self, batch, updated_ids):
+        # bestehende Variationen aktualisierter Produkte über ihre Attributkombination finden
+        existing = {}
+        if updated_ids:
+            through = ProductVariation.attributes.through
+            attrs = {}
+            for variation_id, value_id in through.objects.filter(
+                productvariation__product_id__in=updated_ids
+            ).values_list("productvariation_id", "attributevalue_id"):
+                attrs.setdefault(variation_id, set()).add(value_id)
+            for variation_id, product_id in ProductVariation.objects.filter(
+                product_id__in=updated_ids
+            ).values_list("pk", "product_id"):
+                existing[(product_id, frozenset(attrs.get(variation_id, ())))] = variation_id
+
+        to_create, to_update, new_attributes = [], [], []
+        for product, variations, _ in batch:
+            for attribute_ids, stock in variations:
+                variation_id = existing.get((product.pk, attribute_ids))
+                if variation_id:
+                    to_update.append(ProductVariation(pk=variation_id, stock=stock))
+                else:
+                    to_create.append(ProductVariation(product_id=product.pk, stock=stock))
+                    new_attributes.append(attribute_ids)
+
+        ProductVariation.objects.bulk_create(to_create)
+        if to_update:
+            ProductVariation.objects.bulk_update(to_update, ["stock"])
+
+        through = ProductVariation.attributes.through
+        through.objects.bulk_create([
+            through(productvariation_id=variation.pk, attributevalue_id=value_id)
+            for variation, attribute_ids in zip(to_create, new_attributes)
+            for value_id in attribute_ids
+        ])
+        refresh_variation_keys(variation.pk for variation in to_create)
+        self.stats.variations += len(to_create) + len(to_update)
+
+    def _write_images(self, batch, updated_ids):
+        known = set()
+        if updated_ids:
+            known = set(
+                ProductImage.objects.filter(product_id__in=updated_ids).values_list("product_id", "external_image")
+            )
+        images = [
+            ProductImage(product_id=product.pk, external_image=url)
+            for product, _, urls in batch
+            for url in urls
+            if (product.pk, url) not in known
+        ]
+        ProductImage.objects.bulk_create(images)
+        self.stats.images += len(images)
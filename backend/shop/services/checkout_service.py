@@ -0,0 +1,223 @@
+"""
+Checkout service.
+
+Creates an order from the cart payload in a single transaction and
+reserves the stock of the ordered variations so concurrent checkouts
+cannot oversell. The number of queries per checkout does not depend on
+the number of cart lines.
+"""
+from collections import defaultdict
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Now
+
+from shop.models import (
+    Order,
+    OrderItem,
+    Product,
+    ProductVariation,
+    refresh_stock_totals,
+)
+
+
+class CheckoutError(Exception):
+    """Raised when the cart cannot be turned into an order."""
+
+    status_code = 400
+
+    def __init__(self, message, **details):
+        super().__init__(message)
+        self.message = message
+        self.details = details
+
+    def as_response_data(self):
+        return {"error": self.message, **self.details}
+
+
+class InsufficientStockError(CheckoutError):
+    status_code = 409
+
+
+def _parse_cart_items(cart_items):
+    lines = []
+    for it in cart_items:
+        pid = it.get("product")
+        if not pid:
+            raise CheckoutError("product id missing in cart item.")
+        try:
+            pid = int(pid)
+        except (TypeError, ValueError):
+            raise CheckoutError(f"Product {pid} not found.")
+        try:
+            qty = int(it.get("quantity", 1) or 1)
+        except (TypeError, ValueError):
+            raise CheckoutError(f"Invalid quantity for product {pid}.")
+        if qty <= 0:
+            raise CheckoutError(f"Invalid quantity for product {pid}.")
+        selected = {
+            str(k).lower(): str(v).lower()
+            for k, v in (it.get("selectedAttributes") or {}).items()
+            if v not in (None, "")
+        }
+        lines.append({
+            "product_id": pid,
+            "quantity": qty,
+            "variation_id": it.get("variation"),
+            "selected": selected,
+            "product_image": it.get("product_image"),
+        })
+    return lines
+
+
+def _load_catalog(product_ids):
+    """
+    Loads all products of the cart and their variations in two queries.
+
+    Returns:
+        (products by id, list of variations by product id)
+    """
+    products = Product.objects.in_bulk(product_ids)
+    missing = sorted(set(product_ids) - set(products))
+    if missing:
+        raise CheckoutError(f"Product {missing[0]} not found.")
+
+    variations_by_product = defaultdict(list)
+    # die Attributkombination steht in variation_key, Attribute müssen nicht geladen werden
+    variations = ProductVariation.objects.filter(product_id__in=product_ids).order_by("pk")
+    for variation in variations:
+        variations_by_product[variation.product_id].append(variation)
+    return products, variations_by_product
+
+
+def _resolve_variation(product, variations, line):
+    """
+    Returns the ordered variation of a cart line or None for products
+    without variations. Explicit `variation` ids win over `selectedAttributes`,
+    which must match exactly one variation completely.
+    """
+    if not variations:
+        return None
+
+    if line["variation_id"]:
+        for variation in variations:
+            if str(variation.pk) == str(line["variation_id"]):
+                return variation
+        raise CheckoutError(
+            f"Variation {line['variation_id']} does not belong to product {product.pk}."
+        )
+
+    # Nur eine vollständige Auswahl bestimmt die Variante eindeutig; eine leere
+    # oder unvollständige Auswahl darf nicht auf irgendeine Variante fallen
+    selected = line["selected"]
+    matches = [variation for variation in variations if variation.attributes_dict == selected]
+    if len(matches) == 1:
+        return matches[0]
+    if not matches and any(selected.items() <= v.attributes_dict.items() for v in variations):
+        raise CheckoutError(f"Incomplete attribute selection for product {product.pk}.", product=product.pk)
+    if matches:
+        raise CheckoutError(f"Ambiguous attribute selection for product {product.pk}.", product=product.pk)
+    raise CheckoutError(f"No matching variation for product {product.pk}.", product=product.pk)
+
+
+def _reserve_stock(quantities):
+    """
+    Locks the given variations in primary-key order (deadlock-free) and
+    decrements their stock with one conditional UPDATE.
+
+    Args:
+        quantities: dict variation_id -> total quantity
+    """
+    variation_ids = sorted(quantities)
+    locked = (
+        ProductVariation.objects.select_for_update()
+        .filter(pk__in=variation_ids)
+        .order_by("pk")
+    )
+    available = dict(locked.values_list("pk", "stock"))
+
+    for variation_id in variation_ids:
+        if available.get(variation_id, 0) < quantities[variation_id]:
+            raise InsufficientStockError(
+                "Nicht genügend Lagerbestand.",
+                variation=variation_id,
+                requested=quantities[variation_id],
+                available=available.get(variation_id, 0),
+            )
+
+    # Jede Zeile wird nur dekrementiert, wenn ihr Bestand noch reicht
+    guard = reduce(or_, (Q(pk=vid, stock__gte=qty) for vid, qty in quantities.items()))
+    decrement = Case(
+        *(When(pk=vid, then=Value(qty)) for vid, qty in quantities.items()),
+        default=Value(0),
+    )
+    updated = ProductVariation.objects.filter(guard).update(
+        stock=F("stock") - decrement,
+        updated_at=Now(),
+    )
+    if updated != len(variation_ids):
+        raise InsufficientStockError("Nicht genügend Lagerbestand.")
+
+
+def place_order(user, cart_items, address, payment_method):
+    """
+    Creates an Order with its OrderItems and reserves stock atomically.
+
+    Raises:
+        CheckoutError: invalid cart (unknown product, variation, quantity)
+        InsufficientStockError: a variation does not have enough stock;
+            nothing is persisted in that case
+    """
+    if not cart_items:
+        raise CheckoutError("cartItems is required.")
+
+    lines = _parse_cart_items(cart_items)
+    paid = payment_method in ("paypal", "creditcard")
+
+    with transaction.atomic():
+        products, variations_by_product = _load_catalog({line["product_id"] for line in lines})
+        total = Decimal("0.00")
+        quantities = {}
+
+        for line in lines:
+            prod = products[line["product_id"]]
+            line["product"] = prod
+            line["variation"] = _resolve_variation(prod, variations_by_product[prod.pk], line)
+            if line["variation"] is not None:
+                vid = line["variation"].pk
+                quantities[vid] = quantities.get(vid, 0) + line["quantity"]
+            total += Decimal(str(prod.price)) * line["quantity"]
+
+        if quantities:
+            _reserve_stock(quantities)
+            refresh_stock_totals({line["product"].pk for line in lines if line["variation"]})
+
+        order = Order.objects.create(
+            user=user,
+            name=address.get("name"),
+            street=address.get("street"),
+            zip=address.get("zip"),
+            city=address.get("city"),
+            payment_method=payment_method,
+            total=total,
+            paid=paid,
+            status=("paid" if paid else "pending"),
+        )
+
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                product=line["product"],
+                variation=line["variation"],
+                product_title=line["product"].title,
+                product_image=line["product_image"] or line["product"].main_image,
+                price=line["product"].price,
+                quantity=line["quantity"],
+            )
+            for line in lines
+        ])
+
+    return order
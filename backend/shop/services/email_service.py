@@ -1,386 +1,154 @@
 """
 Email service for return notifications.
 
-In development, emails are logged to the console.
-In production, real email sending logic can be implemented here.
+Bodies are Django templates (shop/templates/shop/emails/return_<status>.txt
+and .html) rendered through one code path. Templates are compiled once by
+the cached template loader, so rendering many notifications in a loop
+does not re-read or re-parse them.
+
+The send_* functions put the rendered message into the email outbox
+(shop/services/outbox_service.py) within the caller's transaction; the
+actual delivery happens in `manage.py run_outbox`. Which backend is used
+(console in development, SMTP in production) is configured via
+EMAIL_BACKEND.
 """
-from django.conf import settings
-from shop.models import ReturnRequest
+from django.template.loader import get_template
 
+from shop.models import OutboxEmail, ReturnRequest
+from shop.services.outbox_service import enqueue_email, enqueue_emails
 
-def send_return_approval_email(return_request):
-    """
-    Sends an email notification to the customer when their return request has been approved.
-    
-    In development, the email is logged to the console.
-    In production, a real email would be sent here (e.g., with Django's send_mail).
-    
-    Args:
-        return_request: ReturnRequest instance with approved return
-    """
+# Status -> (Outbox-Art, Betreff)
+RETURN_EMAILS = {
+    "approved": ("return_approved", "Retour-Anfrage genehmigt - Bestellung #{order_id}"),
+    "received": ("return_received", "Retour eingetroffen und wird geprüft - Bestellung #{order_id}"),
+    "rejected": ("return_rejected", "Retour-Anfrage abgelehnt - Bestellung #{order_id}"),
+    "refunded": ("return_refunded", "Erstattung erfolgt - Bestellung #{order_id}"),
+}
+
+REJECTION_REASONS = dict(ReturnRequest.REJECTION_REASON_CHOICES)
+
+
+def _format_iban(iban):
+    iban = iban or ""
+    return " ".join(iban[i:i + 4] for i in range(0, len(iban), 4))
+
+
+def _format_amount(amount):
+    return f"{amount:.2f}" if amount is not None else ""
+
+
+def email_context(return_request, status):
+    """Template context shared by the text and HTML version."""
     user = return_request.user
     order = return_request.order
     item = return_request.item
-    
-    # Compose email data
-    recipient_email = user.email if hasattr(user, 'email') and user.email else "unknown@example.com"
-    subject = f"Retour-Anfrage genehmigt - Bestellung #{order.id}"
-    
-    # Email body (simulates a return label)
-    email_body = f"""
-═══════════════════════════════════════════════════════════════
-RETOUR-GENEHMIGUNG
-═══════════════════════════════════════════════════════════════
-
-Sehr geehrte/r {user.username if hasattr(user, 'username') else 'Kunde/in'},
-
-Ihre Retour-Anfrage wurde genehmigt!
-
-RETOUR-DETAILS:
-───────────────────────────────────────────────────────────────
-Retour-Nr.:        #{return_request.id}
-Bestell-Nr.:       #{order.id}
-Produkt:           {item.product_title}
-Grund:             {return_request.get_reason_display()}
-Status:            {return_request.get_status_display()}
-
-RETOUR-ADRESSE:
-───────────────────────────────────────────────────────────────
-Bitte senden Sie das Produkt an folgende Adresse zurück:
-
-[Ihre Retour-Adresse hier]
-[Straße und Hausnummer]
-[PLZ Stadt]
-
-RETOUR-SCHEIN:
-───────────────────────────────────────────────────────────────
-Bitte drucken Sie diesen Retour-Schein aus und legen Sie ihn
-der Sendung bei:
-
-RETOUR-NR: {return_request.id}
-BESTELL-NR: {order.id}
-PRODUKT: {item.product_title}
-
-WICHTIGE HINWEISE:
-───────────────────────────────────────────────────────────────
-- Bitte verpacken Sie das Produkt sicher und verwenden Sie
-  die Originalverpackung, falls vorhanden.
-- Die Retour muss innerhalb von 14 Tagen bei uns eingehen.
-- Nach Eingang und Prüfung erhalten Sie eine Erstattung.
-
-Bei Fragen stehen wir Ihnen gerne zur Verfügung.
-
-Mit freundlichen Grüßen
-Ihr Shop-Team
-
-═══════════════════════════════════════════════════════════════
-Diese E-Mail wurde automatisch generiert.
-═══════════════════════════════════════════════════════════════
-"""
-    
-    # In development: Output email to console
-    if settings.DEBUG:
-        print("\n" + "=" * 80)
-        print("📧 EMAIL NOTIFICATION (SIMULATION)")
-        print("=" * 80)
-        print(f"To: {recipient_email}")
-        print(f"Subject: {subject}")
-        print("-" * 80)
-        print(email_body)
-        print("=" * 80)
-        print("ℹ️  In production, a real email would be sent here.")
-        print("=" * 80 + "\n")
-    else:
-        # In production: Send real email
-        # Example implementation (requires Django email configuration):
-        # from django.core.mail import send_mail
-        # from django.template.loader import render_to_string
-        # 
-        # send_mail(
-        #     subject=subject,
-        #     message=email_body,
-        #     from_email=settings.DEFAULT_FROM_EMAIL,
-        #     recipient_list=[recipient_email],
-        #     fail_silently=False,
-        # )
-        print(f"Email would be sent to {recipient_email} (production mode)")
-
-
-def send_return_received_email(return_request):
+    reason = return_request.get_reason_display()
+    iban = _format_iban(return_request.refund_iban)
+    refund_amount = _format_amount(return_request.refund_amount)
+
+    context = {
+        "return_request": return_request,
+        "order": order,
+        "item": item,
+        "customer_name": getattr(user, "username", None) or "Kunde/in",
+        "reason": reason,
+        "status": return_request.get_status_display(),
+        "order_total": _format_amount(order.total),
+        "refund_amount": refund_amount,
+        "iban": iban,
+        "rejection_reason": REJECTION_REASONS.get(
+            return_request.rejection_reason or "",
+            return_request.rejection_reason or "Nicht angegeben",
+        ),
+    }
+    context["detail_rows"] = {
+        "approved": [("Grund", reason), ("Status", context["status"])],
+        "rejected": [("Ihr Rückgabegrund", reason)],
+        "refunded": [("Erstattungsbetrag", f"{refund_amount} €"), ("IBAN", iban)],
+    }.get(status, [])
+    return context
+
+
+def render_return_email(return_request, status=None):
     """
-    Sends an email notification to the customer when their return has been received.
-    
-    In development, the email is logged to the console.
-    In production, a real email would be sent here.
-    
+    Renders the notification for a return status.
+
     Args:
-        return_request: ReturnRequest instance with received return
+        return_request: ReturnRequest with user, order and item loaded
+        status: template to use (default: the current status)
+
+    Returns:
+        dict with kind, recipient, subject, body and html_body
     """
+    status = status or return_request.status
+    kind, subject = RETURN_EMAILS[status]
     user = return_request.user
-    order = return_request.order
-    item = return_request.item
-    
-    # Compose email data
-    recipient_email = user.email if hasattr(user, 'email') and user.email else "unknown@example.com"
-    subject = f"Retour eingetroffen und wird geprüft - Bestellung #{order.id}"
-    
-    # Email body
-    email_body = f"""
-═══════════════════════════════════════════════════════════════
-RETOUR EINGETROFFEN - PRÜFUNG LÄUFT
-═══════════════════════════════════════════════════════════════
-
-Liebe/r {user.username if hasattr(user, 'username') else 'Kunde/in'},
-
-wir freuen uns mitteilen, dass Ihre Retour bei uns eingetroffen ist!
-
-RETOUR-DETAILS:
-───────────────────────────────────────────────────────────────
-Retour-Nr.:        #{return_request.id}
-Bestell-Nr.:       #{order.id}
-Produkt:           {item.product_title}
-Erhalt bestätigt:  {return_request.created_at.strftime('%d.%m.%Y %H:%M') if hasattr(return_request.created_at, 'strftime') else return_request.created_at}
-
-WAS PASSIERT JETZT?
-───────────────────────────────────────────────────────────────
-Deine Retour ist eingetroffen und wird von unserem Team sorgfältig geprüft.
-Wir überprüfen dabei:
-
-✓ Die Vollständigkeit des Produkts
-✓ Den Zustand des Produkts
-✓ Die Voraussetzungen für die Rückgabe
-
-RÜCKERSTATTUNG
-───────────────────────────────────────────────────────────────
-Sobald unsere Prüfung abgeschlossen ist, wird der Bestellbetrag in Höhe von 
-EUR {order.total:.2f} auf dein ursprüngliches Zahlungsmittel 
-zurückerstattet.
-
-Die Bearbeitung dauert in der Regel 5-7 Werktage nach Abschluss 
-der Prüfung.
-
-DEIN VORTEIL BEI UNS
-───────────────────────────────────────────────────────────────
-- Kostenlose Retouren
-- Schnelle Prüfung und Erstattung
-- Volle Transparenz über den Status deiner Retour
-
-FRAGEN?
-───────────────────────────────────────────────────────────────
-Du kannst jederzeit in deinem Kundenkonto den Status deiner Retour 
-einsehen oder unser Kundenservice-Team kontaktieren, wenn du Fragen 
-hast.
-
-Vielen Dank für dein Vertrauen!
-
-Mit freundlichen Grüßen
-Dein Shop-Team
-
-═══════════════════════════════════════════════════════════════
-Diese E-Mail wurde automatisch generiert.
-═══════════════════════════════════════════════════════════════
-"""
-    
-    # In development: Output email to console
-    if settings.DEBUG:
-        print("\n" + "=" * 80)
-        print("📧 EMAIL NOTIFICATION (SIMULATION) - RETURN RECEIVED")
-        print("=" * 80)
-        print(f"To: {recipient_email}")
-        print(f"Subject: {subject}")
-        print("-" * 80)
-        print(email_body)
-        print("=" * 80)
-        print("ℹ️  In production, a real email would be sent here.")
-        print("=" * 80 + "\n")
-    else:
-        # In production: Send real email
-        # from django.core.mail import send_mail
-        # send_mail(
-        #     subject=subject,
-        #     message=email_body,
-        #     from_email=settings.DEFAULT_FROM_EMAIL,
-        #     recipient_list=[recipient_email],
-        #     fail_silently=False,
-        # )
-        print(f"Email would be sent to {recipient_email} (production mode)")
+    context = email_context(return_request, status)
+    context["subject"] = subject.format(order_id=return_request.order_id)
+    return {
+        "kind": kind,
+        "recipient": getattr(user, "email", None) or "unknown@example.com",
+        "subject": context["subject"],
+        "body": get_template(f"shop/emails/{kind}.txt").render(context),
+        "html_body": get_template(f"shop/emails/{kind}.html").render(context),
+    }
 
 
-def send_return_rejection_email(return_request):
+def queue_return_email(return_request, status=None):
+    """Renders the notification for `status` and stores it in the outbox."""
+    message = render_return_email(return_request, status)
+    return enqueue_email(return_request=return_request, **message)
+
+
+def queue_return_emails(return_requests, status=None):
     """
-    Sends an email notification to the customer when their return request has been rejected.
-    
-    In development, the email is logged to the console.
-    In production, a real email would be sent here.
-    
+    Renders notifications for many returns and stores them with one insert,
+    e.g. to re-send refund confirmations.
+
     Args:
-        return_request: ReturnRequest instance with rejected return
+        return_requests: ReturnRequests with user, order and item loaded
+        status: template to use (default: each return's current status)
+
+    Returns:
+        list of queued OutboxEmail
     """
-    user = return_request.user
-    order = return_request.order
-    item = return_request.item
-    
-    # Compose email data
-    recipient_email = user.email if hasattr(user, 'email') and user.email else "unknown@example.com"
-    subject = f"Retour-Anfrage abgelehnt - Bestellung #{order.id}"
-    
-    # Format rejection reason
-    rejection_reason_display = dict(ReturnRequest.REJECTION_REASON_CHOICES).get(
-        return_request.rejection_reason or "", 
-        return_request.rejection_reason or "Nicht angegeben"
-    )
-    
-    # Email body
-    email_body = f"""
-═══════════════════════════════════════════════════════════════
-RETOUR-ABLEHNUNG
-═══════════════════════════════════════════════════════════════
-
-Sehr geehrte/r {user.username if hasattr(user, 'username') else 'Kunde/in'},
-
-leider müssen wir Ihnen mitteilen, dass Ihre Retour-Anfrage nicht genehmigt werden konnte.
-
-RETOUR-DETAILS:
-───────────────────────────────────────────────────────────────
-Retour-Nr.:        #{return_request.id}
-Bestell-Nr.:       #{order.id}
-Produkt:           {item.product_title}
-Ihr Rückgabegrund: {return_request.get_reason_display()}
-
-ABLEHNUNGSGRUND:
-───────────────────────────────────────────────────────────────
-{rejection_reason_display}
-"""
-    
-    if return_request.rejection_comment:
-        email_body += f"""
-Zusätzliche Erläuterung:
-{return_request.rejection_comment}
-"""
-    
-    email_body += f"""
-WICHTIGE HINWEISE:
-───────────────────────────────────────────────────────────────
-- Bitte beachten Sie, dass eine Rückgabe aus den oben genannten
-  Gründen nicht möglich ist.
-- Falls Sie Fragen zu dieser Entscheidung haben, kontaktieren Sie
-  bitte unseren Kundenservice.
-
-Bei weiteren Fragen stehen wir Ihnen gerne zur Verfügung.
-
-Mit freundlichen Grüßen
-Ihr Shop-Team
-
-═══════════════════════════════════════════════════════════════
-Diese E-Mail wurde automatisch generiert.
-═══════════════════════════════════════════════════════════════
-"""
-    
-    # In development: Output email to console
-    if settings.DEBUG:
-        print("\n" + "=" * 80)
-        print("📧 EMAIL NOTIFICATION (SIMULATION) - REJECTION")
-        print("=" * 80)
-        print(f"To: {recipient_email}")
-        print(f"Subject: {subject}")
-        print("-" * 80)
-        print(email_body)
-        print("=" * 80)
-        print("ℹ️  In production, a real email would be sent here.")
-        print("=" * 80 + "\n")
-    else:
-        # In production: Send real email
-        # from django.core.mail import send_mail
-        # send_mail(
-        #     subject=subject,
-        #     message=email_body,
-        #     from_email=settings.DEFAULT_FROM_EMAIL,
-        #     recipient_list=[recipient_email],
-        #     fail_silently=False,
-        # )
-        print(f"Email would be sent to {recipient_email} (production mode)")
+    return enqueue_emails([
+        OutboxEmail(return_request=return_request, **render_return_email(return_request, status))
+        for return_request in return_requests
+    ])
+
+
+def send_return_approval_email(return_request):
+    """Queues the email for an approved return request (return label)."""
+    return queue_return_email(return_request, "approved")
+
+
+def send_return_received_email(return_request):
+    """Queues the email confirming that the returned product has arrived."""
+    return queue_return_email(return_request, "received")
+
+
+def send_return_rejection_email(return_request):
+    """Queues the email for a rejected return request, including the reason."""
+    return queue_return_email(return_request, "rejected")
 
 
 def send_return_refunded_email(return_request):
+    """Queues the refund confirmation with amount and IBAN."""
+    return queue_return_email(return_request, "refunded")
+
+
+def notify_return_status(return_request, old_status):
     """
-    Sends an email notification to the customer when their return has been refunded.
-    
-    In development, the email is logged to the console.
-    In production, a real email would be sent here.
-    
+    Queues the customer notification for a status change, if there is one.
+
     Args:
-        return_request: ReturnRequest instance with refunded return
-    """
-    user = return_request.user
-    order = return_request.order
-    item = return_request.item
-    
-    # Compose email data
-    recipient_email = user.email if hasattr(user, 'email') and user.email else "unknown@example.com"
-    subject = f"Erstattung erfolgt - Bestellung #{order.id}"
-    
-    # Format IBAN for display (add spaces every 4 characters)
-    iban = return_request.refund_iban or ""
-    formatted_iban = " ".join([iban[i:i+4] for i in range(0, len(iban), 4)]) if iban else ""
-    
-    # Email body
-    email_body = f"""
-═══════════════════════════════════════════════════════════════
-ERSTATTUNG ERFOLGT
-═══════════════════════════════════════════════════════════════
-
-Sehr geehrte/r {user.username if hasattr(user, 'username') else 'Kunde/in'},
-
-wir freuen uns, Ihnen mitteilen zu können, dass Ihre Erstattung verarbeitet wurde.
-
-ERSTATTUNGS-DETAILS:
-───────────────────────────────────────────────────────────────
-Retour-Nr.:        #{return_request.id}
-Bestell-Nr.:       #{order.id}
-Produkt:           {item.product_title}
-Erstattungsbetrag: {return_request.refund_amount:.2f} €
-IBAN:              {formatted_iban}
-
-WICHTIGE INFORMATIONEN:
-───────────────────────────────────────────────────────────────
-Der Betrag in Höhe von {return_request.refund_amount:.2f} € wurde an das
-Konto mit der IBAN {formatted_iban} überwiesen.
-
-Die Erstattung wird in den nächsten 1-2 Werktagen auf Ihrem Konto
-eingehen. Bitte beachten Sie, dass die Bearbeitungszeit je nach
-Ihrer Bank variieren kann.
-
-Bei Fragen zu Ihrer Erstattung stehen wir Ihnen gerne zur Verfügung.
-
-Mit freundlichen Grüßen
-Ihr Shop-Team
-
-═══════════════════════════════════════════════════════════════
-Diese E-Mail wurde automatisch generiert.
-═══════════════════════════════════════════════════════════════
-"""
-    
-    # In development: Output email to console
-    if settings.DEBUG:
-        print("\n" + "=" * 80)
-        print("📧 EMAIL NOTIFICATION (SIMULATION) - REFUND COMPLETED")
-        print("=" * 80)
-        print(f"To: {recipient_email}")
-        print(f"Subject: {subject}")
-        print("-" * 80)
-        print(email_body)
-        print("=" * 80)
-        print("ℹ️  In production, a real email would be sent here.")
-        print("=" * 80 + "\n")
-    else:
-        # In production: Send real email
-        # from django.core.mail import send_mail
-        # send_mail(
-        #     subject=subject,
-        #     message=email_body,
-        #     from_email=settings.DEFAULT_FROM_EMAIL,
-        #     recipient_list=[recipient_email],
-        #     fail_silently=False,
-        # )
-        print(f"Email would be sent to {recipient_email} (production mode)")
+        return_request: ReturnRequest with the new status already set
+        old_status: status before the change
 
+    Returns:
+        the queued OutboxEmail or None
+    """
+    if return_request.status == old_status or return_request.status not in RETURN_EMAILS:
+        return None
+    return queue_return_email(return_request)
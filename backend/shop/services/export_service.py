@@ -0,0 +1,135 @@
+"""
+Streaming exports of the catalog and of order lines.
+
+Rows are read with values_list().iterator(chunk_size) and serialized one
+at a time, so memory use stays constant regardless of table size. The
+same generators feed the management commands and the HTTP endpoint.
+"""
+import csv
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from shop.models import OrderItem, Product
+
+FORMATS = ("csv", "jsonl", "ndjson")
+
+# (Spaltenname, ORM-Lookup)
+CATALOG_COLUMNS = (
+    ("id", "id"),
+    ("title", "title"),
+    ("slug", "slug"),
+    ("description", "description"),
+    ("price", "price"),
+    ("category", "category__name"),
+    ("stock_total", "stock_total"),
+    ("rating_avg", "rating_avg"),
+    ("rating_count", "rating_count"),
+    ("external_image", "external_image"),
+    ("updated_at", "updated_at"),
+)
+
+ORDER_COLUMNS = (
+    ("order_id", "order_id"),
+    ("created_at", "order__created_at"),
+    ("status", "order__status"),
+    ("paid", "order__paid"),
+    ("order_total", "order__total"),
+    ("payment_method", "order__payment_method"),
+    ("customer", "order__user__username"),
+    ("name", "order__name"),
+    ("street", "order__street"),
+    ("zip", "order__zip"),
+    ("city", "order__city"),
+    ("shipping_carrier", "order__shipping_carrier"),
+    ("tracking_number", "order__tracking_number"),
+    ("item_id", "id"),
+    ("product_id", "product_id"),
+    ("variation_id", "variation_id"),
+    ("product_title", "product_title"),
+    ("price", "price"),
+    ("quantity", "quantity"),
+)
+
+DATASETS = {
+    "catalog": (Product.objects.order_by("id"), CATALOG_COLUMNS),
+    "orders": (OrderItem.objects.order_by("order_id", "id"), ORDER_COLUMNS),
+}
+
+
+class _Echo:
+    """File-like object whose write() returns the value, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def iter_rows(dataset, chunk_size=2000):
+    """
+    Yields the header and the value tuples of a dataset.
+
+    Args:
+        dataset: "catalog" or "orders"
+        chunk_size: rows fetched per database round trip
+
+    Returns:
+        (header, rows) where rows is a lazy iterator of tuples
+    """
+    queryset, columns = DATASETS[dataset]
+    header = [name for name, _ in columns]
+    rows = queryset.values_list(*(lookup for _, lookup in columns)).iterator(chunk_size=chunk_size)
+    return header, rows
+
+
+def _csv_lines(header, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _json_lines(header, rows):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield encoder.encode(dict(zip(header, row))) + "\n"
+
+
+def _gzip(chunks, buffer_size=64 * 1024):
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    pending = []
+    size = 0
+    for chunk in chunks:
+        pending.append(chunk.encode("utf-8"))
+        size += len(pending[-1])
+        if size >= buffer_size:
+            data = compressor.compress(b"".join(pending))
+            pending, size = [], 0
+            if data:
+                yield data
+    yield compressor.compress(b"".join(pending)) + compressor.flush()
+
+
+def export_chunks(dataset, fmt="csv", gzip=False, chunk_size=2000):
+    """
+    Serializes a dataset incrementally.
+
+    Args:
+        dataset: "catalog" or "orders"
+        fmt: "csv", "jsonl" or "ndjson" (alias of jsonl)
+        gzip: compress the output; chunks are bytes instead of str
+        chunk_size: rows fetched per database round trip
+
+    Returns:
+        generator of str chunks (bytes when gzip is set)
+    """
+    header, rows = iter_rows(dataset, chunk_size=chunk_size)
+    chunks = _csv_lines(header, rows) if fmt == "csv" else _json_lines(header, rows)
+    return _gzip(chunks) if gzip else chunks
+
+
+def content_type(fmt, gzip=False):
+    if gzip:
+        return "application/gzip"
+    if fmt == "csv":
+        return "text/csv; charset=utf-8"
+    return "application/x-ndjson; charset=utf-8"
@@ -0,0 +1,67 @@
+"""
+Idempotency keys for the checkout.
+
+Clients send an `Idempotency-Key` header with POST /api/order/place/.
+The first successful response is stored; retries with the same key are
+answered from that record with a single indexed lookup.
+"""
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from shop.models import IdempotencyKey
+
+HEADER = "Idempotency-Key"
+
+
+def key_ttl():
+    """How long stored responses are replayed (setting IDEMPOTENCY_KEY_TTL_HOURS, default 24)."""
+    return timedelta(hours=getattr(settings, "IDEMPOTENCY_KEY_TTL_HOURS", 24))
+
+
+def request_fingerprint(payload):
+    """Stable hash of the request body to detect key reuse with a different payload."""
+    raw = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def find_key(user, key):
+    """Returns the stored, not yet expired record for (user, key) or None."""
+    return (
+        IdempotencyKey.objects.filter(
+            user=user,
+            key=key,
+            created_at__gte=timezone.now() - key_ttl(),
+        )
+        .only("request_hash", "response_status", "response_body")
+        .first()
+    )
+
+
+def store_response(user, key, fingerprint, order, status_code, body):
+    """
+    Stores the response for (user, key). An expired record for the same key
+    that purge_expired() has not removed yet is deleted first, in the
+    caller's transaction, so reusing a key after the TTL does not hit the
+    unique constraint.
+    """
+    IdempotencyKey.objects.filter(
+        user=user, key=key, created_at__lt=timezone.now() - key_ttl()
+    ).delete()
+    return IdempotencyKey.objects.create(
+        user=user,
+        key=key,
+        request_hash=fingerprint,
+        order=order,
+        response_status=status_code,
+        response_body=body,
+    )
+
+
+def purge_expired():
+    """Deletes all records older than the TTL. Returns the number of deleted rows."""
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=timezone.now() - key_ttl()).delete()
+    return deleted
@@ -0,0 +1,200 @@
+"""
+Transactional email outbox.
+
+Notifications are stored as OutboxEmail rows inside the transaction that
+triggers them, so an email exists exactly when the change was committed.
+`manage.py run_outbox` claims due rows, sends them from a thread pool
+(one SMTP connection per worker chunk instead of one per message) and
+reschedules failures with exponential backoff.
+
+Settings:
+    EMAIL_OUTBOX_MAX_ATTEMPTS: attempts before a message is marked failed (5)
+    EMAIL_OUTBOX_BACKOFF_SECONDS: delay after the first failure, doubled
+        for every further attempt and capped at one hour (30)
+    EMAIL_OUTBOX_EAGER: deliver right after commit inside the request
+        process, e.g. with the console backend in development (DEBUG)
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from shop.models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+MAX_BACKOFF = timedelta(hours=1)
+# Nachrichten im Status "sending" gelten nach dieser Zeit als verwaist (Worker abgestürzt)
+CLAIM_TIMEOUT = timedelta(minutes=15)
+
+
+def max_attempts():
+    return getattr(settings, "EMAIL_OUTBOX_MAX_ATTEMPTS", 5)
+
+
+def backoff(attempts):
+    """Delay before the next attempt after `attempts` failed ones."""
+    base = getattr(settings, "EMAIL_OUTBOX_BACKOFF_SECONDS", 30)
+    return min(timedelta(seconds=base * 2 ** max(attempts - 1, 0)), MAX_BACKOFF)
+
+
+def enqueue_email(kind, recipient, subject, body, html_body="", return_request=None):
+    """
+    Stores an email in the outbox as part of the current transaction.
+
+    Args:
+        kind: short identifier, e.g. "return_approved"
+        recipient: email address
+        subject, body, html_body: message content
+        return_request: optional ReturnRequest the email belongs to
+
+    Returns:
+        the created OutboxEmail
+    """
+    email = OutboxEmail(
+        kind=kind,
+        recipient=recipient,
+        subject=subject,
+        body=body,
+        html_body=html_body,
+        return_request=return_request,
+    )
+    return enqueue_emails([email])[0]
+
+
+def enqueue_emails(emails):
+    """
+    Stores many unsaved OutboxEmail instances with one bulk insert.
+
+    Returns:
+        the saved instances
+    """
+    emails = OutboxEmail.objects.bulk_create(emails)
+    if emails and getattr(settings, "EMAIL_OUTBOX_EAGER", settings.DEBUG):
+        ids = [email.pk for email in emails]
+        transaction.on_commit(lambda: process_batch(limit=len(ids), ids=ids, workers=1))
+    return emails
+
+
+def release_stale_claims():
+    """Puts messages back into the queue whose worker died while sending."""
+    return OutboxEmail.objects.filter(
+        status="sending", claimed_at__lt=timezone.now() - CLAIM_TIMEOUT
+    ).update(status="pending", claimed_at=None)
+
+
+def claim_batch(limit=100, ids=None):
+    """
+    Marks up to `limit` due messages as "sending" and returns them.
+
+    The conditional UPDATE (status still "pending") makes sure that
+    concurrent workers never claim the same message.
+    """
+    now = timezone.now()
+    due = OutboxEmail.objects.filter(status="pending", next_attempt_at__lte=now)
+    if ids is not None:
+        due = due.filter(pk__in=ids)
+    with transaction.atomic():
+        candidates = list(
+            due.select_for_update(skip_locked=True)
+            .order_by("next_attempt_at", "pk")
+            .values_list("pk", flat=True)[:limit]
+        )
+        if not candidates:
+            return []
+        OutboxEmail.objects.filter(pk__in=candidates, status="pending").update(
+            status="sending", claimed_at=now, attempts=F("attempts") + 1
+        )
+    return list(
+        OutboxEmail.objects.filter(pk__in=candidates, status="sending", claimed_at=now).order_by("pk")
+    )
+
+
+def _send_chunk(emails):
+    """Sends emails over one SMTP connection; returns {pk: error or None}."""
+    results = {}
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+        for email in emails:
+            message = EmailMultiAlternatives(
+                subject=email.subject,
+                body=email.body,
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=[email.recipient],
+                connection=connection,
+            )
+            if email.html_body:
+                message.attach_alternative(email.html_body, "text/html")
+            try:
+                message.send()
+                results[email.pk] = None
+            except Exception as exc:  # einzelne Nachricht: erneut versuchen
+                results[email.pk] = f"{type(exc).__name__}: {exc}"
+    except Exception as exc:  # Verbindung fehlgeschlagen: alle übrigen erneut versuchen
+        for email in emails:
+            results.setdefault(email.pk, f"{type(exc).__name__}: {exc}")
+    finally:
+        try:
+            connection.close()
+        except Exception:
+            pass
+    return results
+
+
+def _record_results(emails, results):
+    now = timezone.now()
+    sent = [pk for pk, error in results.items() if error is None]
+    if sent:
+        OutboxEmail.objects.filter(pk__in=sent).update(
+            status="sent", sent_at=now, claimed_at=None, last_error=""
+        )
+
+    failed = [email for email in emails if results.get(email.pk)]
+    for email in failed:
+        email.last_error = results[email.pk]
+        email.claimed_at = None
+        if email.attempts >= max_attempts():
+            email.status = "failed"
+        else:
+            email.status = "pending"
+            email.next_attempt_at = now + backoff(email.attempts)
+        logger.warning("Outbox email %s failed (attempt %s): %s", email.pk, email.attempts, email.last_error)
+    OutboxEmail.objects.bulk_update(failed, ["status", "next_attempt_at", "claimed_at", "last_error"])
+    return len(sent), len(failed)
+
+
+def process_batch(limit=100, workers=4, ids=None):
+    """
+    Claims and delivers one batch of due messages.
+
+    Args:
+        limit: maximum number of messages in this batch
+        workers: threads sending in parallel, each with its own connection
+        ids: restrict the batch to these OutboxEmail IDs
+
+    Returns:
+        dict with the numbers of sent and failed messages
+    """
+    emails = claim_batch(limit=limit, ids=ids)
+    if not emails:
+        return {"sent": 0, "failed": 0}
+
+    workers = max(1, min(workers, len(emails)))
+    chunks = [emails[i::workers] for i in range(workers)]
+    results = {}
+    if workers == 1:
+        results.update(_send_chunk(chunks[0]))
+    else:
+        # Threads senden nur; alle Datenbankzugriffe bleiben im aufrufenden Thread
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for chunk_results in pool.map(_send_chunk, chunks):
+                results.update(chunk_results)
+
+    sent, failed = _record_results(emails, results)
+    return {"sent": sent, "failed": failed}
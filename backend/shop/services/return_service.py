@@ -0,0 +1,209 @@
+"""
+State machine for return requests.
+
+Defines the allowed status changes (pending -> approved/rejected,
+approved -> received, received -> refunded/rejected) and applies them with a
+conditional `UPDATE ... WHERE status = <old>`: when two shipping clerks
+act on the same return at once, exactly one UPDATE matches and the other
+gets a ReturnTransitionConflict, without row locks. The history row and
+the customer notification are written in the same transaction, so each
+transition is recorded and mailed exactly once.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from shop.models import ReturnRequest, ReturnStatusChange
+from shop.services.email_service import notify_return_status, queue_return_emails
+
+# Erlaubte Übergänge: aktueller Status -> mögliche Zielstatus
+ALLOWED_TRANSITIONS = {
+    "pending": {"approved", "rejected"},
+    "approved": {"received"},
+    # nach der Prüfung der eingetroffenen Ware kann die Retour noch abgelehnt werden
+    "received": {"refunded", "rejected"},
+    "rejected": set(),
+    "refunded": set(),
+}
+
+# Zielstatus, die sich für viele Retouren gleichzeitig setzen lassen
+# ("refunded" braucht Empfänger, Betrag und IBAN je Retour)
+BULK_TARGETS = {"approved", "rejected", "received"}
+
+
+class ReturnTransitionError(Exception):
+    """Raised when a requested status change is not valid."""
+
+
+class ReturnTransitionConflict(ReturnTransitionError):
+    """Raised when the return's status was changed by someone else in the meantime."""
+
+    def __init__(self, current_status):
+        self.current_status = current_status
+        super().__init__(f"Die Retour wurde zwischenzeitlich geändert (aktueller Status: '{current_status}').")
+
+
+def sources_for(target):
+    """All statuses from which `target` can be reached."""
+    return {source for source, targets in ALLOWED_TRANSITIONS.items() if target in targets}
+
+
+def check_transition(old_status, new_status):
+    """Raises ReturnTransitionError if old_status -> new_status is not allowed."""
+    if new_status not in ALLOWED_TRANSITIONS:
+        raise ReturnTransitionError(f"Unbekannter Status '{new_status}'.")
+    if new_status not in ALLOWED_TRANSITIONS.get(old_status, ()):
+        raise ReturnTransitionError(f"Übergang von '{old_status}' nach '{new_status}' ist nicht erlaubt.")
+
+
+def rejection_fields(rejection_reason, rejection_comment=""):
+    """
+    Validates the rejection data and returns the fields to store.
+
+    Raises:
+        ReturnTransitionError: missing or unknown reason, or "sonstiges"
+            without comment
+    """
+    valid = [choice[0] for choice in ReturnRequest.REJECTION_REASON_CHOICES]
+    if not rejection_reason:
+        raise ReturnTransitionError("Ablehnungsgrund ist erforderlich.")
+    if rejection_reason not in valid:
+        raise ReturnTransitionError(f"Ungültiger Ablehnungsgrund. Erlaubt: {', '.join(valid)}")
+    comment = (rejection_comment or "").strip()
+    if rejection_reason == "sonstiges" and not comment:
+        raise ReturnTransitionError("Bei 'Sonstiges' ist eine Erläuterung erforderlich.")
+    return {
+        "rejection_reason": rejection_reason,
+        "rejection_comment": comment or None,
+        "rejection_date": timezone.now(),
+    }
+
+
+def transition(return_request, new_status, user=None, **fields):
+    """
+    Moves one return to `new_status`.
+
+    Only the status and `fields` are written, with one UPDATE that is
+    conditioned on the status the caller has seen. The instance is updated
+    in place; the history row and the notification are queued in the same
+    transaction.
+
+    Args:
+        return_request: ReturnRequest with user, order and item loaded
+        new_status: target status
+        user: clerk making the change (stored in the history)
+        **fields: further columns to set, e.g. rejection or refund data
+
+    Returns:
+        the updated return_request
+
+    Raises:
+        ReturnTransitionError: the transition is not allowed
+        ReturnTransitionConflict: the status was changed concurrently
+    """
+    old_status = return_request.status
+    check_transition(old_status, new_status)
+    with transaction.atomic():
+        updated = ReturnRequest.objects.filter(pk=return_request.pk, status=old_status).update(
+            status=new_status, **fields
+        )
+        if not updated:
+            current = ReturnRequest.objects.filter(pk=return_request.pk).values_list("status", flat=True).first()
+            raise ReturnTransitionConflict(current)
+
+        for name, value in fields.items():
+            setattr(return_request, name, value)
+        return_request.status = new_status
+        ReturnStatusChange.objects.create(
+            return_request=return_request, old_status=old_status, new_status=new_status, changed_by=_user(user)
+        )
+        notify_return_status(return_request, old_status)
+    return return_request
+
+
+def _user(user):
+    return user if getattr(user, "is_authenticated", False) else None
+
+
+def bulk_transition(changes, rejection_reason=None, rejection_comment="", user=None):
+    """
+    Moves many returns to new statuses in one transaction.
+
+    Args:
+        changes: iterable of (return id, target status)
+        rejection_reason, rejection_comment: stored on all returns that
+            are rejected by this call
+        user: clerk making the change (stored in the history)
+
+    Returns:
+        list of per-item results in input order: {"id", "status", "result"}
+        with result "updated", "unchanged" or "error" (plus "error" text)
+
+    Raises:
+        ReturnTransitionError: the rejection data is invalid
+    """
+    # Je Retour zählt der erste Eintrag
+    requested = {}
+    for pk, target in changes:
+        requested.setdefault(pk, target)
+    extra = {}
+    if "rejected" in requested.values():
+        extra["rejected"] = rejection_fields(rejection_reason, rejection_comment)
+
+    results = {}
+    with transaction.atomic():
+        current = dict(
+            ReturnRequest.objects.select_for_update()
+            .filter(pk__in=list(requested))
+            .values_list("pk", "status")
+        )
+
+        by_target = {}
+        for pk, target in requested.items():
+            old = current.get(pk)
+            if old is None:
+                results[pk] = {"result": "error", "error": "Retour nicht gefunden."}
+            elif old == target:
+                results[pk] = {"result": "unchanged"}
+            elif target not in BULK_TARGETS:
+                results[pk] = {"result": "error", "error": f"'{target}' kann nur einzeln gesetzt werden."}
+            else:
+                try:
+                    check_transition(old, target)
+                except ReturnTransitionError as exc:
+                    results[pk] = {"result": "error", "error": str(exc)}
+                else:
+                    by_target.setdefault(target, []).append(pk)
+
+        for target, pks in by_target.items():
+            # Bedingung auf den alten Status: parallel geänderte Retouren bleiben unberührt
+            ReturnRequest.objects.filter(pk__in=pks, status__in=sources_for(target)).update(
+                status=target, **extra.get(target, {})
+            )
+
+        pending = [pk for pks in by_target.values() for pk in pks]
+        changed = [
+            return_request
+            for return_request in ReturnRequest.objects.filter(pk__in=pending).select_related(
+                "order", "item", "user"
+            )
+            if return_request.status == requested[return_request.pk]
+        ]
+        for return_request in changed:
+            results[return_request.pk] = {"result": "updated"}
+        for pk in pending:
+            results.setdefault(pk, {"result": "error", "error": "Status wurde zwischenzeitlich geändert."})
+
+        if changed:
+            changed_by = _user(user)
+            ReturnStatusChange.objects.bulk_create([
+                ReturnStatusChange(
+                    return_request=return_request,
+                    old_status=current[return_request.pk],
+                    new_status=return_request.status,
+                    changed_by=changed_by,
+                )
+                for return_request in changed
+            ])
+            queue_return_emails(changed)
+
+    return [{"id": pk, "status": target, **results[pk]} for pk, target in requested.items()]
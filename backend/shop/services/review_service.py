@@ -0,0 +1,55 @@
+"""
+Review moderation service.
+
+Approves or rejects many reviews at once and recomputes the rating of
+every affected product exactly once, inside a single transaction.
+"""
+import logging
+import time
+
+from django.db import transaction
+
+from shop.models import Review, recalculate_product_ratings
+
+logger = logging.getLogger(__name__)
+
+
+def set_reviews_approved(reviews, approved):
+    """
+    Sets `approved` for all given reviews.
+
+    Only reviews whose state actually changes are updated; the rating
+    aggregates of their products are recomputed once per product.
+
+    Args:
+        reviews: Review queryset or iterable of review IDs
+        approved: True to approve, False to reject
+
+    Returns:
+        dict with the number of updated reviews, affected products and
+        the duration in milliseconds
+    """
+    started = time.perf_counter()
+    if not hasattr(reviews, "filter"):
+        reviews = Review.objects.filter(pk__in=list(reviews))
+
+    with transaction.atomic():
+        changing = reviews.filter(approved=not approved)
+        product_ids = set(changing.values_list("product_id", flat=True))
+        updated = changing.update(approved=approved)
+        if product_ids:
+            recalculate_product_ratings(product_ids)
+
+    duration_ms = (time.perf_counter() - started) * 1000
+    logger.info(
+        "Review moderation: %s reviews %s, %s products recomputed in %.1f ms",
+        updated,
+        "approved" if approved else "rejected",
+        len(product_ids),
+        duration_ms,
+    )
+    return {
+        "updated": updated,
+        "products": len(product_ids),
+        "duration_ms": round(duration_ms, 1),
+    }
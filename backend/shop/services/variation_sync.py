@@ -0,0 +1,122 @@
+"""
+Set-based synchronization of a product's variations.
+
+The submitted variation list is diffed against the stored one in memory
+and applied with one bulk_update, one bulk_create, one delete and bulk
+inserts into the attribute through table, all in one transaction. A
+product with hundreds of variations is saved with a constant number of
+queries instead of several per variation.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import ProtectedError
+
+from shop.cache import bump_generation
+from shop.models import (
+    AttributeValue,
+    ProductVariation,
+    deferred_stock_refresh,
+    refresh_stock_totals,
+    refresh_variation_keys,
+)
+
+
+class VariationSyncError(Exception):
+    """Raised when the submitted variations cannot be applied."""
+
+
+def sync_variations(product, variations):
+    """
+    Replaces the product's variations with the submitted ones.
+
+    Entries whose `id` belongs to one of the product's variations update it,
+    all others are created; stored variations missing from the list are
+    deleted.
+
+    Args:
+        product: saved Product instance
+        variations: iterable of dicts with optional "id", optional "stock"
+            and "attributes" (list of AttributeValue IDs)
+
+    Returns:
+        dict with the numbers of created, updated and deleted variations
+
+    Raises:
+        VariationSyncError: unknown attribute values, or a variation to be
+            deleted is still referenced by orders
+    """
+    variations = list(variations)
+    through = ProductVariation.attributes.through
+
+    attribute_ids = {aid for entry in variations for aid in entry.get("attributes", ())}
+    known = set(AttributeValue.objects.filter(pk__in=attribute_ids).values_list("pk", flat=True))
+    if attribute_ids - known:
+        raise VariationSyncError(
+            f"Unbekannte Attributwerte: {', '.join(map(str, sorted(attribute_ids - known)))}"
+        )
+
+    with transaction.atomic():
+        stored = dict(
+            ProductVariation.objects.filter(product=product).values_list("pk", "stock")
+        )
+        stored_attributes = {pk: set() for pk in stored}
+        for variation_id, value_id in through.objects.filter(
+            productvariation_id__in=stored
+        ).values_list("productvariation_id", "attributevalue_id"):
+            stored_attributes[variation_id].add(value_id)
+
+        to_update, to_create, new_attributes = [], [], []
+        relink = {}  # bestehende Variation -> neue Attributmenge
+        kept = set()
+        for entry in variations:
+            variation_id = entry.get("id")
+            attrs = set(entry.get("attributes", ()))
+            if variation_id in stored and variation_id not in kept:
+                kept.add(variation_id)
+                stock = entry.get("stock", stored[variation_id])
+                if stock != stored[variation_id]:
+                    to_update.append(ProductVariation(pk=variation_id, product=product, stock=stock))
+                if attrs != stored_attributes[variation_id]:
+                    relink[variation_id] = attrs
+            else:
+                to_create.append(ProductVariation(product=product, stock=entry.get("stock", 0)))
+                new_attributes.append(attrs)
+
+        removed = set(stored) - kept
+        if removed:
+            try:
+                with deferred_stock_refresh():
+                    ProductVariation.objects.filter(pk__in=removed).delete()
+            except ProtectedError:
+                raise VariationSyncError(
+                    "Variationen mit Bestellungen können nicht gelöscht werden."
+                )
+
+        if to_update:
+            ProductVariation.objects.bulk_update(to_update, ["stock"])
+        ProductVariation.objects.bulk_create(to_create)
+
+        if relink:
+            through.objects.filter(productvariation_id__in=relink).delete()
+        links = [
+            through(productvariation_id=variation_id, attributevalue_id=value_id)
+            for variation_id, attrs in relink.items()
+            for value_id in attrs
+        ]
+        links += [
+            through(productvariation_id=variation.pk, attributevalue_id=value_id)
+            for variation, attrs in zip(to_create, new_attributes)
+            for value_id in attrs
+        ]
+        through.objects.bulk_create(links)
+        try:
+            refresh_variation_keys([*relink, *(variation.pk for variation in to_create)])
+        except IntegrityError:
+            raise VariationSyncError("Jede Attributkombination darf nur einmal vorkommen.")
+
+        # Bulk-Operationen lösen keine Signale aus
+        if to_update or to_create or removed:
+            refresh_stock_totals([product.pk])
+        if to_update or to_create or removed or relink:
+            bump_generation("shop.ProductVariation")
+
+    return {"created": len(to_create), "updated": len({v.pk for v in to_update} | set(relink)), "deleted": len(removed)}
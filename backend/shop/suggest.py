@@ -0,0 +1,194 @@
+"""
+Typeahead-Vorschläge aus einem In-Memory-Präfixindex.
+
+Der Index ist ein sortiertes Array von Schlüsseln, Präfixe werden per
+bisect gesucht – Vorschläge kommen ohne Datenbankzugriff. Er enthält
+Produkttitel (auch ab jedem Wortanfang), Kategorie-Anzeigenamen und
+Attributwerte, wird beim ersten Zugriff aus der Datenbank aufgebaut und
+danach über Signale (nach dem Commit) inkrementell aktualisiert.
+
+Hinweis: Der Index lebt pro Prozess. Änderungen, die in einem anderen
+Worker-Prozess gespeichert werden, sieht dieser Prozess erst nach
+`index.reset()` bzw. einem Neustart.
+"""
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import AttributeValue, Category, Product
+
+# Reihenfolge der Vorschlagsarten bei gleicher Relevanz
+KIND_PRIORITY = {"category": 0, "attribute": 1, "product": 2}
+# Wie viele Präfixtreffer maximal für das Ranking betrachtet werden
+SCAN_LIMIT = 200
+
+
+def normalize(text):
+    """Kleinschreibung ohne diakritische Zeichen ("Grün" -> "grun")."""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold().strip()
+
+
+def _keys_for(text, every_word=False):
+    key = normalize(text)
+    if not key:
+        return []
+    if not every_word:
+        return [key]
+    words = key.split()
+    return [" ".join(words[i:]) for i in range(len(words))]
+
+
+class PrefixIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built = False
+        self._keys = []      # sortiert: (key, kind, id)
+        self._entries = {}   # (kind, id) -> {"label": ..., "keys": [...], ...}
+
+    @property
+    def built(self):
+        return self._built
+
+    def reset(self):
+        with self._lock:
+            self._built = False
+            self._keys = []
+            self._entries = {}
+
+    def build(self):
+        """Lädt alle Einträge mit drei schlanken Queries."""
+        entries = []
+        for pk, title in Product.objects.values_list("id", "title"):
+            entries.append(("product", pk, title, _keys_for(title, every_word=True), {}))
+        for pk, name, display_name in Category.objects.values_list("id", "name", "display_name"):
+            label = display_name or name
+            entries.append(("category", pk, label, _keys_for(label), {}))
+        for pk, value, type_name in AttributeValue.objects.values_list("id", "value", "attribute_type__name"):
+            entries.append(("attribute", pk, value, _keys_for(value), {"attribute_type": type_name}))
+
+        keys = []
+        data = {}
+        for kind, pk, label, entry_keys, extra in entries:
+            data[(kind, pk)] = {"label": label, "keys": entry_keys, **extra}
+            keys.extend((key, kind, pk) for key in entry_keys)
+        keys.sort()
+
+        with self._lock:
+            self._keys = keys
+            self._entries = data
+            self._built = True
+
+    def ensure_built(self):
+        if not self._built:
+            self.build()
+
+    def upsert(self, kind, pk, label, every_word=False, **extra):
+        with self._lock:
+            if not self._built:
+                return
+            self._remove(kind, pk)
+            entry_keys = _keys_for(label, every_word=every_word)
+            self._entries[(kind, pk)] = {"label": label, "keys": entry_keys, **extra}
+            for key in entry_keys:
+                insort(self._keys, (key, kind, pk))
+
+    def remove(self, kind, pk):
+        with self._lock:
+            if self._built:
+                self._remove(kind, pk)
+
+    def _remove(self, kind, pk):
+        entry = self._entries.pop((kind, pk), None)
+        if entry is None:
+            return
+        for key in entry["keys"]:
+            pos = bisect_left(self._keys, (key, kind, pk))
+            if pos < len(self._keys) and self._keys[pos] == (key, kind, pk):
+                del self._keys[pos]
+
+    def suggest(self, query, limit=8):
+        """
+        Liefert bis zu `limit` Vorschläge, deren Text (bei Produkten auch ein
+        späteres Wort) mit `query` beginnt.
+        """
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        self.ensure_built()
+
+        with self._lock:
+            candidates = {}
+            pos = bisect_left(self._keys, (prefix,))
+            while pos < len(self._keys) and len(candidates) < SCAN_LIMIT:
+                key, kind, pk = self._keys[pos]
+                if not key.startswith(prefix):
+                    break
+                # Treffer am Textanfang schlägt Treffer mitten im Titel
+                rank = (key != self._entries[(kind, pk)]["keys"][0], KIND_PRIORITY[kind], len(key))
+                if (kind, pk) not in candidates or rank < candidates[(kind, pk)]:
+                    candidates[(kind, pk)] = rank
+                pos += 1
+
+            ranked = sorted(candidates.items(), key=lambda item: (item[1], self._entries[item[0]]["label"]))
+            results = []
+            for (kind, pk), _ in ranked[:limit]:
+                entry = self._entries[(kind, pk)]
+                result = {"type": kind, "id": pk, "text": entry["label"]}
+                if kind == "attribute":
+                    result["attribute_type"] = entry["attribute_type"]
+                results.append(result)
+            return results
+
+
+index = PrefixIndex()
+
+
+def _after_commit(func, *args, **kwargs):
+    transaction.on_commit(lambda: func(*args, **kwargs))
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance: Product, **kwargs):
+    if index.built:
+        _after_commit(index.upsert, "product", instance.pk, instance.title, every_word=True)
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance: Product, **kwargs):
+    if index.built:
+        _after_commit(index.remove, "product", instance.pk)
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance: Category, **kwargs):
+    if index.built:
+        _after_commit(index.upsert, "category", instance.pk, instance.display_name or instance.name)
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance: Category, **kwargs):
+    if index.built:
+        _after_commit(index.remove, "category", instance.pk)
+
+
+@receiver(post_save, sender=AttributeValue)
+def attribute_value_saved(sender, instance: AttributeValue, **kwargs):
+    if index.built:
+        _after_commit(
+            index.upsert,
+            "attribute",
+            instance.pk,
+            instance.value,
+            attribute_type=instance.attribute_type.name,
+        )
+
+
+@receiver(post_delete, sender=AttributeValue)
+def attribute_value_deleted(sender, instance: AttributeValue, **kwargs):
+    if index.built:
+        _after_commit(index.remove, "attribute", instance.pk)
@@ -1,12 +1,47 @@
+import csv
+import gzip
+import json
+import tempfile
+import threading
+from datetime import timedelta
 from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
-from django.test import TestCase
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail import EmailMultiAlternatives
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework.test import APIClient
 
-from .models import Order
+from .models import (
+    AttributeType,
+    AttributeValue,
+    Category,
+    DeliveryTime,
+    IdempotencyKey,
+    Order,
+    OrderItem,
+    OutboxEmail,
+    Product,
+    ProductImage,
+    ProductVariation,
+    ReturnRequest,
+    ReturnStatusChange,
+    Review,
+    refresh_stock_totals,
+)
+from .pagination import ProductCursorPagination
+from .serializers import ProductListSerializer
+from .suggest import index as suggest_index
 
 
 class ShippingOrderViewSetTests(TestCase):
@@ -63,3 +98,1707 @@ class ShippingOrderViewSetTests(TestCase):
         self.assertEqual(self.order.status, "ready_to_ship")
         self.assertEqual(self.order.shipping_carrier, "dhl")
         self.assertEqual(self.order.tracking_number, "DHL-123456789")
+
+
+class ProductListQueryCountTests(TestCase):
+    """Die Produktliste darf keine N+1-Queries auslösen."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.reviewer = User.objects.create_user(username="reviewer", password="secret123")
+        self.category = Category.objects.create(name="shirts", display_name="Hemden")
+        size = AttributeType.objects.create(name="Size")
+        self.sizes = [
+            AttributeValue.objects.create(attribute_type=size, value=v) for v in ("S", "M", "L")
+        ]
+        self.client = APIClient()
+
+    def _create_products(self, count):
+        for i in range(count):
+            product = Product.objects.create(
+                title=f"Hemd {i}", price=Decimal("19.90"), category=self.category
+            )
+            ProductImage.objects.create(product=product, external_image="https://example.com/a.jpg")
+            for attr in self.sizes:
+                variation = ProductVariation.objects.create(product=product, stock=3)
+                variation.attributes.add(attr)
+            for rating in (5, 4, 3, 2, 1, 5, 4):
+                Review.objects.create(product=product, user=self.reviewer, rating=rating)
+
+    def _list_query_count(self, url="/api/products/?view=full"):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_query_count_is_constant(self):
+        self._create_products(1)
+        queries_one, _ = self._list_query_count()
+
+        self._create_products(10)
+        queries_many, response = self._list_query_count()
+
+        self.assertEqual(queries_one, queries_many)
+        self.assertEqual(len(response.data), 11)
+
+    def test_recent_reviews_are_limited_to_five_approved(self):
+        self._create_products(1)
+        product = Product.objects.get()
+        Review.objects.filter(product=product, rating=1).update(approved=False)
+
+        _, response = self._list_query_count()
+        reviews = response.data[0]["recent_reviews"]
+
+        self.assertEqual(len(reviews), 5)
+        self.assertTrue(all(r["rating"] != 1 for r in reviews))
+        self.assertEqual(reviews[0]["user"], "reviewer")
+        self.assertEqual(response.data[0]["stock_total"], 9)
+
+
+class ProductCursorPaginationTests(TestCase):
+    """Cursor-Pagination der Produktliste (nur auf Anfrage aktiv)."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.products = [
+            Product.objects.create(title=f"Produkt {i}", price=Decimal("10.00")) for i in range(7)
+        ]
+
+    def test_without_params_returns_plain_list(self):
+        response = self.client.get("/api/products/")
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(len(response.data), 7)
+
+    def test_pages_cover_all_products_exactly_once(self):
+        seen = []
+        url = "/api/products/?page_size=3"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data["results"]), 3)
+            seen.extend(p["id"] for p in response.data["results"])
+            url = response.data["next"]
+
+        self.assertEqual(sorted(seen), sorted(p.id for p in self.products))
+        # neueste zuerst, bei gleichem Zeitstempel nach id
+        self.assertEqual(seen, sorted(seen, reverse=True))
+
+    def test_page_size_is_capped(self):
+        with mock.patch.object(ProductCursorPagination, "max_page_size", 4):
+            response = self.client.get("/api/products/?page_size=1000")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 4)
+
+
+class ProductListRepresentationTests(TestCase):
+    """Schlanke Listen- vs. vollständige Detaildarstellung."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.category = Category.objects.create(name="shirts")
+        self.product = Product.objects.create(
+            title="Hemd", description="Lang", price=Decimal("19.90"), category=self.category
+        )
+        ProductVariation.objects.create(product=self.product, stock=4)
+        ProductVariation.objects.create(product=self.product, stock=2)
+
+    def test_list_uses_slim_representation(self):
+        response = self.client.get("/api/products/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            set(response.data[0]),
+            {"id", "title", "price", "image_url", "rating_avg", "rating_count", "stock_total", "category"},
+        )
+        self.assertEqual(response.data[0]["category"], self.category.id)
+        self.assertEqual(response.data[0]["stock_total"], 6)
+
+    def test_retrieve_and_full_list_use_full_representation(self):
+        detail = self.client.get(f"/api/products/{self.product.id}/")
+        self.assertIn("variations", detail.data)
+        self.assertEqual(detail.data["category"]["id"], self.category.id)
+
+        full_list = self.client.get("/api/products/?view=full")
+        self.assertIn("recent_reviews", full_list.data[0])
+
+    def test_sparse_fieldset(self):
+        response = self.client.get("/api/products/?fields=id,title")
+        self.assertEqual(set(response.data[0]), {"id", "title"})
+
+        # Beschreibung nur auf Anfrage in der schlanken Liste
+        response = self.client.get("/api/products/?fields=id,title,description,category")
+        self.assertEqual(response.data[0]["description"], "Lang")
+        self.assertEqual(response.data[0]["category"], self.category.id)
+        self.assertNotIn("variations", response.data[0])
+
+        detail = self.client.get(f"/api/products/{self.product.id}/?fields=id,variations")
+        self.assertEqual(set(detail.data), {"id", "variations"})
+
+
+class ProductStockTotalTests(TestCase):
+    """Product.stock_total wird bei Änderungen an Variationen mitgeführt."""
+
+    def setUp(self):
+        self.product = Product.objects.create(title="Hemd", price=Decimal("19.90"))
+
+    def _stock_total(self):
+        self.product.refresh_from_db(fields=["stock_total"])
+        return self.product.stock_total
+
+    def test_variation_changes_update_stock_total(self):
+        small = ProductVariation.objects.create(product=self.product, stock=4)
+        ProductVariation.objects.create(product=self.product, stock=6)
+        self.assertEqual(self._stock_total(), 10)
+
+        small.stock = 1
+        small.save()
+        self.assertEqual(self._stock_total(), 7)
+
+        small.delete()
+        self.assertEqual(self._stock_total(), 6)
+
+    def test_in_stock_filter_and_sorting_in_sql(self):
+        ProductVariation.objects.create(product=self.product, stock=2)
+        empty = Product.objects.create(title="Leer", price=Decimal("5.00"))
+
+        in_stock = Product.objects.filter(stock_total__gt=0)
+        self.assertEqual(list(in_stock), [self.product])
+        self.assertEqual(list(Product.objects.order_by("stock_total")), [empty, self.product])
+
+    def test_rebuild_command_fixes_drift(self):
+        ProductVariation.objects.create(product=self.product, stock=5)
+        # queryset.update() umgeht die Signale -> Drift
+        ProductVariation.objects.filter(product=self.product).update(stock=8)
+
+        with self.assertRaises(CommandError):
+            call_command("rebuild_stock_totals", "--check", stdout=StringIO())
+
+        call_command("rebuild_stock_totals", stdout=StringIO())
+        self.assertEqual(self._stock_total(), 8)
+        call_command("rebuild_stock_totals", "--check", stdout=StringIO())
+
+
+class IncrementalRatingTests(TestCase):
+    """Bewertungsaggregate werden inkrementell per Delta gepflegt."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(username="kunde", password="secret123")
+        self.product = Product.objects.create(title="Hemd", price=Decimal("19.90"))
+
+    def _rating(self):
+        self.product.refresh_from_db()
+        return self.product.rating_sum, self.product.rating_count, self.product.rating_avg
+
+    def test_create_change_unapprove_delete(self):
+        first = Review.objects.create(product=self.product, user=self.user, rating=5)
+        Review.objects.create(product=self.product, user=self.user, rating=2)
+        self.assertEqual(self._rating(), (7, 2, Decimal("3.50")))
+
+        first.rating = 4
+        first.save()
+        self.assertEqual(self._rating(), (6, 2, Decimal("3.00")))
+
+        first.approved = False
+        first.save()
+        self.assertEqual(self._rating(), (2, 1, Decimal("2.00")))
+
+        first.approved = True
+        first.save()
+        self.assertEqual(self._rating(), (6, 2, Decimal("3.00")))
+
+        loaded = Review.objects.get(pk=first.pk)
+        loaded.delete()
+        self.assertEqual(self._rating(), (2, 1, Decimal("2.00")))
+
+    def test_deferred_loads_recalculate_instead_of_delta(self):
+        review = Review.objects.create(product=self.product, user=self.user, rating=5)
+        Review.objects.create(product=self.product, user=self.user, rating=3)
+
+        # only()/defer() dürfen beim Laden nicht rekursiv nachladen
+        self.assertEqual(Review.objects.only("id").get(pk=review.pk).pk, review.pk)
+        deferred = Review.objects.defer("approved").get(pk=review.pk)
+
+        deferred.rating = 1
+        deferred.save()
+        self.assertEqual(self._rating(), (4, 2, Decimal("2.00")))
+
+        partial = Review.objects.only("id", "body").get(pk=review.pk)
+        partial.body = "Nachtrag"
+        partial.save()
+        self.assertEqual(self._rating(), (4, 2, Decimal("2.00")))
+
+        Review.objects.only("id").get(pk=review.pk).delete()
+        self.assertEqual(self._rating(), (3, 1, Decimal("3.00")))
+
+    def test_save_without_change_issues_no_product_update(self):
+        review = Review.objects.create(product=self.product, user=self.user, rating=3)
+        review = Review.objects.get(pk=review.pk)
+        review.body = "Nachtrag"
+        with CaptureQueriesContext(connection) as ctx:
+            review.save()
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_rating_update_uses_single_query(self):
+        review = Review.objects.create(product=self.product, user=self.user, rating=3)
+        review.rating = 5
+        with CaptureQueriesContext(connection) as ctx:
+            review.save()
+        self.assertEqual(len(ctx.captured_queries), 2)  # Review-UPDATE + Produkt-UPDATE
+        self.assertEqual(self._rating(), (5, 1, Decimal("5.00")))
+
+    def test_stale_product_save_keeps_aggregates(self):
+        stale = Product.objects.get(pk=self.product.pk)
+        Review.objects.create(product=self.product, user=self.user, rating=5)
+        Review.objects.create(product=self.product, user=self.user, rating=3)
+        ProductVariation.objects.create(product=self.product, stock=7)
+
+        stale.title = "Hemd blau"
+        stale.save()
+        self.assertEqual(self._rating(), (8, 2, Decimal("4.00")))
+        self.assertEqual((self.product.title, self.product.stock_total), ("Hemd blau", 7))
+
+        response = APIClient().patch(
+            f"/api/products/{self.product.id}/", {"price": "25.00", "rating_count": 99}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._rating(), (8, 2, Decimal("4.00")))
+        self.assertEqual(self.product.stock_total, 7)
+
+    def test_reconcile_command_fixes_drift(self):
+        Review.objects.create(product=self.product, user=self.user, rating=4)
+        Review.objects.filter(product=self.product).update(rating=1)
+
+        with self.assertRaises(CommandError):
+            call_command("reconcile_ratings", "--check", stdout=StringIO())
+
+        call_command("reconcile_ratings", stdout=StringIO())
+        self.assertEqual(self._rating(), (1, 1, Decimal("1.00")))
+        call_command("reconcile_ratings", "--check", stdout=StringIO())
+
+
+class BulkReviewModerationTests(TestCase):
+    """Sammel-Freigabe von Bewertungen berechnet jedes Produkt genau einmal neu."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.staff = User.objects.create_user(username="admin", password="secret123", is_staff=True)
+        self.customer = User.objects.create_user(username="kunde", password="secret123")
+        self.products = [
+            Product.objects.create(title=f"Produkt {i}", price=Decimal("10.00")) for i in range(2)
+        ]
+        self.reviews = [
+            Review.objects.create(product=product, user=self.customer, rating=rating, approved=False)
+            for product in self.products
+            for rating in (5, 3)
+        ]
+        self.client = APIClient()
+
+    def test_staff_can_approve_in_bulk(self):
+        self.client.force_authenticate(self.staff)
+        ids = [r.id for r in self.reviews]
+        response = self.client.post("/api/reviews/moderate/", {"ids": ids, "approved": True}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["updated"], 4)
+        self.assertEqual(response.data["products"], 2)
+        for product in self.products:
+            product.refresh_from_db()
+            self.assertEqual((product.rating_count, product.rating_avg), (2, Decimal("4.00")))
+
+        response = self.client.post("/api/reviews/moderate/", {"ids": ids[:1], "approved": False}, format="json")
+        self.assertEqual(response.data["updated"], 1)
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].rating_avg, Decimal("3.00"))
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        from .services.review_service import set_reviews_approved
+
+        with CaptureQueriesContext(connection) as small:
+            set_reviews_approved([self.reviews[0].id], True)
+        with CaptureQueriesContext(connection) as large:
+            set_reviews_approved([r.id for r in self.reviews[1:]], True)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_requires_staff(self):
+        self.client.force_authenticate(self.customer)
+        response = self.client.post(
+            "/api/reviews/moderate/", {"ids": [self.reviews[0].id], "approved": True}, format="json"
+        )
+        self.assertEqual(response.status_code, 403)
+
+
+class PlaceOrderStockTests(TestCase):
+    """Checkout reserviert Lagerbestand atomar."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(username="kunde", password="secret123")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        self.product = Product.objects.create(title="Hemd", price=Decimal("20.00"))
+        size = AttributeType.objects.create(name="Size")
+        self.size_m = AttributeValue.objects.create(attribute_type=size, value="M")
+        self.size_l = AttributeValue.objects.create(attribute_type=size, value="L")
+        self.var_m = ProductVariation.objects.create(product=self.product, stock=3)
+        self.var_m.attributes.add(self.size_m)
+        self.var_l = ProductVariation.objects.create(product=self.product, stock=1)
+        self.var_l.attributes.add(self.size_l)
+
+    def _place(self, *cart_items):
+        return self.client.post(
+            "/api/order/place/",
+            {"cartItems": list(cart_items), "address": {"name": "Max"}, "paymentMethod": "paypal"},
+            format="json",
+        )
+
+    def test_order_decrements_stock_of_selected_variation(self):
+        response = self._place({"product": self.product.id, "quantity": 2, "selectedAttributes": {"Size": "m"}})
+
+        self.assertEqual(response.status_code, 201)
+        self.var_m.refresh_from_db()
+        self.product.refresh_from_db()
+        self.assertEqual(self.var_m.stock, 1)
+        self.assertEqual(self.product.stock_total, 2)
+        self.assertEqual(response.data["items"][0]["variation"], self.var_m.id)
+        self.assertEqual(response.data["total"], "40.00")
+
+    def test_insufficient_stock_persists_nothing(self):
+        response = self._place(
+            {"product": self.product.id, "quantity": 1, "variation": self.var_m.id},
+            {"product": self.product.id, "quantity": 2, "variation": self.var_l.id},
+        )
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data["variation"], self.var_l.id)
+        self.assertEqual(response.data["available"], 1)
+        self.var_m.refresh_from_db()
+        self.assertEqual(self.var_m.stock, 3)
+        self.assertFalse(Order.objects.exists())
+
+    def test_unknown_product_and_variation(self):
+        self.assertEqual(self._place({"product": 999, "quantity": 1}).status_code, 400)
+        response = self._place({"product": self.product.id, "quantity": 1, "selectedAttributes": {"size": "XXL"}})
+        self.assertEqual(response.status_code, 400)
+
+    def test_incomplete_selection_is_rejected(self):
+        # erste Variante ausverkauft: ohne Auswahl darf nicht auf sie zurückgefallen werden
+        ProductVariation.objects.filter(pk=self.var_m.pk).update(stock=0)
+        for selected in ({}, {"color": "rot"}):
+            response = self._place({"product": self.product.id, "quantity": 1, "selectedAttributes": selected})
+            self.assertEqual(response.status_code, 400)
+
+        color = AttributeType.objects.create(name="Color")
+        self.var_l.attributes.add(AttributeValue.objects.create(attribute_type=color, value="Rot"))
+        response = self._place({"product": self.product.id, "quantity": 1, "selectedAttributes": {"size": "L"}})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Incomplete", response.data["error"])
+        response = self._place(
+            {"product": self.product.id, "quantity": 1, "selectedAttributes": {"size": "L", "color": "rot"}}
+        )
+        self.assertEqual(response.status_code, 201)
+        self.var_l.refresh_from_db()
+        self.assertEqual(self.var_l.stock, 0)
+        self.assertFalse(Order.objects.filter(items__variation=self.var_m).exists())
+
+    def test_query_count_is_independent_of_cart_size(self):
+        products = []
+        for i in range(30):
+            product = Product.objects.create(title=f"Artikel {i}", price=Decimal("5.00"))
+            variation = ProductVariation.objects.create(product=product, stock=10)
+            variation.attributes.add(self.size_m)
+            products.append(product)
+
+        small_cart = [{"product": products[0].id, "quantity": 1, "selectedAttributes": {"size": "M"}}]
+        large_cart = [
+            {"product": p.id, "quantity": 2, "selectedAttributes": {"size": "M"}} for p in products
+        ]
+
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(self._place(*small_cart).status_code, 201)
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(self._place(*large_cart).status_code, 201)
+
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+        self.assertEqual(OrderItem.objects.filter(order__user=self.user).count(), 31)
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    """Parallele Bestellungen dürfen einen knappen Bestand nicht überverkaufen."""
+
+    STOCK = 3
+    BUYERS = 8
+
+    def setUp(self):
+        User = get_user_model()
+        self.users = [
+            User.objects.create_user(username=f"kunde{i}", password="secret123") for i in range(self.BUYERS)
+        ]
+        self.product = Product.objects.create(title="Limitiert", price=Decimal("99.00"))
+        self.variation = ProductVariation.objects.create(product=self.product, stock=self.STOCK)
+
+    def _checkout(self, user, barrier, results):
+        client = APIClient()
+        client.force_authenticate(user)
+        barrier.wait()
+        try:
+            response = client.post(
+                "/api/order/place/",
+                {"cartItems": [{"product": self.product.id, "quantity": 1, "variation": self.variation.id}]},
+                format="json",
+            )
+            results.append(response.status_code)
+        except Exception as exc:  # im Haupt-Thread auswerten
+            results.append(repr(exc))
+        finally:
+            connection.close()
+
+    def test_parallel_checkouts_do_not_oversell(self):
+        barrier = threading.Barrier(self.BUYERS)
+        results = []
+        threads = [
+            threading.Thread(target=self._checkout, args=(user, barrier, results)) for user in self.users
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.variation.refresh_from_db()
+        self.product.refresh_from_db()
+
+        self.assertEqual(sorted(results, key=str), [201] * self.STOCK + [409] * (self.BUYERS - self.STOCK))
+        self.assertEqual(self.variation.stock, 0)
+        self.assertEqual(self.product.stock_total, 0)
+        self.assertEqual(OrderItem.objects.count(), self.STOCK)
+
+
+class IdempotentCheckoutTests(TestCase):
+    """Wiederholte Checkouts mit demselben Idempotency-Key erzeugen nur eine Bestellung."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(username="kunde", password="secret123")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.product = Product.objects.create(title="Hemd", price=Decimal("20.00"))
+        self.variation = ProductVariation.objects.create(product=self.product, stock=5)
+        self.payload = {"cartItems": [{"product": self.product.id, "quantity": 1}]}
+
+    def _place(self, key, payload=None):
+        return self.client.post(
+            "/api/order/place/", payload or self.payload, format="json", HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def test_retry_returns_original_response(self):
+        first = self._place("abc-1")
+        with CaptureQueriesContext(connection) as ctx:
+            retry = self._place("abc-1")
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.data["id"], first.data["id"])
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(Order.objects.count(), 1)
+        self.variation.refresh_from_db()
+        self.assertEqual(self.variation.stock, 4)
+
+    def test_new_key_creates_new_order(self):
+        self._place("abc-1")
+        self._place("abc-2")
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_key_reuse_with_other_payload_is_rejected(self):
+        self._place("abc-1")
+        other = {"cartItems": [{"product": self.product.id, "quantity": 3}]}
+        self.assertEqual(self._place("abc-1", other).status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_expired_keys_are_purged(self):
+        self._place("abc-1")
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+
+        call_command("purge_idempotency_keys", stdout=StringIO())
+
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(self._place("abc-1").status_code, 201)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_expired_key_can_be_reused_before_purge(self):
+        first = self._place("abc-1")
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+
+        second = self._place("abc-1")
+        self.assertEqual(second.status_code, 201)
+        self.assertNotEqual(second.data["id"], first.data["id"])
+        self.assertEqual(IdempotencyKey.objects.get().order_id, second.data["id"])
+        self.assertEqual(self._place("abc-1")["Idempotent-Replayed"], "true")
+
+
+class ProductFilterTests(TestCase):
+    """Serverseitige Filter und Facetten der Produktliste."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.shirts = Category.objects.create(name="shirts")
+        self.shoes = Category.objects.create(name="shoes")
+        size = AttributeType.objects.create(name="Size")
+        color = AttributeType.objects.create(name="Color")
+        self.m = AttributeValue.objects.create(attribute_type=size, value="M")
+        self.l = AttributeValue.objects.create(attribute_type=size, value="L")
+        self.red = AttributeValue.objects.create(attribute_type=color, value="Red")
+
+        self.red_m_shirt = self._product("Rotes Hemd", "20.00", self.shirts, [([self.m, self.red], 2)])
+        self.split_shirt = self._product("Hemd gemischt", "30.00", self.shirts, [([self.m], 1), ([self.l, self.red], 1)])
+        self.sold_out_shoe = self._product("Schuh", "80.00", self.shoes, [([self.l], 0)])
+        Product.objects.filter(pk=self.red_m_shirt.pk).update(rating_avg=Decimal("4.50"))
+
+    def _product(self, title, price, category, variations):
+        product = Product.objects.create(title=title, price=Decimal(price), category=category)
+        for attrs, stock in variations:
+            variation = ProductVariation.objects.create(product=product, stock=stock)
+            variation.attributes.set(attrs)
+        return product
+
+    def _ids(self, query):
+        response = self.client.get(f"/api/products/?{query}")
+        self.assertEqual(response.status_code, 200)
+        return {p["id"] for p in response.data}
+
+    def test_simple_filters(self):
+        self.assertEqual(self._ids(f"category={self.shoes.id}"), {self.sold_out_shoe.id})
+        self.assertEqual(self._ids("min_price=25&max_price=50"), {self.split_shirt.id})
+        self.assertEqual(self._ids("min_rating=4"), {self.red_m_shirt.id})
+        self.assertEqual(self._ids("in_stock=1"), {self.red_m_shirt.id, self.split_shirt.id})
+
+    def test_attribute_filters_match_a_single_variation(self):
+        self.assertEqual(self._ids("attr=size:m&attr=color:red"), {self.red_m_shirt.id})
+        self.assertEqual(self._ids("attr=size:L"), {self.split_shirt.id, self.sold_out_shoe.id})
+        self.assertEqual(self._ids("attr=size:L&in_stock=1"), {self.split_shirt.id})
+        self.assertEqual(
+            self._ids("attr=size:M&attr=size:L"),
+            {self.red_m_shirt.id, self.split_shirt.id, self.sold_out_shoe.id},
+        )
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get("/api/products/?attr=size").status_code, 400)
+        self.assertEqual(self.client.get("/api/products/?min_price=abc").status_code, 400)
+
+    def test_facets(self):
+        response = self.client.get("/api/products/facets/?in_stock=1")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(c["name"], c["count"]) for c in response.data["categories"]], [("shirts", 2)]
+        )
+        counts = {(a["attribute_type"], a["value"]): a["count"] for a in response.data["attributes"]}
+        self.assertEqual(counts, {("Color", "Red"): 2, ("Size", "L"): 1, ("Size", "M"): 2})
+        self.assertEqual(response.data["price"], {"min": Decimal("20.00"), "max": Decimal("30.00")})
+
+
+class ProductSearchTests(TestCase):
+    """Volltextsuche über Titel und Beschreibung."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.shirt = Product.objects.create(
+            title="Blaues Hemd", description="Baumwolle, bügelfrei", price=Decimal("25.00")
+        )
+        self.jacket = Product.objects.create(
+            title="Jacke", description="Passt gut zu jedem Hemd", price=Decimal("90.00")
+        )
+        Product.objects.create(title="Socken", description="Wolle", price=Decimal("5.00"))
+
+    def _search(self, query):
+        response = self.client.get("/api/products/search/", {"q": query})
+        self.assertEqual(response.status_code, 200)
+        return [p["id"] for p in response.data]
+
+    def test_ranks_title_matches_first(self):
+        self.assertEqual(self._search("hemd"), [self.shirt.id, self.jacket.id])
+
+    def test_prefix_and_multiple_terms(self):
+        self.assertEqual(self._search("hem"), [self.shirt.id, self.jacket.id])
+        self.assertEqual(self._search("hemd baum"), [self.shirt.id])
+        self.assertEqual(self._search('"'), [])
+
+    def test_index_follows_changes(self):
+        self.shirt.title = "Rotes Polo"
+        self.shirt.description = ""
+        self.shirt.save()
+        self.assertEqual(self._search("polo"), [self.shirt.id])
+        self.assertEqual(self._search("hemd"), [self.jacket.id])
+
+        self.jacket.delete()
+        self.assertEqual(self._search("hemd"), [])
+
+    def test_fts_matches_icontains_baseline(self):
+        from .search import search_product_ids
+
+        fts = set(search_product_ids("hemd"))
+        baseline = set(search_product_ids("hemd", backend="icontains"))
+        self.assertEqual(fts, baseline)
+
+
+class ProductSuggestTests(TestCase):
+    """Typeahead-Vorschläge aus dem In-Memory-Präfixindex."""
+
+    def setUp(self):
+        suggest_index.reset()
+        self.addCleanup(suggest_index.reset)
+        self.client = APIClient()
+        self.category = Category.objects.create(name="shirts", display_name="Hemden")
+        self.shirt = Product.objects.create(title="Blaues Hemd", price=Decimal("25.00"))
+        self.scarf = Product.objects.create(title="Grüner Schal", price=Decimal("15.00"))
+        size = AttributeType.objects.create(name="Size")
+        self.size_m = AttributeValue.objects.create(attribute_type=size, value="M")
+
+    def _suggest(self, query):
+        response = self.client.get("/api/products/suggest/", {"q": query})
+        self.assertEqual(response.status_code, 200)
+        return [(s["type"], s["text"]) for s in response.data]
+
+    def test_prefix_matches_across_sources(self):
+        self.assertEqual(self._suggest("hem"), [("category", "Hemden"), ("product", "Blaues Hemd")])
+        self.assertEqual(self._suggest("grun"), [("product", "Grüner Schal")])
+        self.assertEqual(self._suggest("m"), [("attribute", "M")])
+        self.assertEqual(self._suggest(""), [])
+
+    def test_served_without_database_queries(self):
+        self._suggest("bla")
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self._suggest("bla"), [("product", "Blaues Hemd")])
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+    def test_index_is_updated_incrementally_after_commit(self):
+        suggest_index.build()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shirt.title = "Rotes Polo"
+            self.shirt.save()
+            Product.objects.create(title="Blazer", price=Decimal("120.00"))
+            self.scarf.delete()
+
+        self.assertEqual(self._suggest("bla"), [("product", "Blazer")])
+        self.assertEqual(self._suggest("polo"), [("product", "Rotes Polo")])
+        self.assertEqual(self._suggest("schal"), [])
+
+
+class ProductVariationSyncTests(TestCase):
+    """Mengenbasierter Abgleich der Variationen beim Speichern eines Produkts."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.product = Product.objects.create(title="Hemd", price=Decimal("20.00"))
+        size = AttributeType.objects.create(name="Size")
+        color = AttributeType.objects.create(name="Color")
+        self.sizes = [AttributeValue.objects.create(attribute_type=size, value=str(i)) for i in range(30)]
+        self.colors = [AttributeValue.objects.create(attribute_type=color, value=f"c{i}") for i in range(10)]
+
+    def _payload(self, variations):
+        return {"title": "Hemd", "price": "20.00", "variations": variations}
+
+    def _put(self, variations):
+        return self.client.put(f"/api/products/{self.product.id}/", self._payload(variations), format="json")
+
+    def _grid(self, stock):
+        return [
+            {"stock": stock, "attributes": [{"id": s.id}, {"id": c.id}]}
+            for s in self.sizes for c in self.colors
+        ]
+
+    def test_saves_many_variations_with_constant_queries(self):
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(self._put(self._grid(1)[:3]).status_code, 200)
+        ProductVariation.objects.all().delete()
+
+        with CaptureQueriesContext(connection) as large:
+            response = self._put(self._grid(1))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(ProductVariation.objects.filter(product=self.product).count(), 300)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_total, 300)
+
+        write_queries = lambda ctx: [q for q in ctx.captured_queries if not q["sql"].startswith("SELECT")]
+        # SQLite teilt große INSERTs in Blöcke à 999 Parameter, sonst konstant
+        self.assertLessEqual(len(write_queries(large)), len(write_queries(small)) + 2)
+        self.assertLessEqual(len(large.captured_queries), len(small.captured_queries) + 2)
+
+        # erneut speichern mit geänderten Beständen: Variationen bleiben erhalten
+        data = self.client.get(f"/api/products/{self.product.id}/").data
+        variations = [
+            {"id": v["id"], "stock": 2, "attributes": [{"id": a["id"]} for a in v["attributes"]]}
+            for v in data["variations"]
+        ]
+        ids_before = set(ProductVariation.objects.values_list("id", flat=True))
+        with CaptureQueriesContext(connection) as update:
+            self.assertEqual(self._put(variations).status_code, 200)
+        self.assertLess(len(update.captured_queries), 30)
+        self.assertEqual(set(ProductVariation.objects.values_list("id", flat=True)), ids_before)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_total, 600)
+
+    def test_diff_updates_creates_relinks_and_deletes(self):
+        keep = ProductVariation.objects.create(product=self.product, stock=1)
+        keep.attributes.set([self.sizes[0]])
+        relink = ProductVariation.objects.create(product=self.product, stock=4)
+        relink.attributes.set([self.sizes[1]])
+        drop = ProductVariation.objects.create(product=self.product, stock=9)
+
+        response = self._put([
+            {"id": keep.id, "stock": 5, "attributes": [{"id": self.sizes[0].id}]},
+            {"id": relink.id, "stock": 4, "attributes": [{"id": self.sizes[2].id}, {"id": self.colors[0].id}]},
+            {"stock": 3, "attributes": [{"id": self.sizes[3].id}]},
+        ])
+        self.assertEqual(response.status_code, 200)
+
+        self.assertFalse(ProductVariation.objects.filter(pk=drop.pk).exists())
+        keep.refresh_from_db()
+        self.assertEqual(keep.stock, 5)
+        self.assertEqual(
+            set(relink.attributes.values_list("id", flat=True)), {self.sizes[2].id, self.colors[0].id}
+        )
+        created = ProductVariation.objects.exclude(pk__in=[keep.pk, relink.pk]).get()
+        self.assertEqual(list(created.attributes.values_list("id", flat=True)), [self.sizes[3].id])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_total, 12)
+
+    def test_patch_without_variations_keeps_them(self):
+        ProductVariation.objects.create(product=self.product, stock=2)
+        response = self.client.patch(f"/api/products/{self.product.id}/", {"price": "25.00"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.product.variations.count(), 1)
+
+    def test_rejects_unknown_attributes_and_ordered_variations(self):
+        response = self._put([{"stock": 1, "attributes": [{"id": 999999}]}])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("variations", response.data)
+
+        variation = ProductVariation.objects.create(product=self.product, stock=2)
+        user = get_user_model().objects.create_user(username="kunde", password="x")
+        order = Order.objects.create(user=user, total=Decimal("20.00"))
+        OrderItem.objects.create(
+            order=order, product=self.product, variation=variation, price=Decimal("20.00"), quantity=1
+        )
+        response = self._put([])
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(ProductVariation.objects.filter(pk=variation.pk).exists())
+
+
+class VariationKeyTests(TestCase):
+    """Gespeicherter variation_key und Lookup per Attributkombination."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.product = Product.objects.create(title="Hemd", price=Decimal("20.00"))
+        self.size = AttributeType.objects.create(name="Size")
+        self.color = AttributeType.objects.create(name="Color")
+        self.m = AttributeValue.objects.create(attribute_type=self.size, value="M")
+        self.l = AttributeValue.objects.create(attribute_type=self.size, value="L")
+        self.red = AttributeValue.objects.create(attribute_type=self.color, value="Rot")
+        self.variation = ProductVariation.objects.create(product=self.product, stock=4)
+        self.variation.attributes.set([self.m, self.red])
+
+    def _key(self, variation):
+        variation.refresh_from_db()
+        return variation.variation_key
+
+    def test_key_follows_attribute_changes(self):
+        self.assertEqual(self._key(self.variation), "color:rot|size:m")
+        self.variation.attributes.set([self.l, self.red])
+        self.assertEqual(self._key(self.variation), "color:rot|size:l")
+
+        self.red.value = "Blau"
+        self.red.save()
+        self.assertEqual(self._key(self.variation), "color:blau|size:l")
+
+        self.color.name = "Farbe"
+        self.color.save()
+        self.assertEqual(self._key(self.variation), "farbe:blau|size:l")
+
+        self.red.delete()
+        self.assertEqual(self._key(self.variation), "size:l")
+        self.l.variations.clear()
+        self.assertEqual(self._key(self.variation), "")
+
+    def test_combination_is_unique_per_product(self):
+        other = ProductVariation.objects.create(product=self.product, stock=1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            other.attributes.set([self.red, self.m])
+        response = self.client.put(
+            f"/api/products/{self.product.id}/",
+            {"title": "Hemd", "price": "20.00", "variations": [
+                {"stock": 1, "attributes": [{"id": self.l.id}]},
+                {"stock": 2, "attributes": [{"id": self.l.id}]},
+            ]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_lookup_endpoint_uses_single_query(self):
+        url = f"/api/products/{self.product.id}/variation/"
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, {"size": "m", "Color": "ROT"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(response.data["id"], self.variation.id)
+        self.assertEqual(response.data["attributes"], {"color": "rot", "size": "m"})
+        self.assertTrue(response.data["is_in_stock"])
+
+        self.assertEqual(self.client.get(url, {"size": "M"}).status_code, 404)
+        self.assertEqual(self.client.get(url).status_code, 400)
+        # reservierte Parameter sind keine Attribute
+        response = self.client.get(url, {"size": "m", "color": "rot", "format": "json", "view": "full", "fields": "id"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(url, {"format": "json"}).status_code, 400)
+
+    def test_duplicate_combination_is_a_validation_error(self):
+        other = ProductVariation.objects.create(product=self.product, stock=1)
+        other.attributes.set([self.l, self.red])
+        url = f"/api/product-variations/{other.id}/"
+        response = self.client.patch(url, {"attributes": [{"id": self.m.id}, {"id": self.red.id}]}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("attributes", response.data)
+        self.assertEqual(self._key(other), "color:rot|size:l")
+        # eigene Kombination erneut speichern ist erlaubt
+        response = self.client.patch(url, {"attributes": [{"id": self.l.id}, {"id": self.red.id}], "stock": 5}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+    def test_attribute_swap_checks_only_final_combination(self):
+        blue = AttributeValue.objects.create(attribute_type=self.color, value="Blau")
+        green = AttributeValue.objects.create(attribute_type=self.color, value="Grün")
+        self.variation.attributes.set([self.m])
+        other = ProductVariation.objects.create(product=self.product, stock=1)
+        other.attributes.set([self.m, blue])
+
+        # set() entfernt "blau" vor dem Hinzufügen von "grün": Zwischenstand wäre {size:m}
+        response = self.client.patch(
+            f"/api/product-variations/{other.id}/", {"attributes": [{"id": self.m.id}, {"id": green.id}]}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._key(other), "color:grün|size:m")
+
+    def test_concurrent_duplicate_becomes_validation_error(self):
+        other = ProductVariation.objects.create(product=self.product, stock=1)
+        other.attributes.set([self.l, self.red])
+        url = f"/api/product-variations/{other.id}/"
+        # Prüfung vor dem Speichern verpasst eine parallel angelegte Kombination
+        with mock.patch("shop.serializers.variation_key_taken", return_value=False):
+            response = self.client.patch(url, {"attributes": [{"id": self.m.id}, {"id": self.red.id}]}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("attributes", response.data)
+        self.assertEqual(self._key(other), "color:rot|size:l")
+        self.assertEqual(sorted(other.attributes.values_list("value", flat=True)), ["L", "Rot"])
+
+    def test_admin_inline_rejects_duplicate_combination(self):
+        from django.forms.models import inlineformset_factory
+        from .admin import ProductVariationInlineFormSet
+
+        FormSet = inlineformset_factory(
+            Product, ProductVariation, formset=ProductVariationInlineFormSet, fields=["attributes", "stock"], extra=1
+        )
+        data = {
+            "variations-TOTAL_FORMS": "2",
+            "variations-INITIAL_FORMS": "1",
+            "variations-0-id": str(self.variation.id),
+            "variations-0-attributes": [str(self.m.id), str(self.red.id)],
+            "variations-0-stock": "4",
+            "variations-1-attributes": [str(self.red.id), str(self.m.id)],
+            "variations-1-stock": "1",
+        }
+        formset = FormSet(data, instance=self.product)
+        self.assertFalse(formset.is_valid())
+        self.assertIn("nur einmal", str(formset.non_form_errors()))
+
+    def test_checkout_resolves_selected_attributes_from_key(self):
+        from .services.checkout_service import place_order
+
+        user = get_user_model().objects.create_user(username="kunde", password="x")
+        order = place_order(
+            user,
+            [{"product": self.product.id, "quantity": 1, "selectedAttributes": {"Size": "M", "Color": "ROT"}}],
+            {"name": "A", "street": "B", "zip": "1", "city": "C"},
+            "paypal",
+        )
+        self.assertEqual(order.items.get().variation_id, self.variation.id)
+
+
+class ShippingOrderQueueTests(TestCase):
+    """Versand-Warteschlange: Prefetching, Filter und Keyset-Pagination."""
+
+    def setUp(self):
+        self.client = APIClient()
+        User = get_user_model()
+        self.staff = User.objects.create_user(username="lager", password="x", is_staff=True)
+        self.customer = User.objects.create_user(username="kunde", password="x")
+        self.client.force_authenticate(self.staff)
+        self.product = Product.objects.create(title="Hemd", price=Decimal("20.00"))
+
+    def _order(self, status="paid", carrier=None, days_ago=0, returns=0):
+        order = Order.objects.create(user=self.customer, status=status, shipping_carrier=carrier)
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+        item = OrderItem.objects.create(
+            order=order, product=self.product, product_title="Hemd", price=Decimal("20.00"), quantity=1
+        )
+        for _ in range(returns):
+            ReturnRequest.objects.create(order=order, item=item, user=self.customer, reason="defekt")
+        return order
+
+    def _ids(self, params=None):
+        response = self.client.get("/api/shipping/orders/", params or {})
+        self.assertEqual(response.status_code, 200)
+        return [o["id"] for o in response.data]
+
+    def test_query_count_is_independent_of_queue_length(self):
+        for i in range(3):
+            self._order(returns=1)
+        with CaptureQueriesContext(connection) as few:
+            self._ids()
+        for i in range(20):
+            self._order(returns=2)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get("/api/shipping/orders/")
+        self.assertEqual(len(many.captured_queries), len(few.captured_queries))
+        self.assertEqual(response.data[-1]["return_request_count"], 2)
+        self.assertTrue(response.data[-1]["return_requested"])
+
+    def test_filters(self):
+        old = self._order(status="ready_to_ship", carrier="dhl", days_ago=10)
+        new = self._order(status="paid", days_ago=1)
+        shipped = self._order(status="shipped", carrier="dhl")
+
+        self.assertEqual(self._ids(), [old.id, new.id])
+        self.assertEqual(self._ids({"status": "ready_to_ship"}), [old.id])
+        self.assertEqual(self._ids({"carrier": "none"}), [new.id])
+        self.assertEqual(self._ids({"status": "shipped,paid", "carrier": "dhl"}), [shipped.id])
+        day = (timezone.localdate() - timedelta(days=5)).isoformat()
+        self.assertEqual(self._ids({"date_from": day}), [new.id])
+        self.assertEqual(self._ids({"date_to": day}), [old.id])
+
+        for params in ({"status": "lost"}, {"carrier": "dpd"}, {"date_from": "gestern"}):
+            self.assertEqual(self.client.get("/api/shipping/orders/", params).status_code, 400)
+
+    def test_keyset_pagination_oldest_first(self):
+        orders = [self._order(days_ago=10 - i) for i in range(5)]
+        response = self.client.get("/api/shipping/orders/", {"page_size": 2})
+        self.assertEqual([o["id"] for o in response.data["results"]], [orders[0].id, orders[1].id])
+        seen = [o["id"] for o in response.data["results"]]
+        while response.data["next"]:
+            response = self.client.get(response.data["next"])
+            seen += [o["id"] for o in response.data["results"]]
+        self.assertEqual(seen, [o.id for o in orders])
+
+
+class ShippingReturnQueueTests(TestCase):
+    """Versand-Retouren: select_related, Tabs/Filter und Keyset-Pagination."""
+
+    url = "/api/shipping/returns/"
+
+    def setUp(self):
+        self.client = APIClient()
+        User = get_user_model()
+        self.client.force_authenticate(User.objects.create_user(username="lager", password="x", is_staff=True))
+        self.customer = User.objects.create_user(username="kunde", password="x")
+        self.product = Product.objects.create(title="Hemd", price=Decimal("20.00"))
+        self.order = Order.objects.create(user=self.customer, status="shipped")
+
+    def _return(self, status="pending", reason="defekt", days_ago=0):
+        item = OrderItem.objects.create(
+            order=self.order, product=self.product, product_title="Hemd", price=Decimal("20.00"), quantity=1
+        )
+        return_request = ReturnRequest.objects.create(
+            order=self.order, item=item, user=self.customer, reason=reason, status=status
+        )
+        ReturnRequest.objects.filter(pk=return_request.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+        return return_request
+
+    def _ids(self, params=None):
+        response = self.client.get(self.url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return [r["id"] for r in response.data]
+
+    def test_query_count_is_independent_of_return_count(self):
+        for _ in range(2):
+            self._return()
+        with CaptureQueriesContext(connection) as few:
+            self._ids()
+        for _ in range(20):
+            self._return()
+        with self.assertNumQueries(len(few.captured_queries)):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data), 22)
+        self.assertEqual(response.data[0]["username"], "kunde")
+        self.assertEqual(response.data[0]["order_id"], self.order.id)
+
+    def test_tabs_and_filters(self):
+        old = self._return(status="approved", reason="falsche_groesse", days_ago=10)
+        new = self._return(days_ago=1)
+        rejected = self._return(status="rejected")
+        refunded = self._return(status="refunded", days_ago=3)
+
+        self.assertEqual(self._ids(), [rejected.id, new.id, refunded.id, old.id])
+        self.assertEqual(self._ids({"tab": "open"}), [new.id, old.id])
+        self.assertEqual(self._ids({"tab": "closed"}), [rejected.id, refunded.id])
+        self.assertEqual(self._ids({"tab": "refunded"}), [refunded.id])
+        self.assertEqual(self._ids({"status": "pending,approved"}), [new.id, old.id])
+        self.assertEqual(self._ids({"reason": "falsche_groesse"}), [old.id])
+        day = (timezone.localdate() - timedelta(days=5)).isoformat()
+        self.assertEqual(self._ids({"tab": "open", "date_from": day}), [new.id])
+        self.assertEqual(self._ids({"date_to": day}), [old.id])
+
+        for params in ({"tab": "archiv"}, {"status": "lost"}, {"reason": "egal"}, {"date_to": "morgen"}):
+            self.assertEqual(self.client.get(self.url, params).status_code, 400)
+
+    def test_keyset_pagination_newest_first(self):
+        returns = [self._return(days_ago=i) for i in range(5)]
+        response = self.client.get(self.url, {"page_size": 2})
+        seen = [r["id"] for r in response.data["results"]]
+        self.assertEqual(seen, [returns[0].id, returns[1].id])
+        while response.data["next"]:
+            response = self.client.get(response.data["next"])
+            seen += [r["id"] for r in response.data["results"]]
+        self.assertEqual(seen, [r.id for r in returns])
+
+
+class OrderListQueryCountTests(TestCase):
+    """OrderViewSet.list: annotierte Retourenanzahl statt COUNT pro Bestellung."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(username="kunde", password="x")
+        self.client.force_authenticate(self.user)
+        self.product = Product.objects.create(title="Hemd", price=Decimal("20.00"))
+
+    def _create_orders(self, count):
+        orders = Order.objects.bulk_create(
+            [Order(user=self.user, status="shipped") for _ in range(count)]
+        )
+        items = OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=self.product, product_title="Hemd", price=Decimal("20.00"), quantity=1)
+            for order in orders
+        ])
+        # jede dritte Bestellung hat zwei Retouren
+        ReturnRequest.objects.bulk_create([
+            ReturnRequest(order_id=item.order_id, item=item, user=self.user, reason="defekt")
+            for item in items[::3]
+            for _ in range(2)
+        ])
+
+    def _list_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/orders/")
+        self.assertEqual(response.status_code, 200)
+        return response, len(ctx.captured_queries)
+
+    def test_query_count_is_constant(self):
+        counts = {}
+        total = 0
+        for size in (1, 100, 1000):
+            self._create_orders(size - total)
+            total = size
+            response, counts[size] = self._list_queries()
+            self.assertEqual(len(response.data), size)
+        self.assertEqual(counts[1], counts[100])
+        self.assertEqual(counts[100], counts[1000])
+
+        by_id = {o["id"]: o for o in response.data}
+        with_returns = ReturnRequest.objects.values_list("order_id", flat=True).distinct()
+        for order_id in with_returns:
+            self.assertEqual(by_id[order_id]["return_request_count"], 2)
+            self.assertTrue(by_id[order_id]["return_requested"])
+        self.assertEqual(sum(o["return_request_count"] for o in response.data), ReturnRequest.objects.count())
+
+
+class ReturnEmailOutboxTests(TestCase):
+    """Retouren-E-Mails über den transaktionalen Ausgang."""
+
+    def setUp(self):
+        self.client = APIClient()
+        User = get_user_model()
+        self.staff = User.objects.create_user(username="lager", password="x", is_staff=True)
+        self.customer = User.objects.create_user(username="kunde", password="x", email="kunde@example.com")
+        self.client.force_authenticate(self.staff)
+        product = Product.objects.create(title="Hemd", price=Decimal("20.00"))
+        order = Order.objects.create(user=self.customer, status="shipped", total=Decimal("20.00"))
+        item = OrderItem.objects.create(
+            order=order, product=product, product_title="Hemd", price=Decimal("20.00"), quantity=1
+        )
+        self.return_request = ReturnRequest.objects.create(
+            order=order, item=item, user=self.customer, reason="defekt"
+        )
+
+    def _patch(self, **data):
+        return self.client.patch(f"/api/shipping/returns/{self.return_request.id}/", data, format="json")
+
+    def _run_outbox(self, *args):
+        out = StringIO()
+        call_command("run_outbox", *args, stdout=out)
+        return out.getvalue()
+
+    def test_status_change_queues_email_for_worker(self):
+        self.assertEqual(self._patch(status="approved").status_code, 200)
+        self.assertEqual(len(mail.outbox), 0)
+        queued = OutboxEmail.objects.get()
+        self.assertEqual((queued.kind, queued.recipient, queued.status), ("return_approved", "kunde@example.com", "pending"))
+
+        # gleicher Status erneut: keine zweite E-Mail
+        self._patch(status="approved")
+        self.assertEqual(OutboxEmail.objects.count(), 1)
+
+        self.assertIn("1 E-Mail(s) gesendet", self._run_outbox())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("genehmigt", mail.outbox[0].subject)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, "sent")
+        self.assertIsNotNone(queued.sent_at)
+        self.assertIn("0 E-Mail(s) gesendet", self._run_outbox())
+
+    def test_failed_delivery_is_retried_with_backoff(self):
+        from .services.outbox_service import enqueue_email, process_batch
+
+        email = enqueue_email("test", "kunde@example.com", "Betreff", "Text")
+        with mock.patch.object(EmailMultiAlternatives, "send", side_effect=OSError("SMTP down")):
+            self.assertEqual(process_batch(workers=1), {"sent": 0, "failed": 1})
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ("pending", 1))
+        self.assertIn("SMTP down", email.last_error)
+        self.assertGreater(email.next_attempt_at, timezone.now() + timedelta(seconds=20))
+
+        # noch nicht fällig
+        self.assertEqual(process_batch(workers=1), {"sent": 0, "failed": 0})
+
+        OutboxEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(process_batch(workers=1), {"sent": 1, "failed": 0})
+        self.assertEqual(len(mail.outbox), 1)
+
+    @override_settings(EMAIL_OUTBOX_MAX_ATTEMPTS=2, EMAIL_OUTBOX_BACKOFF_SECONDS=0)
+    def test_gives_up_after_max_attempts(self):
+        from .services.outbox_service import enqueue_email
+
+        email = enqueue_email("test", "kunde@example.com", "Betreff", "Text")
+        with mock.patch.object(EmailMultiAlternatives, "send", side_effect=OSError("SMTP down")):
+            self._run_outbox()
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ("failed", 2))
+
+    def test_loop_releases_claims_of_crashed_workers(self):
+        from .services.outbox_service import CLAIM_TIMEOUT, enqueue_email
+
+        def sleep(seconds):
+            if OutboxEmail.objects.exists():
+                raise KeyboardInterrupt
+            # ein anderer Worker stürzt ab, während dieser läuft
+            email = enqueue_email("test", "kunde@example.com", "Betreff", "Text")
+            OutboxEmail.objects.filter(pk=email.pk).update(
+                status="sending", claimed_at=timezone.now() - CLAIM_TIMEOUT - timedelta(seconds=1)
+            )
+
+        with mock.patch("time.sleep", side_effect=sleep):
+            output = self._run_outbox("--loop", "--interval", "0")
+        self.assertIn("1 verwaiste E-Mail(s) wieder eingereiht.", output)
+        self.assertEqual(OutboxEmail.objects.get().status, "sent")
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_workers_reuse_one_connection_per_chunk(self):
+        from .services import outbox_service
+
+        for i in range(10):
+            outbox_service.enqueue_email("test", f"k{i}@example.com", "Betreff", "Text")
+        with mock.patch.object(outbox_service, "get_connection", wraps=outbox_service.get_connection) as conn:
+            self._run_outbox("--workers", "2")
+        self.assertEqual(conn.call_count, 2)
+        self.assertEqual(len(mail.outbox), 10)
+        self.assertFalse(OutboxEmail.objects.exclude(status="sent").exists())
+
+    def test_templates_render_text_and_html(self):
+        from .services.email_service import render_return_email
+
+        self.return_request.item.product_title = "Hemd <XL>"
+        self.return_request.refund_amount = Decimal("19.9")
+        self.return_request.refund_iban = "DE89370400440532013000"
+        message = render_return_email(self.return_request, "refunded")
+        self.assertEqual(message["kind"], "return_refunded")
+        self.assertEqual(message["subject"], f"Erstattung erfolgt - Bestellung #{self.return_request.order_id}")
+        self.assertIn("Erstattungsbetrag: 19.90 €", message["body"])
+        self.assertIn("IBAN:              DE89 3704 0044 0532 0130 00", message["body"])
+        self.assertIn("Produkt:           Hemd <XL>", message["body"])
+        self.assertIn("Hemd &lt;XL&gt;", message["html_body"])
+
+        self.return_request.rejection_reason = "sonstiges"
+        self.return_request.rejection_comment = "Siegel geöffnet"
+        body = render_return_email(self.return_request, "rejected")["body"]
+        self.assertIn("ABLEHNUNGSGRUND:", body)
+        self.assertIn("Zusätzliche Erläuterung:\nSiegel geöffnet", body)
+
+    def test_bulk_rendering_uses_compiled_templates(self):
+        from django.template.loaders.app_directories import Loader
+        from .services.email_service import queue_return_emails, render_return_email
+
+        render_return_email(self.return_request, "refunded")
+        with mock.patch.object(Loader, "get_contents", side_effect=AssertionError("re-read")):
+            with CaptureQueriesContext(connection) as ctx:
+                emails = queue_return_emails([self.return_request] * 50, "refunded")
+        self.assertEqual(len(emails), 50)
+        self.assertEqual(OutboxEmail.objects.filter(kind="return_refunded").count(), 50)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    @override_settings(EMAIL_OUTBOX_EAGER=True)
+    def test_eager_mode_delivers_after_commit(self):
+        ReturnRequest.objects.filter(pk=self.return_request.pk).update(status="approved")
+        with self.captureOnCommitCallbacks(execute=True):
+            self._patch(status="received")
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(OutboxEmail.objects.get().status, "sent")
+
+
+class ReturnStateMachineTests(TestCase):
+    """Retouren-Statusübergänge: erlaubte Übergänge, bedingtes UPDATE, Verlauf."""
+
+    def setUp(self):
+        self.client = APIClient()
+        User = get_user_model()
+        self.staff = User.objects.create_user(username="lager", password="x", is_staff=True)
+        customer = User.objects.create_user(username="kunde", password="x", email="kunde@example.com")
+        self.client.force_authenticate(self.staff)
+        product = Product.objects.create(title="Hemd", price=Decimal("20.00"))
+        order = Order.objects.create(user=customer, status="shipped", total=Decimal("20.00"))
+        item = OrderItem.objects.create(
+            order=order, product=product, product_title="Hemd", price=Decimal("20.00"), quantity=1
+        )
+        self.return_request = ReturnRequest.objects.create(order=order, item=item, user=customer, reason="defekt")
+
+    def _patch(self, **data):
+        return self.client.patch(f"/api/shipping/returns/{self.return_request.id}/", data, format="json")
+
+    def _load(self):
+        return ReturnRequest.objects.select_related("user", "order", "item").get(pk=self.return_request.pk)
+
+    def test_only_allowed_transitions(self):
+        response = self._patch(status="refunded", refund_name="Kunde", refund_amount="20", refund_iban="DE89370400440532013000")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("nicht erlaubt", response.data["error"])
+
+        self.assertEqual(self._patch(status="approved").status_code, 200)
+        self.assertEqual(self._patch(status="rejected", rejection_reason="sonstiges", rejection_comment="x").status_code, 400)
+        self.assertEqual(self._patch(status="received").status_code, 200)
+
+        changes = list(self.return_request.status_changes.values_list("old_status", "new_status", "changed_by"))
+        self.assertEqual(changes, [("pending", "approved", self.staff.id), ("approved", "received", self.staff.id)])
+        self.assertEqual(self._load().status, "received")
+
+    def test_received_return_can_be_rejected_after_inspection(self):
+        ReturnRequest.objects.filter(pk=self.return_request.pk).update(status="received")
+        response = self._patch(status="rejected", rejection_reason="sonstiges", rejection_comment="Gebrauchsspuren")
+        self.assertEqual(response.status_code, 200)
+        return_request = self._load()
+        self.assertEqual((return_request.status, return_request.rejection_comment), ("rejected", "Gebrauchsspuren"))
+        self.assertEqual(OutboxEmail.objects.get().kind, "return_rejected")
+        self.assertEqual(
+            list(self.return_request.status_changes.values_list("old_status", "new_status")), [("received", "rejected")]
+        )
+
+    def test_concurrent_transition_has_one_winner(self):
+        from .services.return_service import ReturnTransitionConflict, transition
+
+        first, second = self._load(), self._load()
+        transition(first, "approved", user=self.staff)
+        with self.assertRaises(ReturnTransitionConflict) as ctx:
+            transition(second, "rejected", rejection_reason="zeitraum_abgelaufen")
+        self.assertEqual(ctx.exception.current_status, "approved")
+        self.assertEqual(self._load().status, "approved")
+        self.assertIsNone(self._load().rejection_reason)
+        self.assertEqual(OutboxEmail.objects.get().kind, "return_approved")
+        self.assertEqual(self.return_request.status_changes.count(), 1)
+
+    def test_stale_patch_returns_conflict(self):
+        from .services import return_service
+
+        conflict = return_service.ReturnTransitionConflict("approved")
+        with mock.patch.object(return_service, "transition", side_effect=conflict):
+            response = self._patch(status="approved")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data["status"], "approved")
+        self.assertFalse(OutboxEmail.objects.exists())
+
+    def test_transition_writes_only_changed_columns(self):
+        ReturnRequest.objects.filter(pk=self.return_request.pk).update(status="received")
+        self.assertEqual(self._patch(status="refunded", refund_name="Kunde", refund_amount="19.90", refund_iban="DE89370400440532013000").status_code, 200)
+        # gleicher Status: nur die Erstattungsdaten werden korrigiert, keine zweite E-Mail
+        with CaptureQueriesContext(connection) as ctx:
+            response = self._patch(status="refunded", refund_name="Kunde", refund_amount="20.00", refund_iban="DE89370400440532013000")
+        self.assertEqual(response.status_code, 200)
+        update = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(update), 1)
+        self.assertNotIn('"status"', update[0])
+        self.assertEqual(self._load().refund_amount, Decimal("20.00"))
+        self.assertEqual(OutboxEmail.objects.count(), 1)
+        self.assertEqual(self.return_request.status_changes.count(), 1)
+
+
+class ReturnBulkStatusTests(TestCase):
+    """Statuswechsel für viele Retouren auf einmal."""
+
+    url = "/api/shipping/returns/bulk-status/"
+
+    def setUp(self):
+        self.client = APIClient()
+        User = get_user_model()
+        self.client.force_authenticate(User.objects.create_user(username="lager", password="x", is_staff=True))
+        self.customer = User.objects.create_user(username="kunde", password="x", email="kunde@example.com")
+        self.product = Product.objects.create(title="Hemd", price=Decimal("20.00"))
+
+    def _returns(self, count, status="pending"):
+        order = Order.objects.create(user=self.customer, status="shipped", total=Decimal("20.00"))
+        returns = []
+        for _ in range(count):
+            item = OrderItem.objects.create(
+                order=order, product=self.product, product_title="Hemd", price=Decimal("20.00"), quantity=1
+            )
+            returns.append(
+                ReturnRequest.objects.create(order=order, item=item, user=self.customer, reason="defekt", status=status)
+            )
+        return [r.id for r in returns]
+
+    def _post(self, **data):
+        return self.client.post(self.url, data, format="json")
+
+    def test_query_count_does_not_grow_with_batch(self):
+        small = self._returns(2, "approved")
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self._post(ids=small, status="received").data["updated"], 2)
+        large = self._returns(20, "approved")
+        with self.assertNumQueries(len(ctx.captured_queries)):
+            response = self._post(ids=large, status="received")
+        self.assertEqual(response.data["updated"], 20)
+        self.assertEqual(ReturnRequest.objects.filter(status="received").count(), 22)
+        self.assertEqual(OutboxEmail.objects.filter(kind="return_received").count(), 22)
+        self.assertEqual(ReturnStatusChange.objects.filter(old_status="approved", new_status="received").count(), 22)
+
+    def test_invalid_transitions_are_reported_per_item(self):
+        pending, approved = self._returns(1) + self._returns(1, "approved")
+        response = self._post(items=[
+            {"id": pending, "status": "received"},
+            {"id": approved, "status": "received"},
+            {"id": 99999, "status": "approved"},
+            {"id": approved, "status": "rejected"},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["updated"], 1)
+        results = {r["id"]: r for r in response.data["results"]}
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[pending]["result"], "error")
+        self.assertIn("nicht erlaubt", results[pending]["error"])
+        self.assertEqual(results[approved]["result"], "updated")
+        self.assertEqual(results[99999]["result"], "error")
+        self.assertEqual(ReturnRequest.objects.get(pk=pending).status, "pending")
+        self.assertEqual(OutboxEmail.objects.count(), 1)
+
+        # erneut: keine Änderung, keine weitere E-Mail
+        self.assertEqual(self._post(ids=[approved], status="received").data["results"][0]["result"], "unchanged")
+        self.assertEqual(OutboxEmail.objects.count(), 1)
+
+    def test_rejection_requires_reason_and_is_stored(self):
+        ids = self._returns(2)
+        response = self._post(ids=ids, status="rejected")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ReturnRequest.objects.exclude(status="pending").exists())
+
+        response = self._post(ids=ids, status="rejected", rejection_reason="sonstiges", rejection_comment="Zu spät")
+        self.assertEqual(response.data["updated"], 2)
+        for return_request in ReturnRequest.objects.all():
+            self.assertEqual(return_request.rejection_comment, "Zu spät")
+            self.assertIsNotNone(return_request.rejection_date)
+        self.assertEqual(OutboxEmail.objects.filter(kind="return_rejected").count(), 2)
+
+    def test_refund_is_not_available_in_bulk(self):
+        ids = self._returns(1, "received")
+        result = self._post(ids=ids, status="refunded").data["results"][0]
+        self.assertEqual(result["result"], "error")
+        self.assertEqual(ReturnRequest.objects.get().status, "received")
+
+
+class ImportProductsCommandTests(TestCase):
+    """Bulk-Import von Produkten aus CSV/JSONL."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        DeliveryTime.objects.create(name="Standard", min_days=2, max_days=4)
+
+    def _write(self, name, content):
+        path = Path(self.tmp.name) / name
+        path.write_text(content, encoding="utf-8")
+        return str(path)
+
+    def _import(self, *args):
+        out = StringIO()
+        call_command("import_products", *args, stdout=out, stderr=out)
+        return out.getvalue()
+
+    def test_imports_csv_rows_grouped_into_products(self):
+        path = self._write("products.csv", (
+            "title,price,category,delivery_time,images,stock,attributes\n"
+            "Hemd,19.90,clothing,Standard,https://img/a.jpg|https://img/b.jpg,3,Size:M|Color:Red\n"
+            "Hemd,19.90,clothing,Standard,,2,Size:L|Color:Red\n"
+            "Schal,9.50,clothing,,,0,\n"
+            ",5.00,clothing,,,1,\n"
+        ))
+        output = self._import(path, "--batch-size", "1")
+
+        shirt = Product.objects.get(title="Hemd")
+        self.assertEqual(shirt.stock_total, 5)
+        self.assertEqual(shirt.slug, "hemd")
+        self.assertEqual(shirt.category.name, "clothing")
+        self.assertEqual(shirt.delivery_time.name, "Standard")
+        self.assertEqual(shirt.images.count(), 2)
+        self.assertEqual(
+            sorted(sorted(v.value for v in var.attributes.all()) for var in shirt.variations.all()),
+            [["L", "Red"], ["M", "Red"]],
+        )
+        self.assertEqual(AttributeValue.objects.filter(value="Red").count(), 1)
+        self.assertEqual(Category.objects.count(), 1)
+        self.assertTrue(Product.objects.filter(title="Schal", stock_total=0).exists())
+        self.assertIn("Zeile 5: Titel fehlt.", output)
+
+        from .search import search_product_ids
+        self.assertEqual(search_product_ids("hemd"), [shirt.id])
+
+    def test_jsonl_update_mode_reuses_products_and_variations(self):
+        line = (
+            '{"title": "Hemd", "price": "%s", "images": ["https://img/a.jpg"], '
+            '"variations": [{"stock": %d, "attributes": {"Size": "M"}}]}\n'
+        )
+        first = self._write("a.jsonl", line % ("19.90", 3) + "{kaputt\n")
+        second = self._write("b.jsonl", line % ("17.50", 7))
+
+        output = self._import(first)
+        self.assertIn("Ungültiges JSON", output)
+        variation = ProductVariation.objects.get()
+        self._import(second, "--update")
+
+        product = Product.objects.get()
+        self.assertEqual(product.price, Decimal("17.50"))
+        self.assertEqual(product.stock_total, 7)
+        self.assertEqual(ProductVariation.objects.get().pk, variation.pk)
+        self.assertEqual(product.images.count(), 1)
+
+    def test_non_object_jsonl_lines_are_row_errors(self):
+        path = self._write("mixed.jsonl", '[1]\n"x"\nnull\n{"title": "Hemd", "price": "19.90"}\n')
+        output = self._import(path)
+        for line_no in (1, 2, 3):
+            self.assertIn(f"Zeile {line_no}: Jede Zeile muss ein JSON-Objekt sein.", output)
+        self.assertTrue(Product.objects.filter(title="Hemd").exists())
+
+    def test_writes_in_batches(self):
+        lines = "".join(
+            f'{{"title": "Produkt {i}", "price": "1.00", "variations": [{{"stock": 1, "attributes": {{"Size": "M"}}}}]}}\n'
+            for i in range(20)
+        )
+        path = self._write("many.jsonl", lines)
+        with CaptureQueriesContext(connection) as ctx:
+            self._import(path, "--batch-size", "10")
+        self.assertEqual(Product.objects.filter(stock_total=1).count(), 20)
+        # Abfragen hängen von der Zahl der Batches ab, nicht von der Zahl der Zeilen
+        self.assertLess(len(ctx.captured_queries), 50)
+
+    def test_rejects_missing_file(self):
+        with self.assertRaises(CommandError):
+            self._import(str(Path(self.tmp.name) / "fehlt.csv"))
+
+
+class CatalogExportTests(TestCase):
+    """Streaming-Export von Katalog und Bestellpositionen."""
+
+    def setUp(self):
+        self.client = APIClient()
+        User = get_user_model()
+        self.admin = User.objects.create_user(username="admin", password="x", is_staff=True)
+        self.customer = User.objects.create_user(username="kunde", password="x")
+        category = Category.objects.create(name="clothing")
+        self.shirt = Product.objects.create(title="Hemd, blau", price=Decimal("19.90"), category=category)
+        Product.objects.create(title="Schal", price=Decimal("9.50"))
+        order = Order.objects.create(user=self.customer, total=Decimal("39.80"), city="Köln")
+        OrderItem.objects.create(
+            order=order, product=self.shirt, product_title="Hemd, blau", price=Decimal("19.90"), quantity=2
+        )
+
+    def test_csv_export_via_command(self):
+        out = StringIO()
+        call_command("export_catalog", stdout=out)
+        rows = list(csv.reader(StringIO(out.getvalue())))
+        self.assertEqual(rows[0][:3], ["id", "title", "slug"])
+        self.assertEqual(rows[1][1], "Hemd, blau")
+        self.assertEqual(rows[1][5], "clothing")
+        self.assertEqual(len(rows), 3)
+
+    def test_gzip_jsonl_order_export_to_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "orders.jsonl.gz"
+            call_command("export_orders", "--format", "jsonl", "--gzip", "-o", str(path), stdout=StringIO())
+            lines = gzip.decompress(path.read_bytes()).decode("utf-8").splitlines()
+        self.assertEqual(len(lines), 1)
+        row = json.loads(lines[0])
+        self.assertEqual(row["customer"], "kunde")
+        self.assertEqual(row["city"], "Köln")
+        self.assertEqual(row["quantity"], 2)
+        self.assertEqual(row["price"], "19.90")
+
+    def test_streaming_endpoint(self):
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.get("/api/export/orders.csv").status_code, 403)
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.get("/api/export/catalog.ndjson")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn("attachment", response["Content-Disposition"])
+        titles = [json.loads(line)["title"] for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual(titles, ["Hemd, blau", "Schal"])
+
+        response = self.client.get("/api/export/orders.csv.gz")
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        body = gzip.decompress(b"".join(response.streaming_content)).decode("utf-8")
+        self.assertIn("Hemd, blau", body)
+
+        self.assertEqual(self.client.get("/api/export/users.csv").status_code, 404)
+
+
+class CatalogResponseCacheTests(TestCase):
+    """Katalog-Antworten kommen aus dem Cache, bis sich ein abhängiges Model ändert."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(name="shirts")
+        self.product = Product.objects.create(title="Hemd", price=Decimal("20.00"), category=self.category)
+
+    def test_repeated_reads_are_served_from_cache(self):
+        first = self.client.get("/api/products/")
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.client.get("/api/products/")
+
+        self.assertEqual(first["X-Cache"], "MISS")
+        self.assertEqual(second["X-Cache"], "HIT")
+        self.assertEqual(second.data, first.data)
+        # nur noch das ETag-Aggregat (ConditionalGetMixin) trifft die Datenbank
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_query_parameters_are_part_of_the_key(self):
+        self.client.get("/api/products/?fields=id")
+        response = self.client.get("/api/products/?fields=id,title")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(set(response.data[0]), {"id", "title"})
+
+    def test_writes_invalidate_dependent_endpoints(self):
+        self.client.get("/api/products/")
+        self.client.get("/api/categories/")
+
+        self.category.display_name = "Hemden"
+        self.category.save()
+
+        self.assertEqual(self.client.get("/api/products/")["X-Cache"], "MISS")
+        categories = self.client.get("/api/categories/")
+        self.assertEqual(categories["X-Cache"], "MISS")
+        self.assertEqual(categories.data[0]["display_name"], "Hemden")
+
+        # Produktänderungen betreffen die Kategorienliste nicht
+        Product.objects.create(title="Hose", price=Decimal("40.00"))
+        self.assertEqual(self.client.get("/api/categories/")["X-Cache"], "HIT")
+
+    def test_bulk_updates_invalidate_too(self):
+        variation = ProductVariation.objects.create(product=self.product, stock=2)
+        self.client.get(f"/api/products/{self.product.id}/")
+
+        ProductVariation.objects.filter(pk=variation.pk).update(stock=7)
+        refresh_stock_totals([self.product.id])
+
+        response = self.client.get(f"/api/products/{self.product.id}/")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["stock_total"], 7)
+
+
+class ConditionalGetTests(TestCase):
+    """ETag/Last-Modified und 304-Antworten der Katalog-Endpunkte."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(name="shirts")
+        self.product = Product.objects.create(title="Hemd", price=Decimal("20.00"), category=self.category)
+        self.variation = ProductVariation.objects.create(product=self.product, stock=2)
+
+    def test_matching_etag_returns_304_without_serializing(self):
+        first = self.client.get("/api/products/")
+        self.assertEqual(first.status_code, 200)
+        self.assertIn("Last-Modified", first)
+
+        with mock.patch.object(ProductListSerializer, "to_representation") as to_representation:
+            response = self.client.get("/api/products/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], first["ETag"])
+        to_representation.assert_not_called()
+
+    def test_etag_changes_with_data_and_query(self):
+        url = f"/api/products/{self.product.id}/"
+        etag = self.client.get(url)["ETag"]
+        self.assertNotEqual(self.client.get(url + "?fields=id")["ETag"], etag)
+
+        # Änderung an einer Variation betrifft die Detaildarstellung
+        self.variation.stock = 5
+        self.variation.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["stock_total"], 5)
+
+    def _backdate(self):
+        # Last-Modified hat Sekundenauflösung
+        past = timezone.now() - timedelta(seconds=5)
+        for model in (Product, ProductVariation, Category):
+            model.objects.update(updated_at=past)
+
+    def _assert_changed(self, url, etag, last_modified):
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 200)
+
+    def test_attribute_rename_invalidates_detail(self):
+        size = AttributeType.objects.create(name="Size")
+        value = AttributeValue.objects.create(attribute_type=size, value="M")
+        self.variation.attributes.add(value)
+        url = f"/api/products/{self.product.id}/"
+        first = self.client.get(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"]).status_code, 304)
+
+        self._backdate()
+        last_modified = self.client.get(url)["Last-Modified"]
+        value.value = "Medium"
+        value.save()
+        self._assert_changed(url, first["ETag"], last_modified)
+        self.assertEqual(self.client.get(url).data["variations"][0]["attributes"][0]["value"], "Medium")
+
+        etag = self.client.get(url)["ETag"]
+        size.name = "Größe"
+        size.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_image_change_invalidates_detail(self):
+        image = ProductImage.objects.create(product=self.product, external_image="https://img/a.jpg")
+        self._backdate()
+        url = f"/api/products/{self.product.id}/"
+        first = self.client.get(url)
+        image.external_image = "https://img/b.jpg"
+        image.save()
+        self._assert_changed(url, first["ETag"], first["Last-Modified"])
+        self.assertEqual(self.client.get(url).data["images"][0]["image_url"], "https://img/b.jpg")
+
+    def test_if_modified_since(self):
+        last_modified = self.client.get("/api/categories/")["Last-Modified"]
+        response = self.client.get("/api/categories/", HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_small_tables_use_row_fingerprint(self):
+        DeliveryTime.objects.create(name="Standard", min_days=1, max_days=3)
+        etag = self.client.get("/api/delivery-times/")["ETag"]
+        self.assertEqual(self.client.get("/api/delivery-times/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        DeliveryTime.objects.update(max_days=4)
+        self.assertEqual(self.client.get("/api/delivery-times/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
@@ -1,4 +1,4 @@
-from django.urls import path, include
+from django.urls import path, include, re_path
 from rest_framework.routers import DefaultRouter
 
 from .views import (
@@ -14,7 +14,9 @@ from .views import (
     ShippingOrdersView,   
     ShippingReturnsView,
     ShippingReturnDetailView,
-    UserReturnsView
+    ShippingReturnBulkStatusView,
+    UserReturnsView,
+    ExportView,
 )
 
 router = DefaultRouter()
@@ -33,10 +35,17 @@ urlpatterns = [
     # ✅ SHIPPING API
     path("shipping/orders/", ShippingOrdersView.as_view()),
     path("shipping/returns/", ShippingReturnsView.as_view()),
+    path("shipping/returns/bulk-status/", ShippingReturnBulkStatusView.as_view()),
     path("shipping/returns/<int:pk>/", ShippingReturnDetailView.as_view()),
     
      # USER RETURNS 
     path("orders/my-returns/", UserReturnsView.as_view()),
     
+    # EXPORT (Feeds / Buchhaltung)
+    re_path(
+        r"^export/(?P<dataset>catalog|orders)\.(?P<fmt>csv|jsonl|ndjson)(?P<gz>\.gz)?$",
+        ExportView.as_view(),
+    ),
+
     path("", include(router.urls)), 
 ]
@@ -1,8 +1,10 @@
-from django.db.models import Prefetch
+from django.db import IntegrityError, transaction
+from django.http import StreamingHttpResponse
 from rest_framework import viewsets, permissions, status, generics, views
 from django.utils import timezone
 from rest_framework.decorators import action, api_view
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.exceptions import PermissionDenied
 from decimal import Decimal
 
@@ -15,11 +17,21 @@ from .models import (
     OrderReturn,   # original class name in models
     ReturnRequest, # alias you added
     Category,
+    ProductImage,
     ProductVariation,
     AttributeValue,
+    make_variation_key,
+    parse_variation_key,
 )
+from .cache import CATALOG_MODELS, CachedResponseMixin
+from .conditional import ConditionalGetMixin, aggregate_validators, rows_fingerprint
+from .filters import filter_orders, filter_products, filter_returns, product_facets
+from .pagination import ProductCursorPagination, ShippingOrderCursorPagination, ShippingReturnCursorPagination
+from .search import search_product_ids
+from .suggest import index as suggest_index
 from .serializers import (
     ProductSerializer,
+    ProductListSerializer,
     CategorySerializer,
     ReviewSerializer,
     OrderSerializer,
@@ -30,10 +42,145 @@ from .serializers import (
 
 
 # --- Product ---
-class ProductViewSet(viewsets.ModelViewSet):
-    queryset = Product.objects.all()
+class ProductViewSet(ConditionalGetMixin, CachedResponseMixin, viewsets.ModelViewSet):
+    queryset = Product.objects.for_catalog()
     serializer_class = ProductSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = ProductCursorPagination
+    cache_models = CATALOG_MODELS
+
+    # Aktionen, die Produktlisten liefern (schlanke Darstellung + Filter)
+    listing_actions = ("list", "facets", "search")
+
+    # Query-Parameter von DRF/Pagination/Darstellung, die keine Attributnamen sind
+    reserved_params = {
+        "fields",
+        "view",
+        api_settings.URL_FORMAT_OVERRIDE,
+        ProductCursorPagination.cursor_query_param,
+        ProductCursorPagination.page_size_query_param,
+    }
+
+    def _wants_full_list(self):
+        # ?view=full liefert auch in der Liste die vollständige Darstellung
+        return self.request.query_params.get("view") == "full"
+
+    def get_queryset(self):
+        if self.action in self.listing_actions and not self._wants_full_list():
+            qs = Product.objects.all()
+        else:
+            qs = super().get_queryset()
+        if self.action in self.listing_actions:
+            qs = filter_products(qs, self.request.query_params)
+        return qs
+
+    def get_serializer_class(self):
+        if self.action in self.listing_actions and not self._wants_full_list():
+            return ProductListSerializer
+        return ProductSerializer
+
+    def _reload(self, serializer):
+        # Antwort mit vorgeladenen Variationen/Attributen statt N+1 über das gespeicherte Objekt
+        serializer.instance = self.get_queryset().get(pk=serializer.instance.pk)
+
+    def perform_create(self, serializer):
+        serializer.save()
+        self._reload(serializer)
+
+    def perform_update(self, serializer):
+        serializer.save()
+        self._reload(serializer)
+
+    def get_validators(self, queryset):
+        # Änderungen an Bildern und Attributwerten/-typen setzen Product.updated_at
+        # (models.touch_products), da diese Tabellen keinen eigenen Zeitstempel haben
+        count, last_modified = aggregate_validators(queryset)
+        parts = [count, last_modified]
+        if self.get_serializer_class() is ProductSerializer:
+            # Vollständige Darstellung enthält Variationen, Bilder, Kategorie und Reviews
+            product_ids = queryset.order_by().values("pk")
+            for related, timestamp in (
+                (ProductVariation.objects.filter(product__in=product_ids), "updated_at"),
+                (Review.objects.filter(product__in=product_ids), "updated_at"),
+                (Category.objects.filter(products__in=product_ids).distinct(), "updated_at"),
+            ):
+                related_count, related_last = aggregate_validators(related, timestamp)
+                parts += [related_count, related_last]
+                if related_last and (last_modified is None or related_last > last_modified):
+                    last_modified = related_last
+            parts.append(ProductImage.objects.filter(product__in=product_ids).count())
+        return parts, last_modified
+
+    @action(detail=False, methods=["get"])
+    def facets(self, request):
+        """Facetten (Kategorien, Attributwerte, Preisspanne) für die aktuellen Filter."""
+        return self.cached_response(request, lambda: Response(product_facets(self.get_queryset())))
+
+    @action(detail=False, methods=["get"])
+    def search(self, request):
+        """
+        Volltextsuche über Titel und Beschreibung, beste Treffer zuerst.
+        ?q=<Begriffe>&limit=<1-100>; Begriffe werden auch als Präfix gefunden ("hem" -> "Hemd").
+        Die Filter der Produktliste (category, min_price, ...) sind kombinierbar.
+        """
+        try:
+            limit = max(1, min(int(request.query_params.get("limit", 20)), 100))
+        except ValueError:
+            return Response({"error": "limit muss eine Zahl sein."}, status=status.HTTP_400_BAD_REQUEST)
+
+        def build():
+            ids = search_product_ids(request.query_params.get("q", ""), limit=limit)
+            products = self.get_queryset().in_bulk(ids)
+            ranked = [products[pk] for pk in ids if pk in products]
+            return Response(self.get_serializer(ranked, many=True).data)
+
+        return self.cached_response(request, build)
+
+    @action(detail=False, methods=["get"])
+    def suggest(self, request):
+        """
+        Typeahead-Vorschläge (Produkttitel, Kategorien, Attributwerte) aus dem
+        In-Memory-Präfixindex, ohne Datenbankzugriff. ?q=<Präfix>&limit=<1-20>
+        """
+        try:
+            limit = max(1, min(int(request.query_params.get("limit", 8)), 20))
+        except ValueError:
+            return Response({"error": "limit muss eine Zahl sein."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(suggest_index.suggest(request.query_params.get("q", ""), limit=limit))
+
+    @action(detail=True, methods=["get"])
+    def variation(self, request, pk=None):
+        """
+        Variation zu einer Attributkombination, z.B. ?size=M&color=rot.
+        Eine indizierte Abfrage über (product, variation_key), ohne alle Variationen zu laden.
+        """
+        pairs = [
+            (name, value)
+            for name, value in request.query_params.items()
+            if name not in self.reserved_params and value
+        ]
+        if not pairs:
+            return Response(
+                {"error": "Bitte mindestens ein Attribut angeben, z.B. ?size=M."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        variation = (
+            ProductVariation.objects.filter(product_id=pk, variation_key=make_variation_key(pairs))
+            .values("id", "product_id", "variation_key", "stock")
+            .first()
+        )
+        if variation is None:
+            return Response(
+                {"error": "Keine Variation mit dieser Attributkombination."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        return Response({
+            "id": variation["id"],
+            "product": variation["product_id"],
+            "attributes": parse_variation_key(variation["variation_key"]),
+            "stock": variation["stock"],
+            "is_in_stock": variation["stock"] > 0,
+        })
 
 
 # --- ProductVariation ---
@@ -44,10 +191,15 @@ class ProductVariationViewSet(viewsets.ModelViewSet):
 
 
 # --- AttributeValue ---
-class AttributeValueViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = AttributeValue.objects.all()
+class AttributeValueViewSet(ConditionalGetMixin, CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = AttributeValue.objects.select_related("attribute_type")
     serializer_class = AttributeValueSerializer
     permission_classes = [permissions.AllowAny]
+    cache_models = ("shop.AttributeValue", "shop.AttributeType")
+
+    def get_validators(self, queryset):
+        # kleine Tabelle ohne updated_at
+        return [rows_fingerprint(queryset, "value", "attribute_type__name")], None
 
 
 # --- DeliveryTime (simple serializer inline to avoid cross-edit) ---
@@ -57,10 +209,15 @@ class DeliveryTimeSerializer(_serializers.ModelSerializer):
         model = DeliveryTime
         fields = ("id", "name", "min_days", "max_days", "is_default")
 
-class DeliveryTimeViewSet(viewsets.ReadOnlyModelViewSet):
+class DeliveryTimeViewSet(ConditionalGetMixin, CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     queryset = DeliveryTime.objects.all()
     serializer_class = DeliveryTimeSerializer
     permission_classes = [permissions.AllowAny]
+    cache_models = ("shop.DeliveryTime",)
+
+    def get_validators(self, queryset):
+        # kleine Tabelle ohne updated_at
+        return [rows_fingerprint(queryset, "name", "min_days", "max_days", "is_default")], None
 
 
 # --- Reviews ---
@@ -69,12 +226,36 @@ class ReviewViewSet(viewsets.ModelViewSet):
     serializer_class = ReviewSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
+    @action(detail=False, methods=["post"], url_path="moderate", permission_classes=[permissions.IsAdminUser])
+    def moderate(self, request):
+        """
+        Gibt mehrere Bewertungen in einer Transaktion frei bzw. lehnt sie ab.
+
+        Payload: {"ids": [1, 2, 3], "approved": true}
+        """
+        ids = request.data.get("ids")
+        approved = request.data.get("approved")
+
+        if not isinstance(ids, list) or not ids:
+            return Response({"error": "ids (Liste) ist erforderlich."}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(approved, bool):
+            return Response({"error": "approved (true/false) ist erforderlich."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            ids = [int(pk) for pk in ids]
+        except (TypeError, ValueError):
+            return Response({"error": "ids darf nur Zahlen enthalten."}, status=status.HTTP_400_BAD_REQUEST)
+
+        from .services.review_service import set_reviews_approved
+        result = set_reviews_approved(ids, approved)
+        return Response(result, status=status.HTTP_200_OK)
+
 
 # --- Categories ---
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+class CategoryViewSet(ConditionalGetMixin, CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Category.objects.all().order_by("name")
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
+    cache_models = ("shop.Category",)
 
 
 # --- Simple PlaceOrderView stub (implement real logic later) ---
@@ -84,73 +265,64 @@ class PlaceOrderView(views.APIView):
     def post(self, request, *args, **kwargs):
         """Create an Order and its OrderItems from frontend payload.
 
+        Stock of the ordered variations is reserved atomically; if a variation
+        does not have enough stock, nothing is stored and 409 is returned.
+
         Expected payload shape:
         {
-            "cartItems": [{"product": <id>, "quantity": <int>, "product_image": "...", ...}, ...],
+            "cartItems": [{"product": <id>, "quantity": <int>, "product_image": "...",
+                           "variation": <id> | "selectedAttributes": {"size": "M"}, ...}, ...],
             "address": {"name":"","street":"","zip":"","city":""},
             "paymentMethod": "paypal"|"creditcard"|"invoice"
         }
         """
 
-        user = request.user
+        from .services import idempotency_service
+        from .services.checkout_service import CheckoutError, place_order
+
         data = request.data or {}
-        cart_items = data.get("cartItems") or []
-
-        if not cart_items:
-            return Response({"error": "cartItems is required."}, status=status.HTTP_400_BAD_REQUEST)
-
-        address = data.get("address", {})
-        payment_method = data.get("paymentMethod", "paypal")
-
-        total = Decimal("0.00")
-        products_cache = {}
-
-        # Calculate total and load products
-        for it in cart_items:
-            pid = it.get("product")
-            qty = int(it.get("quantity", 1) or 1)
-            if not pid:
-                return Response({"error": "product id missing in cart item."}, status=status.HTTP_400_BAD_REQUEST)
-
-            if pid not in products_cache:
-                try:
-                    products_cache[pid] = Product.objects.get(pk=pid)
-                except Product.DoesNotExist:
-                    return Response({"error": f"Product {pid} not found."}, status=status.HTTP_400_BAD_REQUEST)
-
-            prod = products_cache[pid]
-            price = Decimal(str(prod.price))
-            total += price * qty
-
-        # Create order
-        order = Order.objects.create(
-            user=user,
-            name=address.get("name"),
-            street=address.get("street"),
-            zip=address.get("zip"),
-            city=address.get("city"),
-            payment_method=payment_method,
-            total=total,
-            paid=(payment_method in ("paypal", "creditcard")),
-            status=("paid" if payment_method in ("paypal", "creditcard") else "pending"),
-        )
+        idempotency_key = request.headers.get(idempotency_service.HEADER)
+        fingerprint = None
 
-        # Create items
-        for it in cart_items:
-            pid = it.get("product")
-            qty = int(it.get("quantity", 1) or 1)
-            prod = products_cache[pid]
-            OrderItem.objects.create(
-                order=order,
-                product=prod,
-                product_title=prod.title,
-                product_image=it.get("product_image") or prod.main_image,
-                price=prod.price,
-                quantity=qty,
-            )
+        if idempotency_key:
+            fingerprint = idempotency_service.request_fingerprint(data)
+            stored = idempotency_service.find_key(request.user, idempotency_key)
+            if stored is not None:
+                return self._replay(stored, fingerprint)
 
-        serializer = OrderSerializer(order, context={"request": request})
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        try:
+            with transaction.atomic():
+                order = place_order(
+                    user=request.user,
+                    cart_items=data.get("cartItems") or [],
+                    address=data.get("address") or {},
+                    payment_method=data.get("paymentMethod", "paypal"),
+                )
+                body = OrderSerializer(order, context={"request": request}).data
+                if idempotency_key:
+                    idempotency_service.store_response(
+                        request.user, idempotency_key, fingerprint, order, status.HTTP_201_CREATED, body
+                    )
+        except CheckoutError as exc:
+            return Response(exc.as_response_data(), status=exc.status_code)
+        except IntegrityError:
+            # Paralleler Retry mit demselben Key war schneller: dessen Antwort liefern
+            stored = idempotency_service.find_key(request.user, idempotency_key) if idempotency_key else None
+            if stored is None:
+                raise
+            return self._replay(stored, fingerprint)
+
+        return Response(body, status=status.HTTP_201_CREATED)
+
+    def _replay(self, stored, fingerprint):
+        if stored.request_hash != fingerprint:
+            return Response(
+                {"error": "Idempotency-Key wurde bereits für eine andere Bestellung verwendet."},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        response = Response(stored.response_body, status=stored.response_status)
+        response["Idempotent-Replayed"] = "true"
+        return response
 
 
 # --- CSRF token endpoint used by frontend ---
@@ -161,23 +333,100 @@ def get_csrf_token(request):
 
 
 # --- Shipping / Returns views for admin/shipping UI (basic) ---
-class ShippingOrdersView(views.APIView):
+# --- Export ---
+class ExportView(views.APIView):
+    """
+    Streamt Katalog oder Bestellpositionen als Datei, z. B.
+    /api/export/catalog.csv oder /api/export/orders.jsonl.gz
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, dataset, fmt, gz=None):
+        from .services.export_service import content_type, export_chunks
+
+        gzip = bool(gz)
+        response = StreamingHttpResponse(
+            export_chunks(dataset, fmt=fmt, gzip=gzip),
+            content_type=content_type(fmt, gzip),
+        )
+        filename = f"{dataset}-{timezone.now():%Y%m%d}.{fmt}{'.gz' if gzip else ''}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
+class ShippingOrdersView(generics.ListAPIView):
+    """
+    Versand-Warteschlange, älteste Bestellungen zuerst.
+    Filter: ?status=paid,ready_to_ship (Standard: offene), ?carrier=dhl|none,
+    ?date_from=/?date_to= (JJJJ-MM-TT). Keyset-Pagination mit ?page_size= / ?cursor=.
+    """
     permission_classes = [permissions.IsAuthenticated]
+    serializer_class = OrderSerializer
+    pagination_class = ShippingOrderCursorPagination
+    open_statuses = ("ready_to_ship", "paid", "pending")
 
-    def get(self, request):
-        qs = Order.objects.filter(status__in=["ready_to_ship", "paid", "pending"])
-        data = OrderSerializer(qs, many=True, context={"request": request}).data
-        return Response(data)
+    def get_queryset(self):
+        qs = filter_orders(Order.objects.for_listing(), self.request.query_params, self.open_statuses)
+        return qs.order_by("created_at", "id")
 
 
-class ShippingReturnsView(views.APIView):
+class ShippingReturnsView(generics.ListAPIView):
+    """
+    Retouren für das Versand-Team, neueste zuerst.
+    Filter: ?tab=open|closed|rejected|refunded, ?status=, ?reason=,
+    ?date_from=/?date_to= (JJJJ-MM-TT). Ohne Tab werden alle Retouren geliefert
+    (inkl. abgelehnte). Keyset-Pagination mit ?page_size= / ?cursor=.
+    """
     permission_classes = [permissions.IsAuthenticated]
+    serializer_class = ReturnRequestSerializer
+    pagination_class = ShippingReturnCursorPagination
 
-    def get(self, request):
-        # Alle Retouren abrufen (inkl. abgelehnte), damit diese im Tab "Geschlossene Retouren" angezeigt werden
-        qs = ReturnRequest.objects.all()
-        data = ReturnRequestSerializer(qs, many=True, context={"request": request}).data
-        return Response(data)
+    def get_queryset(self):
+        qs = ReturnRequest.objects.select_related("order", "item", "user")
+        return filter_returns(qs, self.request.query_params).order_by("-created_at", "-id")
+
+
+class ShippingReturnBulkStatusView(views.APIView):
+    """
+    Setzt den Status vieler Retouren in einer Transaktion.
+
+    Body: {"ids": [1, 2], "status": "received"} oder
+    {"items": [{"id": 1, "status": "approved"}, ...]}, bei "rejected" zusätzlich
+    rejection_reason / rejection_comment (gelten für alle abgelehnten Retouren).
+    Ungültige Übergänge brechen nicht ab, sondern werden je Retour gemeldet.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        from .services.return_service import ReturnTransitionError, bulk_transition
+
+        items = request.data.get("items")
+        if items is None:
+            target = request.data.get("status")
+            if not target:
+                return Response({"error": "Status ist erforderlich."}, status=status.HTTP_400_BAD_REQUEST)
+            items = [{"id": pk, "status": target} for pk in request.data.get("ids") or []]
+        try:
+            changes = [(int(item["id"]), item["status"]) for item in items]
+        except (KeyError, TypeError, ValueError):
+            return Response(
+                {"error": "Jeder Eintrag braucht eine numerische id und einen status."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not changes:
+            return Response({"error": "Keine Retouren angegeben."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            results = bulk_transition(
+                changes,
+                rejection_reason=request.data.get("rejection_reason"),
+                rejection_comment=request.data.get("rejection_comment", ""),
+                user=request.user,
+            )
+        except ReturnTransitionError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        updated = sum(1 for result in results if result["result"] == "updated")
+        return Response({"updated": updated, "results": results})
 
 
 class ShippingReturnDetailView(views.APIView):
@@ -193,9 +442,10 @@ class ShippingReturnDetailView(views.APIView):
     def patch(self, request, pk=None):
         """
         Updates the status of a return request.
-        Sends an email notification to the customer when the return is approved.
-        Sends an email notification to the customer when the return is received.
-        Sends an email notification to the customer when the return is refunded.
+        Only transitions allowed by the return state machine are accepted (400
+        otherwise); if another clerk changed the status in the meantime, the
+        request fails with 409. Queues an email notification to the customer
+        when the return is approved, rejected, received or refunded.
         """
         try:
             obj = ReturnRequest.objects.select_related('user', 'order', 'item').get(pk=pk)
@@ -218,37 +468,24 @@ class ShippingReturnDetailView(views.APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        from .services.return_service import (
+            ReturnTransitionConflict,
+            ReturnTransitionError,
+            rejection_fields,
+            transition,
+        )
+
+        fields = {}
+
         # If status is set to "rejected", validate rejection reason
         if new_status == "rejected":
-            rejection_reason = request.data.get("rejection_reason")
-            if not rejection_reason:
-                return Response(
-                    {"error": "Ablehnungsgrund ist erforderlich."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Check valid rejection reasons
-            valid_rejection_reasons = [choice[0] for choice in ReturnRequest.REJECTION_REASON_CHOICES]
-            if rejection_reason not in valid_rejection_reasons:
-                return Response(
-                    {"error": f"Ungültiger Ablehnungsgrund. Erlaubt: {', '.join(valid_rejection_reasons)}"},
-                    status=status.HTTP_400_BAD_REQUEST
+            try:
+                fields = rejection_fields(
+                    request.data.get("rejection_reason"),
+                    request.data.get("rejection_comment", ""),
                 )
-            
-            # If "sonstiges" is selected, a comment must be present
-            if rejection_reason == "sonstiges":
-                rejection_comment = request.data.get("rejection_comment", "").strip()
-                if not rejection_comment:
-                    return Response(
-                        {"error": "Bei 'Sonstiges' ist eine Erläuterung erforderlich."},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-            
-            # Save rejection reason
-            obj.rejection_reason = rejection_reason
-            obj.rejection_comment = request.data.get("rejection_comment", "").strip() or None
-            # Set rejection date
-            obj.rejection_date = timezone.now()
+            except ReturnTransitionError as exc:
+                return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
 
         # If status is set to "refunded", validate refund information
         if new_status == "refunded":
@@ -295,61 +532,30 @@ class ShippingReturnDetailView(views.APIView):
                 )
             
             # Save refund information
-            obj.refund_name = refund_name
-            obj.refund_amount = refund_amount_decimal
-            obj.refund_iban = refund_iban
-
-        old_status = obj.status
-        obj.status = new_status
-        obj.save()
-
-        # Debug output
-        print(f"\n[DEBUG] Status-Update: Retour #{obj.id}")
-        print(f"[DEBUG] Alter Status: {old_status}")
-        print(f"[DEBUG] Neuer Status: {new_status}")
-        print(f"[DEBUG] Soll E-Mail gesendet werden? {new_status == 'approved' and old_status != 'approved'}\n")
-
-        # Send email notification
-        if new_status == "approved" and old_status != "approved":
-            print("[DEBUG] E-Mail-Funktion wird aufgerufen (Genehmigung)...")
-            try:
-                from .services.email_service import send_return_approval_email
-                send_return_approval_email(obj)
-                print("[DEBUG] E-Mail-Funktion erfolgreich aufgerufen.")
-            except Exception as e:
-                print(f"[DEBUG] Fehler beim Aufruf der E-Mail-Funktion: {e}")
-                import traceback
-                traceback.print_exc()
-        elif new_status == "rejected" and old_status != "rejected":
-            print("[DEBUG] E-Mail-Funktion wird aufgerufen (Ablehnung)...")
+            fields = {
+                "refund_name": refund_name,
+                "refund_amount": refund_amount_decimal,
+                "refund_iban": refund_iban,
+            }
+
+        if new_status == obj.status:
+            # Kein Übergang: nur die mitgeschickten Angaben speichern, keine E-Mail
+            if fields:
+                for name, value in fields.items():
+                    setattr(obj, name, value)
+                obj.save(update_fields=list(fields))
+        else:
+            # Bedingtes UPDATE auf den gelesenen Status: bei gleichzeitigen Änderungen
+            # gewinnt genau ein Bearbeiter, nur dessen E-Mail landet im Ausgang
             try:
-                from .services.email_service import send_return_rejection_email
-                send_return_rejection_email(obj)
-                print("[DEBUG] E-Mail-Funktion erfolgreich aufgerufen.")
-            except Exception as e:
-                print(f"[DEBUG] Fehler beim Aufruf der E-Mail-Funktion: {e}")
-                import traceback
-                traceback.print_exc()
-        elif new_status == "received" and old_status != "received":
-            print("[DEBUG] E-Mail-Funktion wird aufgerufen (Retour eingetroffen)...")
-            try:
-                from .services.email_service import send_return_received_email
-                send_return_received_email(obj)
-                print("[DEBUG] E-Mail-Funktion erfolgreich aufgerufen.")
-            except Exception as e:
-                print(f"[DEBUG] Fehler beim Aufruf der E-Mail-Funktion: {e}")
-                import traceback
-                traceback.print_exc()
-        elif new_status == "refunded" and old_status != "refunded":
-            print("[DEBUG] E-Mail-Funktion wird aufgerufen (Erstattung)...")
-            try:
-                from .services.email_service import send_return_refunded_email
-                send_return_refunded_email(obj)
-                print("[DEBUG] E-Mail-Funktion erfolgreich aufgerufen.")
-            except Exception as e:
-                print(f"[DEBUG] Fehler beim Aufruf der E-Mail-Funktion: {e}")
-                import traceback
-                traceback.print_exc()
+                transition(obj, new_status, user=request.user, **fields)
+            except ReturnTransitionConflict as exc:
+                return Response(
+                    {"error": str(exc), "status": exc.current_status},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            except ReturnTransitionError as exc:
+                return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
 
         serializer = ReturnRequestSerializer(obj, context={"request": request})
         return Response(serializer.data, status=status.HTTP_200_OK)
@@ -370,10 +576,8 @@ class OrderViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        qs = Order.objects.all().select_related("user").prefetch_related(
-            Prefetch("items"),
-            Prefetch("returns"),   # uses related_name defined in OrderReturn
-        )
+        # return_count annotiert, items/returns vorgeladen: feste Anzahl Queries je Liste
+        qs = Order.objects.for_listing()
         if not self.request.user.is_staff:
             qs = qs.filter(user=self.request.user)
         return qs
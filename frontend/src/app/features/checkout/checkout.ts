@@ -133,6 +133,8 @@ export class Checkout {
   paymentMethod = 'paypal';
   successMessage = '';
   showSuccessAlert = false;
+  /** Bleibt für Wiederholungen derselben Bestellung gleich (Server erkennt Duplikate) */
+  private idempotencyKey = crypto.randomUUID();
 
   /** ✅ Bestellung absenden */
   onPlaceOrder() {
@@ -164,9 +166,11 @@ export class Checkout {
 
     this.http.post(`${environment.apiBaseUrl}order/place/`, payload, {
       withCredentials: true,
+      headers: { 'Idempotency-Key': this.idempotencyKey },
     })
     .subscribe({
       next: () => {
+        this.idempotencyKey = crypto.randomUUID();
         this.cartService.clearCart();
         this.successMessage = 'Danke für deine Bestellung!';
         this.showSuccessAlert = true;
@@ -1,6 +1,6 @@
 import { Component, Input, Output, EventEmitter } from '@angular/core';
 import { CommonModule } from '@angular/common';
-import { Product } from '../../../shared/models/products.model';
+import { ProductListItem } from '../../../shared/models/products.model';
 
 @Component({
   selector: 'app-product-management-card',
@@ -34,24 +34,21 @@ import { Product } from '../../../shared/models/products.model';
   `,
 })
 export class ProductManagementCard {
-  @Input() product!: Product;
+  @Input() product!: ProductListItem;
   @Output() edit = new EventEmitter<number>();
   @Output() delete = new EventEmitter<number>();
 
   get truncatedDescription(): string {
-    const words = this.product.description.split(' ');
+    const description = this.product.description ?? '';
+    const words = description.split(' ');
     if (words.length <= 50) {
-      return this.product.description.replace(/\n/g, '<br>');
+      return description.replace(/\n/g, '<br>');
     }
     return (words.slice(0, 50).join(' ') + '...').replace(/\n/g, '<br>');
   }
 
   getImageUrl(): string {
-    const url =
-      this.product.main_image ||
-      this.product.external_image ||
-      this.product.image_url ||
-      this.product.images?.[0]?.image;
+    const url = this.product.image_url;
 
     if (!url) {
       return 'assets/img/placeholder-product.png';
@@ -5,7 +5,7 @@ import { environment } from '../../../environments/environment';
 import { Router } from '@angular/router';
 import { FormsModule } from '@angular/forms';
 import { ProductManagementCard } from './components/product-management-card';
-import { Product } from '../../shared/models/products.model';
+import { ProductListItem } from '../../shared/models/products.model';
 import { ConfirmPopup } from '../../shared/confirm-popup/confirm-popup';
 
 @Component({
@@ -53,10 +53,12 @@ export class ProductManagement implements OnInit {
   private http = inject(HttpClient);
   private router = inject(Router);
   private apiUrl = `${environment.apiBaseUrl}products/`;
+  // schlanke Liste; Variationen lädt erst das Bearbeiten-Formular
+  private listUrl = `${this.apiUrl}?fields=id,title,description,price,image_url`;
   // detect XHR patching (devtools/extensions) to choose fetch fallback
   private xhrPatched = false;
 
-  products: Product[] = [];
+  products: ProductListItem[] = [];
   searchTerm: string = '';
   showConfirmPopup = false;
   confirmMessage = '';
@@ -77,14 +79,14 @@ export class ProductManagement implements OnInit {
     }
   }
 
-  get filteredProducts(): Product[] {
+  get filteredProducts(): ProductListItem[] {
     if (!this.searchTerm) {
       return this.products;
     }
     return this.products.filter(
       (product) =>
         product.title.toLowerCase().includes(this.searchTerm.toLowerCase()) ||
-        product.description
+        (product.description ?? '')
           .toLowerCase()
           .includes(this.searchTerm.toLowerCase()),
     );
@@ -94,7 +96,7 @@ export class ProductManagement implements OnInit {
     if (this.xhrPatched) {
       (async () => {
         try {
-          const res = await fetch(this.apiUrl, {
+          const res = await fetch(this.listUrl, {
             method: 'GET',
             headers: { Accept: 'application/json' },
             credentials: 'include',
@@ -112,7 +114,7 @@ export class ProductManagement implements OnInit {
       return;
     }
 
-    this.http.get<Product[]>(this.apiUrl).subscribe({
+    this.http.get<ProductListItem[]>(this.listUrl).subscribe({
       next: (data) => (this.products = data),
       error: (err) => {
         const msg = String(err);
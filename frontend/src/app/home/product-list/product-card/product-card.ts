@@ -1,7 +1,7 @@
 import { Component, Input } from '@angular/core';
 import { CommonModule } from '@angular/common';
 import { RouterLink } from '@angular/router';
-import { Product } from '../../../shared/models/products.model';
+import { ProductListItem } from '../../../shared/models/products.model';
 
 @Component({
   selector: 'app-product-card',
@@ -70,7 +70,7 @@ import { Product } from '../../../shared/models/products.model';
   `,
 })
 export class ProductCardComponent {
-  @Input() product!: Product;
+  @Input() product!: ProductListItem;
 
   getStars(): string[] {
     if (
@@ -94,11 +94,7 @@ export class ProductCardComponent {
   }
 
   getImageUrl(): string {
-    const url =
-      this.product.main_image ||
-      this.product.external_image ||
-      this.product.image_url ||
-      this.product.images?.[0]?.image;
+    const url = this.product.image_url;
 
     if (!url) {
       return 'assets/img/placeholder-product.png';
@@ -3,7 +3,7 @@ import { CommonModule } from '@angular/common';
 import { HttpClient } from '@angular/common/http';
 import { FormsModule } from '@angular/forms';
 import { environment } from '../../../environments/environment';
-import { Product } from '../../shared/models/products.model';
+import { ProductListItem } from '../../shared/models/products.model';
 import { ProductCardComponent } from './product-card/product-card';
 
 @Component({
@@ -87,7 +87,7 @@ import { ProductCardComponent } from './product-card/product-card';
 export class ProductsList {
   private http = inject(HttpClient);
 
-  products = signal<Product[]>([]);
+  products = signal<ProductListItem[]>([]);
   query = signal('');
   category = signal<number | ''>('');
   categories = signal<{ id: number; name: string; display_name?: string }[]>(
@@ -133,7 +133,9 @@ export class ProductsList {
   }
 
   ngOnInit() {
-    this.http.get<Product[]>(`${environment.apiBaseUrl}products/`).subscribe({
+    // schlanke Liste; Variationen lädt erst die Detailseite
+    const fields = 'id,title,description,price,image_url,rating_avg,rating_count,category';
+    this.http.get<ProductListItem[]>(`${environment.apiBaseUrl}products/?fields=${fields}`).subscribe({
       next: (data) => this.products.set(data ?? []),
       error: (err) => console.error('Fehler beim Laden der Produkte:', err),
     });
@@ -165,24 +167,9 @@ export class ProductsList {
       // Text query (title OR description)
       const matchesQuery = !q || title.includes(q) || description.includes(q);
 
-      // Category matching by ID (preferred) — falls back to name checks
-      let matchesCategory = true;
-      if (selectedCategoryId !== '') {
-        const catField = (p as any).category;
-        if (!catField) {
-          matchesCategory = false;
-        } else if (
-          typeof catField === 'object' &&
-          typeof catField.id === 'number'
-        ) {
-          matchesCategory = catField.id === Number(selectedCategoryId);
-        } else if (typeof catField === 'string') {
-          matchesCategory =
-            catField.toLowerCase() === String(selectedCategoryId).toLowerCase();
-        } else {
-          matchesCategory = false;
-        }
-      }
+      // Category matching by ID
+      const matchesCategory =
+        selectedCategoryId === '' || p.category === Number(selectedCategoryId);
 
       // Price range
       let matchesPrice = true;
@@ -69,3 +69,18 @@ export interface Product {
   rating_count: number | null;
   recent_reviews: Review[];
 }
+
+// ✅ Produkt in Listen/Grids (schlanke Darstellung von GET /products/)
+export interface ProductListItem {
+  id: number;
+  title: string;
+  // nur mit ?fields=...,description
+  description?: string;
+  price: number;
+  image_url: string | null;
+  rating_avg: number | null;
+  rating_count: number | null;
+  stock_total?: number;
+  // Kategorie-ID
+  category?: number | null;
+}
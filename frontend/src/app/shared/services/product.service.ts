@@ -2,13 +2,13 @@ import { Injectable, signal, computed } from '@angular/core';
 import { HttpClient } from '@angular/common/http';
 import { timer, Observable } from 'rxjs';
 import { switchMap } from 'rxjs/operators';
-import { Product } from '../models/products.model';
+import { Product, ProductListItem } from '../models/products.model';
 import { environment } from '../../../environments/environment';
 
 @Injectable({ providedIn: 'root' })
 export class ProductService {
   private apiUrl = `${environment.apiBaseUrl}products/`;
-  private _products = signal<Product[]>([]);
+  private _products = signal<ProductListItem[]>([]);
   public products = computed(() => this._products());
 
   constructor(private http: HttpClient) {
@@ -16,24 +16,24 @@ export class ProductService {
     this.loadProducts();
     // … und dann alle 10 Sekunden neu
     timer(10_000, 10_000)
-      .pipe(switchMap(() => this.http.get<Product[]>(this.apiUrl)))
+      .pipe(switchMap(() => this.http.get<ProductListItem[]>(this.apiUrl)))
       .subscribe(data => this._products.set(data));
   }
 
   loadProducts(): void {
-    this.http.get<Product[]>(this.apiUrl)
+    this.http.get<ProductListItem[]>(this.apiUrl)
       .subscribe(data => this._products.set(data));
   }
 
   /**
-   * Lokale Suche in bereits geladenen Produkten.
+   * Lokale Suche in bereits geladenen Produkten (schlanke Darstellung).
    */
-  getProductById(id: number): Product | null {
+  getProductById(id: number): ProductListItem | null {
   return this._products().find(p => p.id === id) ?? null;
 }
 
   /**
-   * Einzelnes Produkt direkt vom Server nachladen.
+   * Einzelnes Produkt mit Variationen, Bildern und Bewertungen vom Server laden.
    */
   fetchProductById(id: number): Observable<Product> {
     return this.http.get<Product>(`${this.apiUrl}${id}`);